@@ -6,7 +6,10 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taxi_service.settings")
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE",
+        "taxi_service.test_settings" if sys.argv[1:2] == ["test"] else "taxi_service.settings",
+    )
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
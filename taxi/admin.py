@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Driver, Car, Manufacturer
+from .models import ApiToken, AuditEntry, Driver, Car, Job, Manufacturer, Shift
 
 
 @admin.register(Driver)
@@ -21,3 +21,30 @@ class CarAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Manufacturer)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "progress", "total", "attempts", "created_at")
+    list_filter = ("status", "name")
+
+
+@admin.register(Shift)
+class ShiftAdmin(admin.ModelAdmin):
+    list_display = ("id", "driver", "car_id", "starts_at", "ends_at")
+    list_filter = ("starts_at",)
+    raw_id_fields = ("driver", "car")
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "user", "created_at")
+    raw_id_fields = ("user",)
+    readonly_fields = ("key_hash",)
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ("id", "model", "object_id", "action", "actor", "route", "recorded_at")
+    list_filter = ("model", "action")
+    raw_id_fields = ("actor",)
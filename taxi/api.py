@@ -0,0 +1,903 @@
+import base64
+import binascii
+import json
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .eta import eta_engine
+from .events import publish_on_commit
+from .heatmap import HEATMAP_MAX_ZOOM, heatmap
+from .jobs import enqueue
+from .locations import MAX_SEARCH_RADIUS_KM, nearest_drivers, parse_timestamp, record_pings
+from .models import Car, Driver, Manufacturer, Ride, Shift
+from .pricing import SURGE_ZONE_DEGREES, surge_multiplier, surge_pricer
+from .sharding import scatter
+from .shifts import book_shifts, shift_schedule, validate_times
+from .singleflight import single_flight
+from .sync import SYNC_BATCH_SIZE, sync_drivers
+from .telemetry import Track, append_points, downsample
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+API_MAX_PINGS = 1000
+API_MAX_NEAREST = 50
+API_MAX_TRACK_POINTS = 10_000
+API_TRACK_POINTS = 2000
+API_MAX_ETA_PAIRS = 1000
+API_MAX_SHIFTS = 5000
+JSON_DUMPS_PARAMS = {"separators": (",", ":")}
+
+
+class Relation:
+    """A related resource that can be requested with `?include=`.
+
+    Foreign keys are resolved from `source` (a column already fetched
+    for the primary rows); many-valued relations are resolved through
+    `lookup`, the path from the related model back to the primary one.
+    Either way every relation costs exactly one query per page (per
+    shard when the fleet is sharded and the rows or links live on the
+    shards: `sharded` marks a link table that does).
+    """
+
+    def __init__(self, resource, source=None, lookup=None, sharded=False):
+        self.resource = resource
+        self.source = source
+        self.lookup = lookup
+        self.sharded = sharded
+
+    def load(self, rows, name):
+        resource = RESOURCES[self.resource]
+
+        if self.source:
+            ids = {row[self.source] for row in rows}
+
+            return resource.fetch(resource.model.objects.filter(pk__in=ids))
+
+        links = {row["id"]: [] for row in rows}
+        queryset = (
+            resource.model.objects
+            .filter(**{f"{self.lookup}__in": list(links)})
+            .order_by()
+        )
+        querysets = scatter(queryset) if self.sharded or resource.sharded else [queryset]
+        related = {}
+
+        for parent_id, *values in chain.from_iterable(
+            shard_queryset.values_list(self.lookup, *resource.columns) for shard_queryset in querysets
+        ):
+            obj = dict(zip(resource.keys, values))
+            links[parent_id].append(obj["id"])
+            related[obj["id"]] = obj
+
+        for row in rows:
+            row[name] = links[row["id"]]
+
+        return list(related.values())
+
+
+class Resource:
+    def __init__(self, name, model, fields, relations, sharded=False):
+        self.name = name
+        self.model = model
+        # Rows of a sharded resource (cars) are read from every shard.
+        self.sharded = sharded
+        # Serializers are precomputed once: output keys and the
+        # `values_list()` columns they are read from, in matching order.
+        self.fields = fields
+        self.keys = tuple(fields)
+        self.columns = tuple(fields.values())
+        self.relations = relations
+
+    def select(self, requested):
+        if not requested:
+            return self.keys, self.columns
+
+        keys = ("id",) + tuple(
+            key for key in self.keys if key in requested and key != "id"
+        )
+
+        return keys, tuple(self.fields[key] for key in keys)
+
+    def fetch(self, queryset, keys=None, columns=None):
+        keys = keys or self.keys
+        columns = columns or self.columns
+
+        if not self.sharded:
+            return [dict(zip(keys, values)) for values in queryset.values_list(*columns)]
+
+        # Each shard returns up to the whole slice; merged by id, the
+        # first rows are the ones a single database would have returned.
+        return sorted(
+            (
+                dict(zip(keys, values))
+                for shard_queryset in scatter(queryset)
+                for values in shard_queryset.values_list(*columns)
+            ),
+            key=itemgetter("id"),
+        )
+
+
+RESOURCES = {
+    "cars": Resource(
+        "cars",
+        Car,
+        {"id": "id", "model": "model", "manufacturer_id": "manufacturer_id"},
+        {
+            "manufacturer": Relation("manufacturers", source="manufacturer_id"),
+            "drivers": Relation("drivers", lookup="cars", sharded=True),
+        },
+        sharded=True,
+    ),
+    "drivers": Resource(
+        "drivers",
+        Driver,
+        {
+            "id": "id",
+            "username": "username",
+            "first_name": "first_name",
+            "last_name": "last_name",
+            "license_number": "license_number",
+        },
+        {"cars": Relation("cars", lookup="drivers")},
+    ),
+    "manufacturers": Resource(
+        "manufacturers",
+        Manufacturer,
+        {"id": "id", "name": "name", "country": "country"},
+        {"cars": Relation("cars", lookup="manufacturer")},
+    ),
+    "rides": Resource(
+        "rides",
+        Ride,
+        {
+            "id": "id",
+            "status": "status",
+            "pickup_latitude": "pickup_latitude",
+            "pickup_longitude": "pickup_longitude",
+            "dropoff_latitude": "dropoff_latitude",
+            "dropoff_longitude": "dropoff_longitude",
+            "driver_id": "driver_id",
+            "car_id": "car_id",
+            "pickup_distance_km": "pickup_distance_km",
+            "pickup_eta_seconds": "pickup_eta_seconds",
+            "surge_multiplier": "surge_multiplier",
+            "requested_at": "requested_at",
+            "assigned_at": "assigned_at",
+        },
+        {
+            "driver": Relation("drivers", source="driver_id"),
+            "car": Relation("cars", source="car_id"),
+        },
+    ),
+}
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def error_response(message, status):
+    return JsonResponse({"error": message}, status=status, json_dumps_params=JSON_DUMPS_PARAMS)
+
+
+class ApiView(View):
+    resource_name = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        self.resource = RESOURCES[self.resource_name]
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_params(self):
+        fields = {
+            field for field in self.request.GET.get("fields", "").split(",") if field
+        }
+        includes = [
+            name for name in self.request.GET.get("include", "").split(",") if name
+        ]
+        unknown = (fields - set(self.resource.keys)) | (
+            set(includes) - set(self.resource.relations)
+        )
+
+        return fields, includes, sorted(unknown)
+
+    def serialize(self, queryset, fields, includes, limit=None):
+        keys, columns = self.resource.select(fields)
+        relations = {name: self.resource.relations[name] for name in includes}
+
+        for relation in relations.values():
+            if relation.source and relation.source not in columns:
+                keys += (relation.source,)
+                columns += (relation.source,)
+
+        rows = self.resource.fetch(queryset, keys, columns)
+        has_more = limit is not None and len(rows) > limit
+        rows = rows[:limit]
+        included = {}
+
+        for name, relation in relations.items():
+            included[relation.resource] = relation.load(rows, name)
+
+        return rows, included, has_more
+
+
+class ApiListView(ApiView):
+    def get(self, request, *args, **kwargs):
+        fields, includes, unknown = self.get_params()
+
+        if unknown:
+            return error_response(f"Unknown fields or includes: {', '.join(unknown)}.", 400)
+
+        try:
+            limit = int(request.GET.get("limit", API_PAGE_SIZE))
+        except ValueError:
+            return error_response("Invalid limit.", 400)
+
+        limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+
+        queryset = self.resource.model.objects.order_by("pk")
+        cursor = request.GET.get("cursor")
+
+        if cursor:
+            after = decode_cursor(cursor)
+
+            if after is None:
+                return error_response("Invalid cursor.", 400)
+
+            queryset = queryset.filter(pk__gt=after)
+
+        # One extra row tells whether there is a next page without a COUNT.
+        rows, included, has_more = self.serialize(
+            queryset[:limit + 1], fields, includes, limit
+        )
+        next_url = None
+
+        if has_more:
+            params = request.GET.copy()
+            params["cursor"] = encode_cursor(rows[-1]["id"])
+            next_url = f"{request.path}?{params.urlencode()}"
+
+        payload = {"data": rows, "next": next_url}
+
+        if included:
+            payload["included"] = included
+
+        return JsonResponse(payload, json_dumps_params=JSON_DUMPS_PARAMS)
+
+
+class ApiDetailView(ApiView):
+    def get(self, request, *args, **kwargs):
+        fields, includes, unknown = self.get_params()
+
+        if unknown:
+            return error_response(f"Unknown fields or includes: {', '.join(unknown)}.", 400)
+
+        queryset = self.resource.model.objects.filter(pk=kwargs["pk"])
+        rows, included, _ = self.serialize(queryset, fields, includes)
+
+        if not rows:
+            return error_response("Not found.", 404)
+
+        payload = {"data": rows[0]}
+
+        if included:
+            payload["included"] = included
+
+        return JsonResponse(payload, json_dumps_params=JSON_DUMPS_PARAMS)
+
+
+class MachineApiView(View):
+    """A POST endpoint for devices and feeds as well as browsers.
+
+    Requests authenticated with an API token (taxi.tokens) skip CSRF
+    checks; session-authenticated ones still need a CSRF token.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not getattr(request, "api_token", False):
+            rejected = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+
+            if rejected is not None:
+                return rejected
+
+        return super().dispatch(request, *args, **kwargs)
+
+
+class DriverSyncApiView(MachineApiView):
+    """Bulk upsert of drivers from the HR feed, keyed on `license_number`."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        if not request.user.is_staff:
+            return error_response("Staff access required.", 403)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return error_response("Invalid JSON.", 400)
+
+        records = payload.get("drivers") if isinstance(payload, dict) else payload
+
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            return error_response("Expected a list of driver records.", 400)
+
+        if len(records) > SYNC_BATCH_SIZE:
+            # More than one batch: sync in the background instead.
+            job = enqueue("sync_drivers", {"records": records}, user=request.user)
+
+            return JsonResponse(
+                {
+                    "job": {
+                        "id": job.pk,
+                        "status": job.status,
+                        "url": request.build_absolute_uri(job.get_absolute_url()),
+                    }
+                },
+                status=202,
+                json_dumps_params=JSON_DUMPS_PARAMS,
+            )
+
+        results = sync_drivers(records)
+
+        return JsonResponse(
+            {
+                "results": results,
+                "summary": Counter(result["status"] for result in results),
+            },
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class LocationPingApiView(MachineApiView):
+    """Batched GPS pings.
+
+    Staff (a dispatch gateway) may send pings for any driver; a driver's
+    own device sends pings without a `driver` id, or with its own.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return error_response("Invalid JSON.", 400)
+
+        pings = payload.get("pings") if isinstance(payload, dict) else payload
+
+        if not isinstance(pings, list) or not all(isinstance(ping, dict) for ping in pings):
+            return error_response("Expected a list of pings.", 400)
+
+        if len(pings) > API_MAX_PINGS:
+            return error_response(f"At most {API_MAX_PINGS} pings per request.", 400)
+
+        if not request.user.is_staff:
+            if any(ping.get("driver", request.user.pk) != request.user.pk for ping in pings):
+                return error_response("Drivers can only report their own location.", 403)
+
+            pings = [{**ping, "driver": request.user.pk} for ping in pings]
+
+        summary, errors = record_pings(pings)
+
+        return JsonResponse(
+            {"summary": summary, "errors": errors},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class NearestDriversApiView(View):
+    """`?latitude=&longitude=&k=&radius=`: nearest available drivers, in km."""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        try:
+            latitude = float(request.GET["latitude"])
+            longitude = float(request.GET["longitude"])
+            k = int(request.GET.get("k", 5))
+            radius = float(request.GET.get("radius", 5))
+        except (KeyError, ValueError):
+            return error_response("Expected numeric latitude, longitude, k and radius.", 400)
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return error_response("Coordinates out of range.", 400)
+
+        k = max(1, min(k, API_MAX_NEAREST))
+        radius = max(0.0, min(radius, MAX_SEARCH_RADIUS_KM))
+
+        return JsonResponse(
+            {
+                "data": [
+                    {
+                        "id": driver.pk,
+                        "username": driver.username,
+                        "distance_km": round(distance, 3),
+                    }
+                    for distance, driver in nearest_drivers(latitude, longitude, k, radius)
+                ]
+            },
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+def parse_point(payload, prefix, required=True):
+    latitude = payload.get(f"{prefix}_latitude")
+    longitude = payload.get(f"{prefix}_longitude")
+
+    if latitude is None and longitude is None and not required:
+        return None, None
+
+    if not all(
+        isinstance(value, (int, float)) and not isinstance(value, bool) and -limit <= value <= limit
+        for value, limit in ((latitude, 90), (longitude, 180))
+    ):
+        raise ValueError(f"Expected numeric {prefix}_latitude and {prefix}_longitude.")
+
+    return float(latitude), float(longitude)
+
+
+def parse_moment(value):
+    """A query string time: Unix time or ISO 8601, now if missing."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        pass
+
+    return parse_timestamp(value)
+
+
+class SurgeApiView(View):
+    """Surge multipliers.
+
+    `?latitude=&longitude=` returns the multiplier there; without a
+    point, every zone currently priced above normal.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        snapshot = surge_pricer.current()
+        computed_at = snapshot.computed_at and snapshot.computed_at.isoformat()
+
+        if "latitude" not in request.GET and "longitude" not in request.GET:
+            return JsonResponse(
+                {
+                    "data": [
+                        {
+                            "south": row * SURGE_ZONE_DEGREES,
+                            "west": col * SURGE_ZONE_DEGREES,
+                            "multiplier": multiplier,
+                        }
+                        for row, col, multiplier in snapshot.surging()
+                    ],
+                    "zone_degrees": SURGE_ZONE_DEGREES,
+                    "computed_at": computed_at,
+                },
+                json_dumps_params=JSON_DUMPS_PARAMS,
+            )
+
+        try:
+            latitude = float(request.GET["latitude"])
+            longitude = float(request.GET["longitude"])
+        except (KeyError, ValueError):
+            return error_response("Expected numeric latitude and longitude.", 400)
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return error_response("Coordinates out of range.", 400)
+
+        return JsonResponse(
+            {"data": {"multiplier": snapshot.multiplier(latitude, longitude), "computed_at": computed_at}},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class RideRequestApiView(MachineApiView):
+    """Request a ride; `taxi.dispatch` assigns a driver within seconds."""
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return error_response("Invalid JSON.", 400)
+
+        if not isinstance(payload, dict):
+            return error_response("Expected a JSON object.", 400)
+
+        try:
+            pickup = parse_point(payload, "pickup")
+            dropoff = parse_point(payload, "dropoff", required=False)
+        except ValueError as error:
+            return error_response(str(error), 400)
+
+        ride = Ride.objects.create(
+            requested_by=request.user,
+            pickup_latitude=pickup[0],
+            pickup_longitude=pickup[1],
+            dropoff_latitude=dropoff[0],
+            dropoff_longitude=dropoff[1],
+            surge_multiplier=surge_multiplier(*pickup),
+        )
+        publish_on_commit(
+            "ride.status",
+            {"ride": ride.pk, "status": ride.status, "latitude": pickup[0], "longitude": pickup[1]},
+        )
+        rows = RESOURCES["rides"].fetch(Ride.objects.filter(pk=ride.pk))
+
+        return JsonResponse({"data": rows[0]}, status=201, json_dumps_params=JSON_DUMPS_PARAMS)
+
+
+def own_rides(user, driving=False):
+    """Rides `user` requested or drives (only drives, if `driving`); all for staff."""
+    if user.is_staff:
+        return Ride.objects.all()
+
+    if driving:
+        return Ride.objects.filter(driver=user)
+
+    return Ride.objects.filter(Q(requested_by=user) | Q(driver=user))
+
+
+class RideStatusApiView(MachineApiView):
+    """Complete or cancel a ride: by its requester, its driver or staff."""
+
+    transitions = {
+        Ride.COMPLETED: (Ride.ASSIGNED,),
+        Ride.CANCELLED: (Ride.REQUESTED, Ride.ASSIGNED),
+    }
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        try:
+            status = json.loads(request.body).get("status")
+        except (ValueError, AttributeError):
+            return error_response("Expected a JSON object with a status.", 400)
+
+        if status not in self.transitions:
+            return error_response(f"Status must be one of {', '.join(self.transitions)}.", 400)
+
+        rides = own_rides(request.user).filter(pk=kwargs["pk"])
+
+        if not rides.exists():
+            return error_response("Not found.", 404)
+
+        # Conditional update, so a ride assigned meanwhile can't be lost.
+        if not rides.filter(status__in=self.transitions[status]).update(status=status):
+            return error_response("The ride can no longer change to this status.", 409)
+
+        ride = rides.values("driver_id", "car_id").get()
+        publish_on_commit(
+            "ride.status",
+            {"ride": kwargs["pk"], "status": status, "driver": ride["driver_id"], "car": ride["car_id"]},
+            cars=[ride["car_id"]] if ride["car_id"] else [],
+            drivers=[ride["driver_id"]] if ride["driver_id"] else [],
+        )
+
+        return JsonResponse(
+            {"data": RESOURCES["rides"].fetch(rides)[0]},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class RideTelemetryApiView(MachineApiView):
+    """A ride's GPS track.
+
+    POST `{"points": [[time_ms, latitude, longitude], ...]}` appends
+    points (the ride's driver or staff). GET returns the track,
+    optionally within `?since=&until=` (ms) and simplified with
+    `?tolerance=` (metres) and `?max_points=`.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        if not own_rides(request.user, driving=True).filter(pk=kwargs["pk"]).exists():
+            return error_response("Not found.", 404)
+
+        try:
+            points = json.loads(request.body).get("points")
+        except (ValueError, AttributeError):
+            return error_response("Expected a JSON object with points.", 400)
+
+        if not isinstance(points, list) or not all(
+            isinstance(point, list)
+            and len(point) == 3
+            and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in point)
+            and -90 <= point[1] <= 90
+            and -180 <= point[2] <= 180
+            for point in points
+        ):
+            return error_response("Expected [time_ms, latitude, longitude] points.", 400)
+
+        if len(points) > API_MAX_TRACK_POINTS:
+            return error_response(f"At most {API_MAX_TRACK_POINTS} points per request.", 400)
+
+        stored = append_points(kwargs["pk"], points)
+
+        return JsonResponse(
+            {"stored": stored, "ignored": len(points) - stored},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+    def get(self, request, *args, **kwargs):
+        if not own_rides(request.user).filter(pk=kwargs["pk"]).exists():
+            return error_response("Not found.", 404)
+
+        try:
+            since, until = (
+                int(request.GET[name]) if request.GET.get(name) else None
+                for name in ("since", "until")
+            )
+            tolerance = float(request.GET.get("tolerance", 0))
+            max_points = int(request.GET.get("max_points", API_TRACK_POINTS))
+        except ValueError:
+            return error_response("Invalid since, until, tolerance or max_points.", 400)
+
+        points = Track(kwargs["pk"], since, until).points()
+        shown = downsample(points, tolerance, max(2, min(max_points, API_MAX_TRACK_POINTS)))
+
+        return JsonResponse(
+            {
+                "data": {
+                    "total": len(points),
+                    "points": [[int(time), latitude, longitude] for time, latitude, longitude in shown.tolist()],
+                }
+            },
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class ShiftBookingApiView(MachineApiView):
+    """Books shifts, all or none (staff only).
+
+    POST `{"shifts": [{"driver": id, "car": id, "starts_at": ...,
+    "ends_at": ...}, ...]}`, times as Unix times or ISO 8601. Responds
+    409 with the clashes if any driver or car is already booked.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        if not request.user.is_staff:
+            return error_response("Staff access required.", 403)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            records = json.loads(request.body).get("shifts")
+        except (ValueError, AttributeError):
+            return error_response("Expected a JSON object with shifts.", 400)
+
+        if not isinstance(records, list) or not all(
+            isinstance(record, dict)
+            and all(record.get(name) is not None for name in ("driver", "car", "starts_at", "ends_at"))
+            for record in records
+        ):
+            return error_response("Expected shifts with driver, car, starts_at and ends_at.", 400)
+
+        if len(records) > API_MAX_SHIFTS:
+            return error_response(f"At most {API_MAX_SHIFTS} shifts per request.", 400)
+
+        try:
+            shifts = [
+                Shift(
+                    driver_id=int(record["driver"]),
+                    car_id=int(record["car"]),
+                    starts_at=parse_timestamp(record["starts_at"]),
+                    ends_at=parse_timestamp(record["ends_at"]),
+                )
+                for record in records
+            ]
+        except (TypeError, ValueError):
+            return error_response("Invalid driver, car, starts_at or ends_at.", 400)
+
+        try:
+            for shift in shifts:
+                validate_times(shift.starts_at, shift.ends_at)
+        except ValidationError as error:
+            return error_response(error.messages, 400)
+
+        driver_ids = {shift.driver_id for shift in shifts}
+        car_ids = {shift.car_id for shift in shifts}
+        known_cars = sum(
+            queryset.filter(pk__in=car_ids).count() for queryset in scatter(Car.objects.order_by())
+        )
+
+        if Driver.objects.filter(pk__in=driver_ids).count() < len(driver_ids) or known_cars < len(car_ids):
+            return error_response("Unknown driver or car.", 400)
+
+        try:
+            book_shifts(shifts)
+        except ValidationError as error:
+            return error_response(error.messages, 409)
+
+        return JsonResponse(
+            {"data": [shift.pk for shift in shifts]}, status=201, json_dumps_params=JSON_DUMPS_PARAMS
+        )
+
+
+class CarDriverApiView(View):
+    """Who has a car, now or `?at=` (a Unix time or ISO 8601)."""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        try:
+            moment = parse_moment(request.GET.get("at"))
+        except ValueError as error:
+            return error_response(str(error), 400)
+
+        shift_id, driver_id = shift_schedule.driver_at(kwargs["pk"], moment) or (None, None)
+
+        return JsonResponse(
+            {"data": {"shift": shift_id, "driver": driver_id}}, json_dumps_params=JSON_DUMPS_PARAMS
+        )
+
+
+class FreeCarsApiView(View):
+    """Ids of the cars without a shift between `?starts_at=` and `?ends_at=`."""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        if not request.GET.get("starts_at") or not request.GET.get("ends_at"):
+            return error_response("starts_at and ends_at are required.", 400)
+
+        try:
+            starts_at, ends_at = (parse_moment(request.GET[name]) for name in ("starts_at", "ends_at"))
+        except ValueError as error:
+            return error_response(str(error), 400)
+
+        if ends_at <= starts_at:
+            return error_response("ends_at must be after starts_at.", 400)
+
+        car_ids = sorted(
+            car_id
+            for queryset in scatter(Car.objects.order_by())
+            for car_id in queryset.values_list("pk", flat=True)
+        )
+
+        return JsonResponse(
+            {"data": shift_schedule.free_cars(car_ids, starts_at, ends_at)},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class EtaApiView(MachineApiView):
+    """Driving times for a batch of trips.
+
+    POST `{"pairs": [[from_latitude, from_longitude, to_latitude,
+    to_longitude], ...]}`; returns seconds per pair, null where no road
+    leads there.
+    """
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        try:
+            pairs = json.loads(request.body).get("pairs")
+        except (ValueError, AttributeError):
+            return error_response("Expected a JSON object with pairs.", 400)
+
+        if not isinstance(pairs, list) or not all(
+            isinstance(pair, list)
+            and len(pair) == 4
+            and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in pair)
+            and -90 <= pair[0] <= 90
+            and -180 <= pair[1] <= 180
+            and -90 <= pair[2] <= 90
+            and -180 <= pair[3] <= 180
+            for pair in pairs
+        ):
+            return error_response("Expected [from_lat, from_lon, to_lat, to_lon] pairs.", 400)
+
+        if len(pairs) > API_MAX_ETA_PAIRS:
+            return error_response(f"At most {API_MAX_ETA_PAIRS} pairs per request.", 400)
+
+        seconds = eta_engine.travel_times(
+            [pair[:2] for pair in pairs], [pair[2:] for pair in pairs]
+        )
+
+        if seconds is None:
+            return error_response("No road graph is configured.", 503)
+
+        return JsonResponse(
+            {"data": [round(value) if value != float("inf") else None for value in seconds.tolist()]},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+
+class HeatmapTileApiView(View):
+    """A `demand` or `supply` heatmap tile, at slippy map `z/x/y`.
+
+    Tiles are JSON `{"size": n, "cells": [[column, row, count], ...]}`
+    for the tile's n x n cells. Send the ETag back as `If-None-Match`
+    to get a 304 while the tile is unchanged.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error_response("Authentication required.", 401)
+
+        layer, zoom, x, y = kwargs["layer"], kwargs["z"], kwargs["x"], kwargs["y"]
+
+        if layer not in heatmap.layers or zoom > HEATMAP_MAX_ZOOM or x >= 1 << zoom or y >= 1 << zoom:
+            return error_response("No such tile.", 404)
+
+        heatmap.sync()
+        etag = heatmap.etag(layer, zoom, x, y)
+
+        # Weak tags match too: compressed responses weaken the ETag.
+        if etag in [
+            tag[2:] if tag.startswith("W/") else tag
+            for tag in parse_etags(request.headers.get("If-None-Match", ""))
+        ]:
+            response = HttpResponseNotModified()
+        else:
+            etag, body = heatmap.render(layer, zoom, x, y)
+            response = HttpResponse(body, content_type="application/json")
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+
+        return response
+
+
+class MetricsApiView(View):
+    """Per-process counters, e.g. how many computations were coalesced."""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            return error_response("Staff access required.", 403)
+
+        return JsonResponse(
+            {"single_flight": single_flight.metrics},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
@@ -0,0 +1,460 @@
+"""Monthly ride partitions, archived to compressed columnar files.
+
+Rides are partitioned by the calendar month they were requested in
+(`requested_at`, in the current time zone). Once a month is over, and
+none of its rides is still open, `archive_month()` writes its rides and
+their GPS track segments to one file in `RIDE_ARCHIVE_DIR` and deletes
+them from the database, so the online tables, and their indexes, only
+hold the last few months.
+
+An archive file is `ARCHIVE_MAGIC`, the length of a JSON header, the
+header, then one zlib-compressed block per column. The header holds
+each block's dtype, offset and size and the file's range of request
+times and ride ids. Files are memory-mapped, and a column is only read
+and decompressed when a query needs it, so a report touching three
+columns of a month reads three blocks.
+
+`RideHistory` is the read side for reports: the rides requested in a
+time range, matching some filters, from the database and the archive
+alike.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from .cache import LRUCache
+from .db import immediate_atomic
+from .models import Ride, TrackSegment
+from .telemetry import MICRODEGREES, decode_points
+
+ARCHIVE_MAGIC = b"TAXICOL1"
+ARCHIVE_COMPRESSION_LEVEL = 6
+ARCHIVE_OPEN_FILES = 24
+ARCHIVE_DELETE_BATCH_SIZE = 500
+ARCHIVE_FILENAME = re.compile(r"^rides-(\d{4})-(\d{2})\.tcol$")
+NULL_INT = np.iinfo(np.int64).min
+
+STATUSES = [value for value, _ in Ride.STATUS_CHOICES]
+RIDE_COLUMNS = {
+    "id": "<i8",
+    "requested_by_id": "<i8",
+    "pickup_latitude": "<f8",
+    "pickup_longitude": "<f8",
+    "dropoff_latitude": "<f8",
+    "dropoff_longitude": "<f8",
+    "status": "u1",
+    "driver_id": "<i8",
+    "car_id": "<i8",
+    "pickup_distance_km": "<f8",
+    "pickup_eta_seconds": "<i8",
+    "surge_multiplier": "<f8",
+    # Microseconds since the epoch.
+    "requested_at": "<i8",
+    "assigned_at": "<i8",
+}
+TIME_COLUMNS = ("requested_at", "assigned_at")
+SEGMENT_COLUMNS = ("ride_id", "start_time", "end_time", "point_count")
+
+
+def month_start(moment):
+    """Start of the month `moment` (aware) is in, in the current time zone."""
+    local = timezone.localtime(moment)
+
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def next_month(start):
+    return month_start(start + timedelta(days=32))
+
+
+def archive_path(start):
+    return os.path.join(settings.RIDE_ARCHIVE_DIR, f"rides-{start:%Y-%m}.tcol")
+
+
+def to_microseconds(moment):
+    return NULL_INT if moment is None else round(moment.timestamp() * 1_000_000)
+
+
+def from_microseconds(value):
+    if value == NULL_INT:
+        return None
+
+    return datetime.fromtimestamp(value / 1_000_000, tz=dt_timezone.utc)
+
+
+def encode_column(name, values):
+    """Ride field values, as stored in `RIDE_COLUMNS[name]`."""
+    if name in TIME_COLUMNS:
+        values = [to_microseconds(value) for value in values]
+    elif name == "status":
+        values = [STATUSES.index(value) for value in values]
+    elif RIDE_COLUMNS[name] != "<f8":
+        values = [NULL_INT if value is None else value for value in values]
+
+    # Float columns turn None into NaN by themselves.
+    return np.array(values, dtype=RIDE_COLUMNS[name])
+
+
+def decode_value(name, value):
+    if name in TIME_COLUMNS:
+        return from_microseconds(int(value))
+
+    if name == "status":
+        return STATUSES[value]
+
+    if RIDE_COLUMNS[name] == "<f8":
+        return None if np.isnan(value) else float(value)
+
+    return None if value == NULL_INT else int(value)
+
+
+def write_archive(path, tables, meta):
+    """Write `{table: {column: array}}` and `meta` to `path`, atomically."""
+    blocks = []
+    layout = {}
+    offset = 0
+
+    for table, columns in tables.items():
+        layout[table] = {}
+
+        for name, array in columns.items():
+            array = np.ascontiguousarray(array)
+            block = zlib.compress(array.tobytes(), ARCHIVE_COMPRESSION_LEVEL)
+            layout[table][name] = {"dtype": array.dtype.str, "offset": offset, "size": len(block)}
+            blocks.append(block)
+            offset += len(block)
+
+    header = json.dumps({**meta, "tables": layout}, separators=(",", ":")).encode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path + ".part", "wb") as archive:
+        archive.write(ARCHIVE_MAGIC + struct.pack("<Q", len(header)) + header)
+
+        for block in blocks:
+            archive.write(block)
+
+        archive.flush()
+        os.fsync(archive.fileno())
+
+    os.replace(path + ".part", path)
+
+
+class ArchiveFile:
+    """A memory-mapped archive; columns are decompressed on first use."""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as archive:
+            self.map = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            raise ValueError(f"{path} is not a ride archive.")
+
+        (length,) = struct.unpack_from("<Q", self.map, len(ARCHIVE_MAGIC))
+        self.data_offset = len(ARCHIVE_MAGIC) + 8 + length
+        self.header = json.loads(self.map[len(ARCHIVE_MAGIC) + 8:self.data_offset])
+        self.columns = {}
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def column(self, table, name):
+        key = (table, name)
+
+        if key not in self.columns:
+            block = self.header["tables"][table][name]
+            start = self.data_offset + block["offset"]
+            array = np.frombuffer(zlib.decompress(self.map[start:start + block["size"]]), dtype=block["dtype"])
+            array.setflags(write=False)
+            self.columns[key] = array
+
+        return self.columns[key]
+
+    def tables(self):
+        """All columns, decompressed, e.g. to merge into a new file."""
+        return {
+            table: {name: self.column(table, name) for name in columns}
+            for table, columns in self.header["tables"].items()
+        }
+
+    def segments(self, ride_id):
+        """Encoded track segments of a ride, oldest first."""
+        rides = self.column("segments", "ride_id")
+        offsets = self.column("segments", "data_offsets")
+        data = self.column("segments", "data")
+
+        return [
+            data[offsets[index]:offsets[index + 1]].tobytes()
+            for index in np.flatnonzero(rides == ride_id)
+        ]
+
+
+open_archives = LRUCache(ARCHIVE_OPEN_FILES)
+
+
+def open_archive(path):
+    """A cached `ArchiveFile`, reopened when the file is replaced."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    archive = open_archives.get(key)
+
+    if archive is None:
+        archive = ArchiveFile(path)
+        open_archives.set(key, archive)
+
+    return archive
+
+
+def archived_months():
+    """Starts of the archived months, oldest first."""
+    try:
+        names = os.listdir(settings.RIDE_ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+
+    return sorted(
+        timezone.make_aware(datetime(int(match[1]), int(match[2]), 1))
+        for match in map(ARCHIVE_FILENAME.match, names)
+        if match
+    )
+
+
+def closed_months(keep_months, now=None):
+    """Starts of the months that can be archived, keeping the last `keep_months`."""
+    now = now or timezone.now()
+    cutoff = month_start(now)
+
+    for _ in range(keep_months):
+        cutoff = month_start(cutoff - timedelta(days=1))
+
+    oldest = Ride.objects.filter(requested_at__lt=cutoff).aggregate(oldest=Min("requested_at"))["oldest"]
+    months = []
+    start = None if oldest is None else month_start(oldest)
+
+    while start is not None and start < cutoff:
+        end = next_month(start)
+        rides = Ride.objects.filter(requested_at__gte=start, requested_at__lt=end)
+
+        # Rides still open keep their month online.
+        if rides.exists() and not rides.filter(status__in=[Ride.REQUESTED, Ride.ASSIGNED]).exists():
+            months.append(start)
+
+        start = end
+
+    return months
+
+
+def archive_month(start):
+    """Move a month's rides and track segments to its archive file.
+
+    Merges with the month's existing file, if any. Returns the number
+    of rides moved.
+    """
+    end = next_month(start)
+    path = archive_path(start)
+    rides = Ride.objects.filter(requested_at__gte=start, requested_at__lt=end)
+    rows = list(rides.order_by("requested_at", "pk").values_list(*RIDE_COLUMNS))
+
+    if not rows:
+        return 0
+
+    segments = list(
+        TrackSegment.objects
+        .filter(ride__in=rides)
+        .order_by("ride_id", "start_time")
+        .values_list(*SEGMENT_COLUMNS, "data")
+    )
+    blobs = [bytes(segment[-1]) for segment in segments]
+    tables = {
+        "rides": {name: encode_column(name, values) for name, values in zip(RIDE_COLUMNS, zip(*rows))},
+        "segments": {
+            **{
+                name: np.array([segment[index] for segment in segments], dtype="<i8")
+                for index, name in enumerate(SEGMENT_COLUMNS)
+            },
+            "data_offsets": np.cumsum([0] + [len(blob) for blob in blobs], dtype="<i8"),
+            "data": np.frombuffer(b"".join(blobs), dtype="u1"),
+        },
+    }
+
+    if os.path.exists(path):
+        tables = merge_tables(open_archive(path).tables(), tables)
+
+    requested_at = tables["rides"]["requested_at"]
+    ride_ids = tables["rides"]["id"]
+    write_archive(path, tables, {
+        "month": f"{start:%Y-%m}",
+        "rows": len(ride_ids),
+        "requested_at": [int(requested_at.min()), int(requested_at.max())],
+        "ride_ids": [int(ride_ids.min()), int(ride_ids.max())],
+    })
+
+    ids = [row[0] for row in rows]
+
+    for offset in range(0, len(ids), ARCHIVE_DELETE_BATCH_SIZE):
+        with immediate_atomic():
+            # Cascades to the track segments.
+            Ride.objects.filter(pk__in=ids[offset:offset + ARCHIVE_DELETE_BATCH_SIZE]).delete()
+
+    return len(ids)
+
+
+def merge_tables(old, new):
+    """`old` archive tables plus `new` ones, which win for the same rides."""
+    replaced = np.isin(old["rides"]["id"], new["rides"]["id"])
+    rides = {
+        name: np.concatenate([old["rides"][name][~replaced], new["rides"][name]])
+        for name in RIDE_COLUMNS
+    }
+    order = np.lexsort((rides["id"], rides["requested_at"]))
+
+    old_segments, new_segments = old["segments"], new["segments"]
+    kept = ~np.isin(old_segments["ride_id"], new["rides"]["id"])
+    offsets = old_segments["data_offsets"]
+    blobs = [
+        old_segments["data"][offsets[index]:offsets[index + 1]] for index in np.flatnonzero(kept)
+    ] + [
+        new_segments["data"][new_segments["data_offsets"][index]:new_segments["data_offsets"][index + 1]]
+        for index in range(len(new_segments["ride_id"]))
+    ]
+    segments = {
+        name: np.concatenate([old_segments[name][kept], new_segments[name]]) for name in SEGMENT_COLUMNS
+    }
+    segment_order = np.lexsort((segments["start_time"], segments["ride_id"]))
+    blobs = [blobs[index] for index in segment_order]
+
+    return {
+        "rides": {name: column[order] for name, column in rides.items()},
+        "segments": {
+            **{name: column[segment_order] for name, column in segments.items()},
+            "data_offsets": np.cumsum([0] + [len(blob) for blob in blobs], dtype="<i8"),
+            "data": np.concatenate(blobs or [np.empty(0, dtype="u1")]),
+        },
+    }
+
+
+class RideHistory:
+    """Rides requested in `[since, until)`, from the database and the archive.
+
+    `filters` are equalities on `RIDE_COLUMNS`, such as `status` or
+    `driver_id`. Archived months come first, then the online rows.
+    """
+
+    def __init__(self, since=None, until=None, **filters):
+        unknown = set(filters) - set(RIDE_COLUMNS)
+
+        if unknown:
+            raise ValueError(f"Can't filter on {', '.join(sorted(unknown))}.")
+
+        self.since = since
+        self.until = until
+        self.filters = filters
+
+    def queryset(self):
+        rides = Ride.objects.order_by("requested_at", "pk").filter(**self.filters)
+
+        if self.since is not None:
+            rides = rides.filter(requested_at__gte=self.since)
+
+        if self.until is not None:
+            rides = rides.filter(requested_at__lt=self.until)
+
+        return rides
+
+    def archives(self):
+        since = NULL_INT if self.since is None else to_microseconds(self.since)
+        until = np.iinfo(np.int64).max if self.until is None else to_microseconds(self.until)
+
+        for start in archived_months():
+            if (self.until is not None and start >= self.until) or (
+                self.since is not None and next_month(start) <= self.since
+            ):
+                continue
+
+            archive = open_archive(archive_path(start))
+            first, last = archive.header["requested_at"]
+
+            if last >= since and first < until:
+                yield archive, since, until
+
+    def archived(self):
+        """`(archive, selected rows)` pairs; selections are slices when unfiltered."""
+        for archive, since, until in self.archives():
+            requested_at = archive.column("rides", "requested_at")
+            # Rows are sorted by request time.
+            selected = slice(*np.searchsorted(requested_at, [since, until]))
+
+            if self.filters:
+                mask = np.zeros(len(archive), dtype=bool)
+                mask[selected] = True
+
+                for name, value in self.filters.items():
+                    mask &= archive.column("rides", name) == encode_column(name, [value])[0]
+
+                selected = np.flatnonzero(mask)
+
+            yield archive, selected
+
+    def columns(self, *fields):
+        """`{field: array}` of the matching rides, encoded as in the archive."""
+        fields = fields or tuple(RIDE_COLUMNS)
+        parts = {name: [] for name in fields}
+
+        for archive, selected in self.archived():
+            for name in fields:
+                parts[name].append(archive.column("rides", name)[selected])
+
+        rows = list(self.queryset().values_list(*fields))
+
+        for name, values in zip(fields, zip(*rows) if rows else [[]] * len(fields)):
+            parts[name].append(encode_column(name, values))
+
+        return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+    def count(self):
+        archived = sum(
+            len(range(*selected.indices(len(archive)))) if isinstance(selected, slice) else len(selected)
+            for archive, selected in self.archived()
+        )
+
+        return archived + self.queryset().count()
+
+    def __iter__(self):
+        """Rides as dicts of `RIDE_COLUMNS`."""
+        for archive, selected in self.archived():
+            columns = {name: archive.column("rides", name)[selected].tolist() for name in RIDE_COLUMNS}
+
+            for values in zip(*columns.values()):
+                yield {name: decode_value(name, value) for name, value in zip(RIDE_COLUMNS, values)}
+
+        yield from self.queryset().values(*RIDE_COLUMNS).iterator()
+
+
+def track_points(ride_id):
+    """A ride's GPS track like `Track.points()`, wherever it is stored."""
+    data = list(TrackSegment.objects.filter(ride_id=ride_id).order_by("start_time").values_list("data", flat=True))
+
+    if not data:
+        for start in archived_months():
+            archive = open_archive(archive_path(start))
+            first, last = archive.header["ride_ids"]
+
+            if first <= ride_id <= last:
+                data = archive.segments(ride_id)
+
+                if data:
+                    break
+
+    points = np.concatenate([decode_points(bytes(blob)) for blob in data] or [np.empty((0, 3), dtype=np.int64)])
+
+    return np.column_stack([points[:, 0], points[:, 1:] / MICRODEGREES])
@@ -0,0 +1,290 @@
+"""Audit trail of cars, drivers and manufacturers.
+
+Every instance of an audited model keeps a snapshot of its audited
+fields from when it was loaded (`post_init`), so saving it can record a
+`{field: [old, new]}` diff without reading the row again; `m2m_changed`
+records the drivers added to and removed from a car. Bulk writes send
+no signals, so the code making them records them with `record_bulk_*`.
+
+Entries are not written in the request: they join a per-process buffer
+once their transaction commits (changes rolled back leave no trace),
+and a background thread bulk-inserts the buffer every
+`AUDIT_FLUSH_INTERVAL` seconds, or as soon as it holds
+`AUDIT_FLUSH_SIZE` entries. With an interval of 0 the committing thread
+flushes instead. Entries still buffered when a process dies are lost;
+`atexit` flushes them on a clean shutdown.
+"""
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .models import AuditEntry, Car, Driver, Manufacturer
+
+logger = logging.getLogger(__name__)
+
+AUDITED_FIELDS = {
+    Car: ("model", "manufacturer"),
+    Driver: ("username", "first_name", "last_name", "email", "license_number", "is_active", "is_staff"),
+    Manufacturer: ("name", "country"),
+}
+AUDIT_FLUSH_SIZE = 500
+# Entries kept while the database refuses them; the oldest go first.
+AUDIT_MAX_BUFFER = 50_000
+MISSING = object()
+
+# The request being handled, set by AuditContextMiddleware.
+current_request = ContextVar("audit_request", default=None)
+# `(actor id, route)` of changes made outside a request, see `acting_as()`.
+current_actor = ContextVar("audit_actor", default=(None, ""))
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def attnames(model):
+    return [(name, model._meta.get_field(name).attname) for name in AUDITED_FIELDS[model]]
+
+
+def snapshot(instance):
+    # Deferred fields aren't in `__dict__`; loading them would cost a query.
+    return {
+        name: instance.__dict__.get(attname, MISSING)
+        for name, attname in attnames(type(instance))
+    }
+
+
+def diff(before, after, fields=None):
+    return {
+        name: [before[name], value]
+        for name, value in after.items()
+        if (fields is None or name in fields)
+        and value is not MISSING
+        and before.get(name, MISSING) is not MISSING
+        and before[name] != value
+    }
+
+
+def snapshots(queryset):
+    """`{pk: snapshot}` of a queryset's rows, in one query."""
+    fields = attnames(queryset.model)
+
+    return {
+        pk: dict(zip([name for name, _ in fields], values))
+        for pk, *values in queryset.values_list("pk", *[attname for _, attname in fields])
+    }
+
+
+@contextmanager
+def acting_as(actor_id, route):
+    """Attribute the changes made outside a request, e.g. by a job."""
+    token = current_actor.set((actor_id, route))
+
+    try:
+        yield
+    finally:
+        current_actor.reset(token)
+
+
+def make_entry(model, object_id, action, changes):
+    request = current_request.get()
+
+    if request is None:
+        actor_id, route = current_actor.get()
+    else:
+        user = getattr(request, "user", None)
+        match = getattr(request, "resolver_match", None)
+        actor_id = user.pk if user is not None and user.is_authenticated else None
+        route = match.view_name if match else ""
+
+    return AuditEntry(
+        model=model_label(model),
+        object_id=object_id,
+        action=action,
+        changes=changes,
+        actor_id=actor_id,
+        route=route,
+        recorded_at=timezone.now(),
+    )
+
+
+class AuditLog:
+    def __init__(self):
+        self.entries = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def record(self, entry, using="default"):
+        """Buffer `entry` once the current transaction on `using` commits."""
+        transaction.on_commit(lambda: self.add(entry), using=using)
+
+    def record_bulk(self, entries, using="default"):
+        """Buffer `entries` once the current transaction on `using` commits."""
+        if entries:
+            transaction.on_commit(lambda: self.extend(entries), using=using)
+
+    def add(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        with self.lock:
+            self.entries.extend(entries)
+            full = len(self.entries) >= AUDIT_FLUSH_SIZE
+
+        if not settings.AUDIT_FLUSH_INTERVAL:
+            if full:
+                self.flush()
+            return
+
+        self.start()
+
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        """Write the buffered entries; returns how many were written."""
+        with self.flush_lock:
+            with self.lock:
+                entries, self.entries = self.entries, []
+
+            if not entries:
+                return 0
+
+            try:
+                AuditEntry.objects.using("default").bulk_create(entries, batch_size=AUDIT_FLUSH_SIZE)
+            except DatabaseError:
+                logger.exception("Couldn't write %s audit entries, will retry", len(entries))
+
+                with self.lock:
+                    self.entries[:0] = entries
+                    del self.entries[:-AUDIT_MAX_BUFFER]
+
+                return 0
+
+            return len(entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries = []
+
+    def start(self):
+        # A forked worker doesn't inherit its parent's thread.
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+
+        with self.lock:
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="audit-flush", daemon=True)
+                self.pid = os.getpid()
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(settings.AUDIT_FLUSH_INTERVAL)
+            self.wakeup.clear()
+
+            try:
+                self.flush()
+            finally:
+                connections["default"].close_if_unusable_or_obsolete()
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.flush)
+
+
+def audited(instance, using):
+    # Drivers and manufacturers also exist on every shard, as mirrored
+    # copies; only their default-database rows are the real ones.
+    return isinstance(instance, Car) or using == "default"
+
+
+def record_save(instance, created, using, update_fields=None):
+    after = snapshot(instance)
+
+    if audited(instance, using):
+        if created:
+            changes = {name: [None, value] for name, value in after.items() if value is not MISSING}
+        else:
+            changes = diff(vars(instance).get("_audit_snapshot", {}), after, update_fields)
+
+        if created or changes:
+            action = AuditEntry.CREATED if created else AuditEntry.UPDATED
+            audit_log.record(make_entry(type(instance), instance.pk, action, changes), using)
+
+    instance._audit_snapshot = after
+
+
+def record_delete(instance, using):
+    if audited(instance, using):
+        before = vars(instance).get("_audit_snapshot", {})
+        changes = {name: [value, None] for name, value in before.items() if value is not MISSING}
+        audit_log.record(make_entry(type(instance), instance.pk, AuditEntry.DELETED, changes), using)
+
+
+def record_car_drivers(car_id, driver_ids, action, using):
+    audit_log.record(
+        make_entry(Car, car_id, AuditEntry.ADDED if action == "added" else AuditEntry.REMOVED, {"drivers": driver_ids}),
+        using,
+    )
+
+
+def record_bulk_create(instances, using="default"):
+    """Audit `bulk_create(instances)`, once their pks are set."""
+    audit_log.record_bulk(
+        [
+            make_entry(
+                type(instance),
+                instance.pk,
+                AuditEntry.CREATED,
+                {name: [None, value] for name, value in snapshot(instance).items() if value is not MISSING},
+            )
+            for instance in instances
+            if audited(instance, using)
+        ],
+        using,
+    )
+
+
+def record_bulk_update(instances, before, fields, using="default"):
+    """Audit `bulk_update(instances, fields)`; `before` maps pks to the stored values."""
+    entries = []
+
+    for instance in instances:
+        changes = diff(before[instance.pk], snapshot(instance), fields)
+
+        if changes and audited(instance, using):
+            entries.append(make_entry(type(instance), instance.pk, AuditEntry.UPDATED, changes))
+
+    audit_log.record_bulk(entries, using)
+
+
+def record_bulk_delete(queryset):
+    """Audit the deletion of `queryset`'s rows; call before a raw or bulk delete."""
+    model, using = queryset.model, queryset.db
+
+    if model is not Car and using != "default":
+        return
+
+    audit_log.record_bulk(
+        [
+            make_entry(
+                model,
+                pk,
+                AuditEntry.DELETED,
+                {name: [value, None] for name, value in before.items()},
+            )
+            for pk, before in snapshots(queryset).items()
+        ],
+        using,
+    )
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+FLEET_VERSION_KEY = "taxi:fleet:version"
+SHIFTS_VERSION_KEY = "taxi:shifts:version"
+
+
+def shared_cache():
+    """The cache shared by all workers on the host (`SHARED_CACHE`)."""
+    return caches[getattr(settings, "SHARED_CACHE", "default")]
+
+
+def get_fleet_version():
+    """Version of cached data derived from cars, manufacturers and drivers.
+
+    The initial value is a millisecond timestamp rather than 1, so if the
+    key is evicted the new version can't collide with an old one.
+    """
+    return shared_cache().get_or_set(FLEET_VERSION_KEY, lambda: int(time.time() * 1000), timeout=None)
+
+
+def invalidate_fleet_cache():
+    try:
+        shared_cache().incr(FLEET_VERSION_KEY)
+    except ValueError:
+        get_fleet_version()
+
+
+def get_shifts_version():
+    """Version of the shift schedule, like `get_fleet_version()`."""
+    return shared_cache().get_or_set(SHIFTS_VERSION_KEY, lambda: int(time.time() * 1000), timeout=None)
+
+
+def invalidate_shifts_cache():
+    try:
+        shared_cache().incr(SHIFTS_VERSION_KEY)
+    except ValueError:
+        get_shifts_version()
+
+
+class LRUCache:
+    """A thread-safe, in-process LRU mapping; `get()` returns None on a miss."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,121 @@
+"""Brotli and gzip compression of rendered pages and API responses.
+
+`CompressionMiddleware` picks the coding from `Accept-Encoding` (brotli
+when the optional `brotli` package is installed and the client accepts
+it, otherwise gzip), and compresses responses of `COMPRESSIBLE_TYPES`
+of at least `RESPONSE_COMPRESSION_MIN_BYTES`. Streaming responses are
+compressed chunk by chunk and flushed after each one, so a client gets
+every chunk as soon as it would have uncompressed. Static files are
+left to WhiteNoise, which runs first.
+
+Dynamic pages are compressed at modest levels (`RESPONSE_GZIP_LEVEL`,
+`RESPONSE_BROTLI_QUALITY`): the higher ones cost several times the CPU
+for a few percent less; `manage.py bench_compression` measures both
+per route. CSRF tokens are masked differently in every response, which
+keeps them from leaking through compressed sizes (BREACH).
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/html", "text/plain", "text/csv", "application/json")
+CODINGS = ("br", "gzip") if brotli else ("gzip",)
+# zlib window bits for a gzip header and trailer.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def parse_accept_encoding(header):
+    """`{coding: q}` of an `Accept-Encoding` header."""
+    accepted = {}
+
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+
+        if coding:
+            accepted[coding] = q
+
+    return accepted
+
+
+def negotiate(header, codings=CODINGS):
+    """The first of `codings` the client accepts, with the highest q; None for identity."""
+    accepted = parse_accept_encoding(header or "")
+    best, best_q = None, 0.0
+
+    for coding in codings:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+
+        if q > best_q:
+            best, best_q = coding, q
+
+    return best
+
+
+class Compressor:
+    """An incremental brotli or gzip stream."""
+
+    def __init__(self, coding, level):
+        self.coding = coding
+
+        if coding == "br":
+            self.stream = brotli.Compressor(quality=level)
+        else:
+            self.stream = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    def compress(self, data):
+        if self.coding == "br":
+            return self.stream.process(data)
+
+        return self.stream.compress(data)
+
+    def flush(self):
+        """What's been compressed so far, decodable without what follows."""
+        if self.coding == "br":
+            return self.stream.flush()
+
+        return self.stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.coding == "br":
+            return self.stream.finish()
+
+        return self.stream.flush(zlib.Z_FINISH)
+
+
+def compress(coding, data, level):
+    compressor = Compressor(coding, level)
+
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(coding, chunks, level):
+    compressor = Compressor(coding, level)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+
+        if data:
+            yield data
+
+    yield compressor.finish()
+
+
+def decompress(coding, data):
+    if coding == "br":
+        return brotli.decompress(data)
+
+    return zlib.decompress(data, GZIP_WBITS)
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+
+def configure_sqlite(connection):
+    """Apply `SQLITE_PRAGMAS` to a new SQLite connection.
+
+    WAL lets readers run alongside the single writer, `busy_timeout`
+    makes writers queue instead of failing with "database is locked",
+    and `synchronous=NORMAL` only fsyncs at WAL checkpoints.
+    """
+    if connection.vendor != "sqlite" or not getattr(settings, "SQLITE_TUNING", False):
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """`transaction.atomic()` that takes the SQLite write lock up front.
+
+    A deferred SQLite transaction that reads and then writes has to
+    upgrade its lock, and fails immediately if another connection wrote
+    in between, regardless of `busy_timeout`. `BEGIN IMMEDIATE` waits
+    for the lock instead. Other databases get a plain atomic block.
+    """
+    connection = transaction.get_connection(using)
+
+    if connection.vendor != "sqlite" or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # atomic() opens SQLite transactions through this hook; shadow it
+    # on the instance for the outermost BEGIN only.
+    connection._start_transaction_under_autocommit = (
+        lambda: connection.cursor().execute("BEGIN IMMEDIATE")
+    )
+
+    try:
+        with transaction.atomic(using=using):
+            vars(connection).pop("_start_transaction_under_autocommit", None)
+            yield
+    finally:
+        vars(connection).pop("_start_transaction_under_autocommit", None)
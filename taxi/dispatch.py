@@ -0,0 +1,313 @@
+"""Ride dispatch: match pending rides to nearby available drivers.
+
+`dispatch_batch()` takes up to `DISPATCH_BATCH_SIZE` pending rides at
+once. It matches them to available drivers from `driver_index`, using
+NumPy distance matrices and a greedy assignment. The greedy step
+commits the globally shortest pickup first, then the next shortest
+among the rides and drivers still free, and so on.
+
+To keep the matrices small, rides and drivers are bucketed into tiles
+one search radius wide, so each ride is only compared with drivers in
+its own and the eight neighbouring tiles, and only its
+`DISPATCH_CANDIDATES` nearest are kept. Matching first runs with a
+short radius, then the rides left over are retried with the longer
+ones in `DISPATCH_RADII_KM`.
+
+With a road graph configured (`taxi.eta`), candidates are ranked by
+their driving time to the pickup rather than straight-line distance.
+
+Run a single dispatcher process (`manage.py dispatch_rides`). Rides
+assigned concurrently are detected, but two dispatchers would compete
+for the same drivers.
+"""
+import math
+
+import numpy as np
+from django.utils import timezone
+
+from .cache import get_fleet_version
+from .db import immediate_atomic
+from .eta import eta_engine
+from .events import publish_on_commit
+from .locations import KM_PER_DEGREE, driver_index
+from .models import Car, Ride
+from .sharding import scatter
+from .shifts import shift_schedule
+
+DISPATCH_BATCH_SIZE = 2000
+DISPATCH_RADII_KM = (1.0, 5.0)
+# Nearest drivers kept per ride and radius for the assignment step.
+DISPATCH_CANDIDATES = 8
+
+_TILE_KEY_OFFSET = 2 ** 31
+
+
+def _tile_keys(rows, cols):
+    return rows * 2 ** 32 + (cols + _TILE_KEY_OFFSET)
+
+
+def candidate_pairs(ride_points, driver_points, radius_km, candidates=DISPATCH_CANDIDATES):
+    """`(ride_indexes, driver_indexes, distances_km)` of close ride/driver pairs.
+
+    For each ride, at most `candidates` of the nearest drivers within
+    `radius_km` are kept. Distances are equirectangular, which is
+    accurate to well under a metre at these ranges.
+    """
+    empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+
+    if not len(ride_points) or not len(driver_points):
+        return empty
+
+    tile_latitude = radius_km / KM_PER_DEGREE
+    highest = max(np.abs(ride_points[:, 0]).max(), np.abs(driver_points[:, 0]).max())
+    # Wide enough for the radius even at the most poleward point.
+    tile_longitude = tile_latitude / max(math.cos(math.radians(highest)), 0.1)
+
+    driver_keys = _tile_keys(
+        np.floor(driver_points[:, 0] / tile_latitude).astype(np.int64),
+        np.floor(driver_points[:, 1] / tile_longitude).astype(np.int64),
+    )
+    driver_order = np.argsort(driver_keys, kind="stable")
+    driver_keys = driver_keys[driver_order]
+
+    ride_rows = np.floor(ride_points[:, 0] / tile_latitude).astype(np.int64)
+    ride_cols = np.floor(ride_points[:, 1] / tile_longitude).astype(np.int64)
+    ride_order = np.argsort(_tile_keys(ride_rows, ride_cols), kind="stable")
+    tile_starts = np.flatnonzero(
+        np.diff(_tile_keys(ride_rows, ride_cols)[ride_order], prepend=-1)
+    )
+
+    neighbours = np.array([(row, col) for row in (-1, 0, 1) for col in (-1, 0, 1)])
+    pairs = []
+
+    for rides in np.split(ride_order, tile_starts[1:]):
+        row, col = ride_rows[rides[0]], ride_cols[rides[0]]
+        keys = _tile_keys(row + neighbours[:, 0], col + neighbours[:, 1])
+        starts = np.searchsorted(driver_keys, keys, side="left")
+        stops = np.searchsorted(driver_keys, keys, side="right")
+        drivers = np.concatenate(
+            [driver_order[start:stop] for start, stop in zip(starts, stops) if stop > start]
+            or [np.empty(0, dtype=np.int64)]
+        )
+
+        if not len(drivers):
+            continue
+
+        latitudes = ride_points[rides, 0][:, None]
+        dy = driver_points[drivers, 0][None, :] - latitudes
+        dx = (driver_points[drivers, 1][None, :] - ride_points[rides, 1][:, None]) * np.cos(
+            np.radians(latitudes)
+        )
+        distances = np.hypot(dx, dy) * KM_PER_DEGREE
+        distances[distances > radius_km] = np.inf
+
+        if len(drivers) > candidates:
+            nearest = np.argpartition(distances, candidates - 1, axis=1)[:, :candidates]
+        else:
+            nearest = np.broadcast_to(np.arange(len(drivers)), distances.shape)
+
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        found = np.isfinite(nearest_distances)
+        pairs.append((
+            np.broadcast_to(rides[:, None], nearest.shape)[found],
+            drivers[nearest[found]],
+            nearest_distances[found],
+        ))
+
+    if not pairs:
+        return empty
+
+    return tuple(np.concatenate(column) for column in zip(*pairs))
+
+
+def greedy_match(ride_indexes, driver_indexes, distances, costs=None):
+    """Pick pairs cheapest first, skipping rides or drivers already matched.
+
+    Pairs cost their distance unless `costs` are given; pairs with an
+    infinite cost (a pickup the driver can't reach) are never picked.
+    """
+    costs = distances if costs is None else np.asarray(costs)
+    order = np.argsort(costs, kind="stable")
+    order = order[np.isfinite(costs[order])]
+    matched_rides = set()
+    matched_drivers = set()
+    matches = []
+
+    for ride, driver, distance in zip(
+        ride_indexes[order].tolist(), driver_indexes[order].tolist(), distances[order].tolist()
+    ):
+        if ride in matched_rides or driver in matched_drivers:
+            continue
+
+        matched_rides.add(ride)
+        matched_drivers.add(driver)
+        matches.append((ride, driver, distance))
+
+    return matches
+
+
+def assign(
+    ride_points,
+    driver_points,
+    radii=DISPATCH_RADII_KM,
+    candidates=DISPATCH_CANDIDATES,
+    travel_times=None,
+):
+    """Match rides to drivers; `(ride_index, driver_index, distance_km)` triples.
+
+    Both arguments are sequences of `(latitude, longitude)`. Candidate
+    pairs are ranked by `travel_times(driver_points, ride_points)`, if
+    given, instead of by distance.
+    """
+    ride_points = np.asarray(ride_points, dtype=float).reshape(-1, 2)
+    driver_points = np.asarray(driver_points, dtype=float).reshape(-1, 2)
+    waiting = np.arange(len(ride_points))
+    free = np.arange(len(driver_points))
+    matches = []
+
+    for radius in radii:
+        # Rides whose candidates were all taken get another round with
+        # the drivers still free, until a round matches nothing.
+        while len(waiting) and len(free):
+            rides, drivers, distances = candidate_pairs(
+                ride_points[waiting], driver_points[free], radius, candidates
+            )
+            costs = None
+
+            if travel_times is not None and len(rides):
+                costs = travel_times(driver_points[free][drivers], ride_points[waiting][rides])
+
+            found = greedy_match(rides, drivers, distances, costs)
+
+            if not found:
+                break
+
+            matches.extend(
+                (waiting[ride], free[driver], distance) for ride, driver, distance in found
+            )
+            waiting = np.delete(waiting, [ride for ride, _, _ in found])
+            free = np.delete(free, [driver for _, driver, _ in found])
+
+    return [(int(ride), int(driver), distance) for ride, driver, distance in matches]
+
+
+class DriverCars:
+    """Driver -> car to dispatch them with (their lowest-id car).
+
+    Reloaded whenever the fleet version changes, i.e. after any change
+    to cars or their drivers.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.cars = {}
+
+    def get(self):
+        version = get_fleet_version()
+
+        if version != self.version:
+            cars = {}
+
+            for queryset in scatter(Car.drivers.through.objects.order_by()):
+                for driver_id, car_id in queryset.values_list("driver_id", "car_id").iterator():
+                    if car_id < cars.get(driver_id, math.inf):
+                        cars[driver_id] = car_id
+
+            self.cars, self.version = cars, version
+
+        return self.cars
+
+
+driver_cars = DriverCars()
+
+
+def dispatch_batch(limit=DISPATCH_BATCH_SIZE):
+    """Assign the oldest pending rides; returns how many were assigned."""
+    pending = list(
+        Ride.objects
+        .filter(status=Ride.REQUESTED)
+        .order_by("requested_at", "pk")
+        .values_list("pk", "pickup_latitude", "pickup_longitude")[:limit]
+    )
+
+    if not pending:
+        return 0
+
+    # Drivers on shift drive their shift's car; the others any car
+    # they are attached to that nobody has a shift on right now.
+    on_shift = shift_schedule.cars_at()
+    taken = set(on_shift.values())
+    cars = {driver_id: car_id for driver_id, car_id in driver_cars.get().items() if car_id not in taken}
+    cars.update(on_shift)
+    busy = set(
+        Ride.objects.filter(status=Ride.ASSIGNED).values_list("driver_id", flat=True)
+    )
+    driver_ids, latitudes, longitudes = driver_index.snapshot()
+    available = [
+        index for index, driver_id in enumerate(driver_ids)
+        if driver_id in cars and driver_id not in busy
+    ]
+
+    ride_points = [(latitude, longitude) for _, latitude, longitude in pending]
+    driver_points = [(latitudes[index], longitudes[index]) for index in available]
+    travel_times = eta_engine.travel_times if eta_engine.get_graph() is not None else None
+    matches = assign(ride_points, driver_points, travel_times=travel_times)
+
+    if not matches:
+        return 0
+
+    etas = [None] * len(matches)
+
+    if travel_times is not None:
+        # Cached by the ranking above.
+        etas = travel_times(
+            [driver_points[driver] for _, driver, _ in matches],
+            [ride_points[ride] for ride, _, _ in matches],
+        ).tolist()
+
+    assigned = {
+        pending[ride][0]: (driver_ids[available[driver]], distance, eta)
+        for (ride, driver, distance), eta in zip(matches, etas)
+    }
+    now = timezone.now()
+
+    with immediate_atomic():
+        # Rides cancelled, or drivers assigned, since the batch was read.
+        still_pending = set(
+            Ride.objects
+            .filter(pk__in=list(assigned), status=Ride.REQUESTED)
+            .values_list("pk", flat=True)
+        )
+        now_busy = set(
+            Ride.objects
+            .filter(status=Ride.ASSIGNED, driver_id__in=[driver for driver, _, _ in assigned.values()])
+            .values_list("driver_id", flat=True)
+        )
+        rides = [
+            Ride(
+                pk=ride_id,
+                status=Ride.ASSIGNED,
+                driver_id=driver_id,
+                car_id=cars[driver_id],
+                pickup_distance_km=round(distance, 3),
+                pickup_eta_seconds=None if eta is None else round(eta),
+                assigned_at=now,
+            )
+            for ride_id, (driver_id, distance, eta) in assigned.items()
+            if ride_id in still_pending and driver_id not in now_busy
+        ]
+        Ride.objects.bulk_update(
+            rides,
+            ["status", "driver", "car", "pickup_distance_km", "pickup_eta_seconds", "assigned_at"],
+            batch_size=500,
+        )
+
+        for ride in rides:
+            publish_on_commit(
+                "ride.status",
+                {"ride": ride.pk, "status": ride.status, "driver": ride.driver_id, "car": ride.car_id},
+                cars=[ride.car_id],
+                drivers=[ride.driver_id],
+            )
+
+    return len(rides)
@@ -0,0 +1,417 @@
+"""Travel-time estimates on a road network.
+
+`RoadGraph` holds a directed road graph as compressed sparse row (CSR)
+arrays: the roads leaving node `u` are `targets[offsets[u]:offsets[u + 1]]`
+and take `seconds[...]` to drive. Point-to-point queries run A* with
+ALT bounds (A*, landmarks and the triangle inequality): travel times
+from and to a few far-apart landmark nodes are precomputed, and
+
+    d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+
+give a lower bound much tighter than straight-line distance, so far
+fewer nodes are searched. Bounds are only computed for the nodes a
+search reaches, so a query does no work per node of the whole graph.
+Results are kept in an LRU cache keyed by the origin and destination
+nodes.
+
+Graphs are `.npz` files with per-node `latitudes` and `longitudes`
+and per-road `sources`, `targets` and `seconds`, plus the landmark
+tables once computed (`manage.py bench_eta --save` writes one for a
+synthetic city). `eta_engine` loads `settings.ROAD_GRAPH_PATH`; with no
+graph configured, it returns None and callers keep straight-line
+distances.
+"""
+import heapq
+import math
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .cache import LRUCache
+from .locations import KM_PER_DEGREE, SpatialIndex
+
+ETA_CACHE_SIZE = 100_000
+ETA_LANDMARKS = 16
+# Landmarks used per query: those with the best bound for its endpoints.
+ETA_ACTIVE_LANDMARKS = 4
+# From a point to its nearest road node, and from the last node on.
+ACCESS_SPEED_KMH = 15
+# Destinations with at least this many uncached origins get one
+# backward Dijkstra search instead of an A* search per origin.
+MANY_ORIGINS = 4
+
+
+def csr(node_count, sources, targets, seconds):
+    """`(offsets, targets, seconds)` arrays of edges grouped by source."""
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+
+    return offsets, targets[order].astype(np.int32), seconds[order].astype(np.float32)
+
+
+class RoadGraph:
+    def __init__(
+        self,
+        latitudes,
+        longitudes,
+        sources,
+        targets,
+        seconds,
+        landmarks=None,
+        from_landmarks=None,
+        to_landmarks=None,
+    ):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        node_count = len(self.latitudes)
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        seconds = np.asarray(seconds, dtype=np.float32)
+
+        self.offsets, self.targets, self.seconds = csr(node_count, sources, targets, seconds)
+        self.reverse = csr(node_count, targets, sources, seconds)
+        # Searches index these millions of times. Memoryviews of the
+        # arrays index about as fast as lists and give Python numbers,
+        # without a second copy of the graph.
+        self.forward = tuple(memoryview(array) for array in (self.offsets, self.targets, self.seconds))
+        self.backward = tuple(memoryview(array) for array in self.reverse)
+
+        edge_km = np.hypot(
+            self.latitudes[targets] - self.latitudes[sources],
+            (self.longitudes[targets] - self.longitudes[sources])
+            * np.cos(np.radians(self.latitudes[sources])),
+        ) * KM_PER_DEGREE
+        self.max_speed = float((edge_km / np.maximum(seconds, 1e-3)).max()) if len(seconds) else 1.0
+
+        self.nodes = SpatialIndex()
+
+        for node, (latitude, longitude) in enumerate(zip(self.latitudes.tolist(), self.longitudes.tolist())):
+            self.nodes.update(node, latitude, longitude, 0)
+
+        self.landmarks = None if landmarks is None else np.asarray(landmarks)
+        self.from_landmarks = None if from_landmarks is None else np.ascontiguousarray(from_landmarks)
+        self.to_landmarks = None if to_landmarks is None else np.ascontiguousarray(to_landmarks)
+        self.cache = LRUCache(ETA_CACHE_SIZE)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+
+        return cls(**arrays)
+
+    def save(self, path):
+        arrays = {
+            "latitudes": self.latitudes,
+            "longitudes": self.longitudes,
+            "sources": np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.offsets)),
+            "targets": self.targets,
+            "seconds": self.seconds,
+        }
+
+        if self.landmarks is not None:
+            arrays.update(
+                landmarks=self.landmarks,
+                from_landmarks=self.from_landmarks,
+                to_landmarks=self.to_landmarks,
+            )
+
+        np.savez_compressed(path, **arrays)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def dijkstra(self, source, backward=False, wanted=None):
+        """Travel times from `source` (to it, if `backward`).
+
+        Returns an array for all nodes, or, with `wanted`, a dict for
+        those nodes, stopping as soon as all of them are reached.
+        """
+        offsets, targets, seconds = self.backward if backward else self.forward
+        best = {source: 0.0}
+        done = set()
+        remaining = None if wanted is None else set(wanted)
+        heap = [(0.0, source)]
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+
+            if node in done:
+                continue
+
+            done.add(node)
+
+            if remaining is not None:
+                remaining.discard(node)
+
+                if not remaining:
+                    break
+
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[edge]
+                new_cost = cost + seconds[edge]
+
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour))
+
+        if wanted is not None:
+            return {node: best[node] if node in done else math.inf for node in wanted}
+
+        times = np.full(len(self), np.inf)
+        times[list(done)] = [best[node] for node in done]
+
+        return times
+
+    def precompute_landmarks(self, count=ETA_LANDMARKS, seed=0):
+        """Pick far-apart landmarks and tabulate travel times from and to them."""
+        rng = np.random.default_rng(seed)
+        landmarks = []
+        # Distance (in travel time) to the nearest landmark picked so far.
+        nearest = self.dijkstra(int(rng.integers(len(self))))
+        from_landmarks, to_landmarks = [], []
+
+        for _ in range(min(count, len(self))):
+            reachable = np.where(np.isfinite(nearest), nearest, -1)
+            landmark = int(np.argmax(reachable))
+            landmarks.append(landmark)
+            from_landmarks.append(self.dijkstra(landmark))
+            to_landmarks.append(self.dijkstra(landmark, backward=True))
+            nearest = np.minimum(nearest, from_landmarks[-1])
+
+        self.landmarks = np.array(landmarks)
+        self.from_landmarks = np.array(from_landmarks, dtype=np.float32)
+        self.to_landmarks = np.array(to_landmarks, dtype=np.float32)
+        self.cache.clear()
+
+    def heuristic(self, origin, destination):
+        """A function giving a lower bound of the time from a node to `destination`."""
+        if self.landmarks is None:
+            latitudes, longitudes = memoryview(self.latitudes), memoryview(self.longitudes)
+            latitude, longitude = latitudes[destination], longitudes[destination]
+            scale = math.cos(math.radians(latitude))
+            seconds_per_degree = KM_PER_DEGREE / self.max_speed
+
+            def bound(node):
+                return math.hypot(
+                    latitudes[node] - latitude, (longitudes[node] - longitude) * scale
+                ) * seconds_per_degree
+
+            return bound
+
+        with np.errstate(invalid="ignore"):
+            bounds = np.fmax(
+                self.from_landmarks[:, destination] - self.from_landmarks[:, origin],
+                self.to_landmarks[:, origin] - self.to_landmarks[:, destination],
+            )
+            active = np.argsort(-np.nan_to_num(bounds, nan=-np.inf))[:ETA_ACTIVE_LANDMARKS]
+
+        tables = [
+            (
+                memoryview(self.from_landmarks[landmark]),
+                float(self.from_landmarks[landmark, destination]),
+                memoryview(self.to_landmarks[landmark]),
+                float(self.to_landmarks[landmark, destination]),
+            )
+            for landmark in active.tolist()
+        ]
+
+        def bound(node):
+            lower = 0.0
+
+            for from_landmark, from_destination, to_landmark, to_destination in tables:
+                # inf - inf (a landmark reaching neither node) is NaN,
+                # which compares false: no bound.
+                for candidate in (from_destination - from_landmark[node], to_landmark[node] - to_destination):
+                    if candidate > lower:
+                        lower = candidate
+
+            return lower
+
+        return bound
+
+    def route_time(self, origin, destination):
+        """Seconds from node `origin` to node `destination` (inf if unreachable)."""
+        if origin == destination:
+            return 0.0
+
+        cached = self.cache.get((origin, destination))
+
+        if cached is not None:
+            return cached
+
+        result, _ = self.search(origin, destination)
+        self.cache.set((origin, destination), result)
+
+        return result
+
+    def search(self, origin, destination):
+        """A* search; returns the travel time and how many nodes it settled."""
+        bound = self.heuristic(origin, destination)
+        offsets, targets, seconds = self.forward
+        best = {origin: 0.0}
+        # Lower bounds of the nodes reached so far, computed as they are.
+        bounds = {}
+        heap = [(bound(origin), 0.0, origin)]
+        settled = 0
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+
+            if node == destination:
+                return cost, settled
+
+            if cost > best[node]:
+                continue
+
+            settled += 1
+
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[edge]
+                new_cost = cost + seconds[edge]
+
+                if new_cost >= best.get(neighbour, math.inf):
+                    continue
+
+                lower = bounds.get(neighbour)
+
+                if lower is None:
+                    lower = bounds[neighbour] = bound(neighbour)
+
+                if lower < math.inf:
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost + lower, new_cost, neighbour))
+
+        return math.inf, settled
+
+    def snap(self, latitude, longitude):
+        """`(node, seconds to reach it)` for the road node nearest a point."""
+        found = self.nodes.nearest(latitude, longitude, k=1)
+
+        if not found:
+            return None, math.inf
+
+        distance, node = found[0]
+
+        return node, distance / ACCESS_SPEED_KMH * 3600
+
+    def travel_times(self, origins, destinations):
+        """Seconds from each origin point to the destination point at its index.
+
+        Both are sequences of `(latitude, longitude)`. Pairs sharing a
+        destination are answered with one backward search when there
+        are enough of them; the others run A* one by one.
+        """
+        origins = [self.snap(*point) for point in origins]
+        destinations = [self.snap(*point) for point in destinations]
+        times = np.full(len(origins), np.inf)
+        by_destination = {}
+
+        for index, ((origin, access), (destination, egress)) in enumerate(zip(origins, destinations)):
+            if origin is None or destination is None:
+                continue
+
+            cached = 0.0 if origin == destination else self.cache.get((origin, destination))
+
+            if cached is not None:
+                times[index] = access + cached + egress
+            else:
+                by_destination.setdefault(destination, []).append(index)
+
+        for destination, indexes in by_destination.items():
+            wanted = {origins[index][0] for index in indexes}
+
+            if len(wanted) >= MANY_ORIGINS:
+                found = self.dijkstra(destination, backward=True, wanted=wanted)
+
+                for origin, seconds in found.items():
+                    self.cache.set((origin, destination), seconds)
+            else:
+                found = {origin: self.route_time(origin, destination) for origin in wanted}
+
+            for index in indexes:
+                origin, access = origins[index]
+                times[index] = access + found[origin] + destinations[index][1]
+
+        return times
+
+
+class EtaEngine:
+    """The road graph from `settings.ROAD_GRAPH_PATH`, loaded on first use."""
+
+    def __init__(self):
+        self.graph = None
+        self.path = None
+        self.lock = threading.Lock()
+
+    def get_graph(self):
+        path = getattr(settings, "ROAD_GRAPH_PATH", None)
+
+        if not path:
+            return None
+
+        if self.path != path:
+            with self.lock:
+                if self.path != path:
+                    self.graph = RoadGraph.load(path)
+                    self.path = path
+
+        return self.graph
+
+    def travel_times(self, origins, destinations):
+        """Seconds per origin/destination pair, or None without a road graph."""
+        graph = self.get_graph()
+
+        if graph is None:
+            return None
+
+        return graph.travel_times(origins, destinations)
+
+
+eta_engine = EtaEngine()
+
+
+def grid_city(rows=100, cols=100, spacing_m=150, seed=0, center=(50.45, 30.52)):
+    """A synthetic city: a street grid with faster avenues and one-way streets.
+
+    Every tenth street is a two-way avenue at 60 km/h; other streets
+    run at 20-40 km/h, every third one is one-way and about 5% of the
+    blocks are missing a side.
+    """
+    rng = np.random.default_rng(seed)
+    step_latitude = spacing_m / 1000 / KM_PER_DEGREE
+    step_longitude = step_latitude / math.cos(math.radians(center[0]))
+    row_index, col_index = np.divmod(np.arange(rows * cols), cols)
+    latitudes = center[0] + (row_index - rows / 2) * step_latitude
+    longitudes = center[1] + (col_index - cols / 2) * step_longitude
+
+    sources, targets, speeds = [], [], []
+
+    for horizontal in (True, False):
+        if horizontal:
+            start = np.flatnonzero(col_index < cols - 1)
+            end, street = start + 1, row_index[start]
+        else:
+            start = np.flatnonzero(row_index < rows - 1)
+            end, street = start + cols, col_index[start]
+
+        avenue = street % 10 == 0
+        speed = np.where(avenue, 60.0, rng.uniform(20, 40, len(start)))
+        kept = avenue | (rng.random(len(start)) > 0.05)
+        one_way = ~avenue & (street % 3 == 1)
+        # One-way streets alternate direction.
+        flipped = one_way & (street % 6 == 4)
+
+        forward = kept & ~flipped
+        backward = kept & (~one_way | flipped)
+        sources += [start[forward], end[backward]]
+        targets += [end[forward], start[backward]]
+        speeds += [speed[forward], speed[backward]]
+
+    sources, targets, speeds = (np.concatenate(parts) for parts in (sources, targets, speeds))
+    seconds = spacing_m / 1000 / speeds * 3600
+
+    return RoadGraph(latitudes, longitudes, sources, targets, seconds)
+
@@ -0,0 +1,472 @@
+"""Live feed of fleet changes as server-sent events.
+
+Changes are published to `broker`, an in-process pub/sub, and streamed
+to subscribers by `event_stream`, which `taxi_service/asgi.py` serves
+at `EVENTS_PATH` when `EVENT_STREAM` is on. Topics:
+
+* `car.drivers`: drivers added to or removed from a car;
+* `driver.location`: a driver's position or availability;
+* `ride.status`: a ride assigned, completed or cancelled.
+
+Each event is serialised once and shared by all its subscribers.
+Subscribers are indexed by the cars and drivers they filter on, so an
+event only visits the subscribers interested in it. Each subscriber
+has a bounded queue: when a slow client falls `EVENT_QUEUE_SIZE` events
+behind, the oldest are dropped and it gets a `lagged` event telling it
+to reload instead of holding memory for it.
+
+With `EVENT_RELAY` on, every event is also stored as a
+`PublishedEvent`, and `relay` polls those every `EVENT_POLL_INTERVAL`
+seconds in the processes that serve the feed or heatmap tiles,
+publishing the other processes' events (WSGI workers, `manage.py
+dispatch_rides`) to their own `broker`. The events published in a
+transaction are stored with one INSERT when it commits.
+`manage.py run_jobs` deletes them once `EVENT_RETENTION` old.
+"""
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.db import DatabaseError, connections, transaction
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+from django.utils import timezone
+
+from .models import PublishedEvent
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = "/api/v1/events/"
+EVENT_TOPICS = ("car.drivers", "driver.location", "ride.status")
+EVENT_QUEUE_SIZE = 100
+EVENT_KEEPALIVE = 15.0
+EVENT_RETRY_MS = 3000
+EVENT_RETENTION = timedelta(minutes=10)
+# Events are stored with their publisher's clock and may commit out of
+# id order: each poll reads back this far, skipping those seen already.
+EVENT_POLL_SLACK = timedelta(seconds=5)
+EVENT_PRUNE_INTERVAL = 60.0
+
+
+class Event:
+    def __init__(self, id, topic, data, keys):
+        self.topic = topic
+        self.keys = keys
+        self.message = (
+            f"id: {id}\nevent: {topic}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        ).encode()
+
+
+class Subscription:
+    """A client's filters and queue; used from its event loop only."""
+
+    def __init__(self, topics=None, keys=None, size=EVENT_QUEUE_SIZE):
+        self.topics = topics
+        self.keys = keys
+        self.queue = collections.deque(maxlen=size)
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def offer(self, event):
+        if self.topics is not None and event.topic not in self.topics:
+            return
+
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+
+        self.queue.append(event)
+        self.ready.set()
+
+    async def get(self):
+        """Wait for events; returns them as one chunk of bytes."""
+        while not self.queue:
+            self.ready.clear()
+            await self.ready.wait()
+
+        chunks = []
+
+        if self.dropped:
+            chunks.append(f"event: lagged\ndata: {{\"dropped\":{self.dropped}}}\n\n".encode())
+            self.dropped = 0
+
+        chunks.extend(event.message for event in self.queue)
+        self.queue.clear()
+
+        return b"".join(chunks)
+
+
+class Broker:
+    """Fans events out to subscriptions on any number of event loops.
+
+    `publish()` may be called from any thread; delivery happens on each
+    subscriber's loop, with one wake-up per loop and event. Listeners
+    (see `listen()`) are called synchronously, in the publishing thread.
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        # loop -> {key or None (unfiltered) -> subscriptions}
+        self.loops = {}
+        self.listeners = []
+
+    def listen(self, listener):
+        """Call `listener(topic, data)` for every event published."""
+        self.listeners.append(listener)
+
+    def subscribe(self, topics=None, keys=None, size=EVENT_QUEUE_SIZE):
+        """Must be called from the event loop that will consume it."""
+        subscription = Subscription(topics, keys, size)
+        loop = asyncio.get_running_loop()
+
+        with self.lock:
+            index = self.loops.setdefault(loop, collections.defaultdict(set))
+
+            for key in keys or [None]:
+                index[key].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        loop = asyncio.get_running_loop()
+
+        with self.lock:
+            index = self.loops.get(loop, {})
+
+            for key in subscription.keys or [None]:
+                subscribers = index.get(key)
+
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+
+                    if not subscribers:
+                        del index[key]
+
+            if not index:
+                self.loops.pop(loop, None)
+
+    def __len__(self):
+        with self.lock:
+            return len({
+                subscription
+                for index in self.loops.values()
+                for subscribers in index.values()
+                for subscription in subscribers
+            })
+
+    def publish(self, topic, data, cars=(), drivers=(), id=None):
+        for listener in self.listeners:
+            listener(topic, data)
+
+        keys = [("car", car) for car in cars] + [("driver", driver) for driver in drivers]
+        event = Event(id or next(self.ids), topic, data, keys)
+
+        with self.lock:
+            loops = list(self.loops)
+
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self.deliver, loop, event)
+            except RuntimeError:
+                # The loop was closed without unsubscribing.
+                with self.lock:
+                    self.loops.pop(loop, None)
+
+    def deliver(self, loop, event):
+        # Runs on `loop`, the only thread changing its index.
+        index = self.loops.get(loop)
+
+        if index is None:
+            return
+
+        for subscription in index.get(None, ()):
+            subscription.offer(event)
+
+        for subscription in {
+            subscription for key in event.keys for subscription in index.get(key, ())
+        }:
+            subscription.offer(event)
+
+
+broker = Broker()
+
+
+def origin():
+    # Forked workers share their parent's module state, not its pid.
+    return f"{socket.gethostname()}:{os.getpid()}"[-63:]
+
+
+def publish_all(events):
+    """Publish `(topic, data, cars, drivers)` events to this process's `broker`.
+
+    With `EVENT_RELAY` on, they are first stored, with one INSERT, for
+    `relay` to publish in the other processes.
+    """
+    ids = [None] * len(events)
+
+    if settings.EVENT_RELAY:
+        try:
+            stored = PublishedEvent.objects.using("default").bulk_create([
+                PublishedEvent(topic=topic, data=data, cars=cars, drivers=drivers, origin=origin())
+                for topic, data, cars, drivers in events
+            ])
+            ids = [event.pk for event in stored]
+        except DatabaseError:
+            logger.exception("Couldn't store %d events for the other processes", len(events))
+
+    for (topic, data, cars, drivers), id in zip(events, ids):
+        broker.publish(topic, data, cars, drivers, id=id)
+
+
+def publish(topic, data, cars=(), drivers=()):
+    publish_all([(topic, data, list(cars), list(drivers))])
+
+
+class EventBatch:
+    """The events published at one savepoint of a transaction."""
+
+    def __init__(self, using, savepoint_ids):
+        self.using = using
+        self.savepoint_ids = savepoint_ids
+        self.events = []
+        self.published = False
+
+    def publish(self):
+        self.published = True
+        publish_all(self.events)
+
+
+pending = threading.local()
+
+
+def publish_on_commit(topic, data, cars=(), drivers=(), using=None):
+    """Publish once the current transaction (if any) commits.
+
+    Events published at the same savepoint share one `on_commit`
+    callback, so they're stored together; rolling the savepoint back
+    drops them with its other callbacks.
+    """
+    event = (topic, data, list(cars), list(drivers))
+    connection = transaction.get_connection(using)
+
+    if not connection.in_atomic_block:
+        publish_all([event])
+        return
+
+    batch = getattr(pending, "batch", None)
+    savepoint_ids = tuple(connection.savepoint_ids)
+
+    if (
+        batch is None
+        or batch.published
+        or batch.using != connection.alias
+        or batch.savepoint_ids != savepoint_ids
+        # Gone with a rolled back savepoint.
+        or not any(entry[1] == batch.publish for entry in connection.run_on_commit)
+    ):
+        batch = pending.batch = EventBatch(connection.alias, savepoint_ids)
+        transaction.on_commit(batch.publish, using=connection.alias)
+
+    batch.events.append(event)
+
+
+def prune_events():
+    """Delete the stored events older than `EVENT_RETENTION`; returns how many."""
+    return (
+        PublishedEvent.objects.using("default")
+        .filter(created_at__lt=timezone.now() - EVENT_RETENTION)
+        .delete()[0]
+    )
+
+
+class EventRelay:
+    """Publishes the events stored by other processes to `broker`."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.since = None
+        # id -> created_at of the events published within the slack.
+        self.seen = {}
+
+    def poll(self):
+        """Publish the events stored since the last poll; returns how many."""
+        now = timezone.now()
+
+        if self.since is None:
+            self.since = now
+
+        events = (
+            PublishedEvent.objects.using("default")
+            .filter(created_at__gte=self.since - EVENT_POLL_SLACK)
+            .exclude(origin=origin())
+            .order_by("pk")
+        )
+        published = 0
+
+        for event in events:
+            if event.pk in self.seen:
+                continue
+
+            self.seen[event.pk] = event.created_at
+            broker.publish(event.topic, event.data, event.cars, event.drivers, id=event.pk)
+            published += 1
+
+        self.since = now
+        self.seen = {
+            pk: created_at for pk, created_at in self.seen.items() if created_at >= now - EVENT_POLL_SLACK
+        }
+
+        return published
+
+    def start(self):
+        """Poll in a background thread, unless `EVENT_RELAY` is off or `EVENT_POLL_INTERVAL` 0."""
+        if not settings.EVENT_RELAY or not settings.EVENT_POLL_INTERVAL:
+            return
+
+        # A forked worker doesn't inherit its parent's thread.
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+
+        with self.lock:
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="event-relay", daemon=True)
+                self.pid = os.getpid()
+                self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.EVENT_POLL_INTERVAL)
+
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception("Couldn't relay the other processes' events")
+            finally:
+                connections["default"].close_if_unusable_or_obsolete()
+
+
+relay = EventRelay()
+
+
+def session_user(scope):
+    """The user logged in with the scope's session cookie."""
+    headers = dict(scope.get("headers", []))
+    cookies = parse_cookie(headers.get(b"cookie", b"").decode("latin-1"))
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(
+        cookies.get(settings.SESSION_COOKIE_NAME)
+    )
+
+    return auth.get_user(request)
+
+
+def parse_filters(query_string):
+    """`?topics=&cars=&drivers=` (comma-separated) to `(topics, keys)`."""
+    query = {name: ",".join(values) for name, values in parse_qs(query_string).items()}
+    topics = None
+    keys = None
+
+    if query.get("topics"):
+        topics = set(query["topics"].split(","))
+
+        if topics - set(EVENT_TOPICS):
+            raise ValueError(f"Topics must be among {', '.join(EVENT_TOPICS)}.")
+
+    for name, kind in (("cars", "car"), ("drivers", "driver")):
+        if query.get(name):
+            try:
+                ids = {int(value) for value in query[name].split(",")}
+            except ValueError:
+                raise ValueError("Cars and drivers must be ids.")
+
+            keys = (keys or set()) | {(kind, id) for id in ids}
+
+    return topics, keys
+
+
+async def respond(send, status, body, content_type=b"application/json"):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type)],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def event_stream(scope, receive, send):
+    """ASGI app streaming `broker` events to a logged-in user.
+
+    `?topics=` limits the topics, `?cars=` and `?drivers=` the cars
+    and drivers events must involve (any of them).
+    """
+    if scope["method"] != "GET":
+        return await respond(send, 405, b'{"error":"Method not allowed."}')
+
+    user = await sync_to_async(session_user)(scope)
+
+    if not user.is_authenticated:
+        return await respond(send, 401, b'{"error":"Authentication required."}')
+
+    try:
+        topics, keys = parse_filters(scope.get("query_string", b"").decode("latin-1"))
+    except ValueError as error:
+        return await respond(send, 400, json.dumps({"error": str(error)}).encode())
+
+    relay.start()
+    subscription = broker.subscribe(topics, keys)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": f"retry: {EVENT_RETRY_MS}\n\n".encode(),
+            "more_body": True,
+        })
+
+        while not disconnected.done():
+            events = asyncio.ensure_future(subscription.get())
+            await asyncio.wait(
+                {events, disconnected},
+                timeout=EVENT_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            if events.done():
+                body = events.result()
+            else:
+                events.cancel()
+                body = b": keepalive\n\n"
+
+            if not disconnected.done():
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
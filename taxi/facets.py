@@ -0,0 +1,176 @@
+import hashlib
+
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When, CharField
+from django.db.models.functions import Coalesce
+
+from .cache import get_fleet_version
+from .models import Car
+from .sharding import scatter
+from .singleflight import single_flight
+
+FACETS_CACHE_TIMEOUT = 60 * 10
+
+FACET_FIELDS = ("manufacturer", "country", "drivers")
+DRIVERS_BUCKETS = ("0", "1", "2", "3+")
+
+
+def with_drivers_count(queryset):
+    """Annotate cars with `num_drivers` using a correlated subquery.
+
+    A subquery (instead of `Count("drivers")`) keeps the annotation
+    groupable, so the drivers facet can be counted in a single query.
+    """
+    drivers_count = (
+        Car.drivers.through.objects
+        .filter(car_id=OuterRef("pk"))
+        .order_by()
+        .values("car_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+
+    return queryset.annotate(
+        num_drivers=Coalesce(
+            Subquery(drivers_count, output_field=IntegerField()), 0
+        )
+    )
+
+
+def filter_cars(queryset, filters):
+    if filters.get("model"):
+        queryset = queryset.filter(model__icontains=filters["model"])
+
+    if filters.get("manufacturer"):
+        queryset = queryset.filter(manufacturer_id=filters["manufacturer"])
+
+    if filters.get("country"):
+        queryset = queryset.filter(manufacturer__country=filters["country"])
+
+    drivers = filters.get("drivers")
+    if drivers:
+        if drivers.endswith("+"):
+            queryset = queryset.filter(num_drivers__gte=int(drivers[:-1]))
+        else:
+            queryset = queryset.filter(num_drivers=int(drivers))
+
+    return queryset
+
+
+def _drivers_bucket():
+    last = DRIVERS_BUCKETS[-1]
+
+    return Case(
+        When(num_drivers__gte=int(last[:-1]), then=Value(last)),
+        *[
+            When(num_drivers=int(bucket), then=Value(bucket))
+            for bucket in DRIVERS_BUCKETS[:-1]
+        ],
+        output_field=CharField(),
+    )
+
+
+def _count_manufacturer(queryset):
+    rows = (
+        queryset
+        .order_by()
+        .values("manufacturer_id", "manufacturer__name")
+        .annotate(count=Count("pk"))
+        .order_by("manufacturer__name")
+    )
+
+    return [
+        (str(row["manufacturer_id"]), row["manufacturer__name"], row["count"])
+        for row in rows
+    ]
+
+
+def _count_country(queryset):
+    rows = (
+        queryset
+        .order_by()
+        .values("manufacturer__country")
+        .annotate(count=Count("pk"))
+        .order_by("manufacturer__country")
+    )
+
+    return [
+        (row["manufacturer__country"], row["manufacturer__country"], row["count"])
+        for row in rows
+    ]
+
+
+def _count_drivers(queryset):
+    rows = (
+        queryset
+        .order_by()
+        .annotate(bucket=_drivers_bucket())
+        .values("bucket")
+        .annotate(count=Count("pk"))
+    )
+    counts = {row["bucket"]: row["count"] for row in rows}
+
+    return [
+        (bucket, bucket, counts[bucket])
+        for bucket in DRIVERS_BUCKETS
+        if bucket in counts
+    ]
+
+
+FACET_COUNTERS = {
+    "manufacturer": _count_manufacturer,
+    "country": _count_country,
+    "drivers": _count_drivers,
+}
+
+
+def _cache_key(facet, filters):
+    params = "&".join(
+        f"{key}={filters[key]}"
+        for key in sorted(filters)
+        if key != facet and filters[key]
+    )
+
+    return f"taxi:car-facets:{facet}:{hashlib.md5(params.encode()).hexdigest()}"
+
+
+def _count_facet(facet, filters):
+    other_filters = {k: v for k, v in filters.items() if k != facet}
+    queryset = Car.objects.all()
+
+    if facet == "drivers" or other_filters.get("drivers"):
+        queryset = with_drivers_count(queryset)
+
+    shard_counts = [
+        FACET_COUNTERS[facet](shard_queryset)
+        for shard_queryset in scatter(filter_cars(queryset, other_filters))
+    ]
+
+    if len(shard_counts) == 1:
+        return shard_counts[0]
+
+    merged = {}
+
+    for counts in shard_counts:
+        for value, label, count in counts:
+            merged[value] = (value, label, merged.get(value, (0, 0, 0))[2] + count)
+
+    return sorted(merged.values(), key=lambda item: item[1])
+
+
+def get_facet_counts(filters):
+    """Return `{facet: [(value, label, count), ...]}` for the car list.
+
+    Each facet is counted against the cars matching every *other*
+    active filter, so a selected value never hides its siblings.
+    """
+    version = get_fleet_version()
+
+    return {
+        facet: single_flight.get(
+            _cache_key(facet, filters),
+            lambda: _count_facet(facet, filters),
+            FACETS_CACHE_TIMEOUT,
+            version=version,
+        )
+        for facet in FACET_FIELDS
+    }
@@ -3,6 +3,7 @@ from django.core.validators import RegexValidator
 from django.forms import ModelForm
 from django import forms
 
+from .facets import DRIVERS_BUCKETS
 from .models import Driver
 
 
@@ -18,15 +19,16 @@ class DriverUserCreationForm(UserCreationForm):
         )
 
 
+LICENSE_NUMBER_VALIDATOR = RegexValidator(
+    regex="[A-Z]{3}[0-9]{5}",
+    message="Enter correct value like AAA00000"
+)
+
+
 class DriverLicenseUpdateForm(ModelForm):
     license_number = forms.CharField(
         max_length=8,
-        validators=[
-            RegexValidator(
-                regex="[A-Z]{3}[0-9]{5}",
-                message="Enter correct value like AAA00000"
-            ),
-        ]
+        validators=[LICENSE_NUMBER_VALIDATOR]
      )
 
     class Meta:
@@ -41,3 +43,10 @@ class CarSearchForm(forms.Form):
         label="",
         widget=forms.TextInput(attrs={"placeholder": "Search by model name"})
     )
+    manufacturer = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    country = forms.CharField(max_length=60, required=False, widget=forms.HiddenInput)
+    drivers = forms.ChoiceField(
+        choices=[("", "")] + [(bucket, bucket) for bucket in DRIVERS_BUCKETS],
+        required=False,
+        widget=forms.HiddenInput,
+    )
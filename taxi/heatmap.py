@@ -0,0 +1,261 @@
+"""Demand and supply heatmap tiles.
+
+Points are counted on Web Mercator (slippy map) tiles for zooms 0 to
+`HEATMAP_MAX_ZOOM`. Each tile is a grid of 2 ** `HEATMAP_TILE_BITS`
+cells a side, kept as a sparse `{(column, row): count}` dict, so a
+pyramid of counts is maintained for every zoom at once. Two layers
+are kept:
+
+* `demand`: open ride requests, at their pickup;
+* `supply`: available drivers without a ride.
+
+Layers are updated incrementally from `taxi.events` (a point moving
+touches one tile per zoom), including the other processes' events
+relayed by `taxi.events.relay`, and resynced from the database every
+`HEATMAP_RESYNC_INTERVAL` seconds to correct any drift. Only the tiles that actually
+changed get a new version.
+
+Rendered tiles are kept in an LRU cache under their version. Their
+ETag is a hash of the rendered tile, so every worker holding the same
+counts gives the same ETag: unchanged tiles cost clients a 304, whichever
+worker answers, and the server a dict lookup.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+
+from django.utils import timezone
+
+from .cache import LRUCache
+from .events import broker, relay
+from .locations import LOCATION_MAX_AGE, driver_index
+from .models import Ride
+
+HEATMAP_MAX_ZOOM = 15
+# 32 x 32 cells per tile.
+HEATMAP_TILE_BITS = 5
+HEATMAP_CACHE_SIZE = 4096
+HEATMAP_RESYNC_INTERVAL = 30.0
+# Requests waiting longer than this are assumed to be abandoned.
+HEATMAP_REQUEST_WINDOW = LOCATION_MAX_AGE
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+BASE_LEVEL = HEATMAP_MAX_ZOOM + HEATMAP_TILE_BITS
+CELL_MASK = (1 << HEATMAP_TILE_BITS) - 1
+
+
+def mercator_cell(latitude, longitude, level=BASE_LEVEL):
+    """`(x, y)` of the Web Mercator square containing a point at `level`."""
+    size = 1 << level
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    x = int((longitude + 180) / 360 * size)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * size)
+
+    return min(max(x, 0), size - 1), min(max(y, 0), size - 1)
+
+
+def quadkey(zoom, x, y):
+    """Bing-style quadkey of a tile: one base-4 digit per zoom level."""
+    return "".join(
+        str(((x >> shift) & 1) | (((y >> shift) & 1) << 1))
+        for shift in range(zoom - 1, -1, -1)
+    )
+
+
+class Tile:
+    def __init__(self):
+        self.counts = {}
+        self.version = 0
+
+
+class HeatLayer:
+    """Counts of keyed points, per tile and zoom."""
+
+    def __init__(self, name):
+        self.name = name
+        self.points = {}
+        self.zooms = [{} for _ in range(HEATMAP_MAX_ZOOM + 1)]
+        self.clock = 0
+        self.lock = threading.Lock()
+
+    def _count(self, cell, delta):
+        x, y = cell
+        self.clock += 1
+
+        for zoom, tiles in enumerate(self.zooms):
+            shift = HEATMAP_MAX_ZOOM - zoom
+            column, row = x >> shift, y >> shift
+            key = (column >> HEATMAP_TILE_BITS, row >> HEATMAP_TILE_BITS)
+            tile = tiles.get(key)
+
+            if tile is None:
+                tile = tiles[key] = Tile()
+
+            position = (column & CELL_MASK, row & CELL_MASK)
+            count = tile.counts.get(position, 0) + delta
+
+            if count:
+                tile.counts[position] = count
+            else:
+                del tile.counts[position]
+
+            # Emptied tiles are kept, so their version can't go back.
+            tile.version = self.clock
+
+    def move(self, key, latitude, longitude):
+        cell = mercator_cell(latitude, longitude)
+
+        with self.lock:
+            previous = self.points.get(key)
+
+            if previous == cell:
+                return
+
+            if previous is not None:
+                self._count(previous, -1)
+
+            self.points[key] = cell
+            self._count(cell, 1)
+
+    def remove(self, key):
+        with self.lock:
+            previous = self.points.pop(key, None)
+
+            if previous is not None:
+                self._count(previous, -1)
+
+    def sync(self, points):
+        """Make the layer hold exactly `points`, `{key: (latitude, longitude)}`."""
+        cells = {key: mercator_cell(*point) for key, point in points.items()}
+
+        with self.lock:
+            for key in set(self.points) - set(cells):
+                self._count(self.points.pop(key), -1)
+
+            for key, cell in cells.items():
+                previous = self.points.get(key)
+
+                if previous != cell:
+                    if previous is not None:
+                        self._count(previous, -1)
+
+                    self.points[key] = cell
+                    self._count(cell, 1)
+
+    def tile(self, zoom, x, y):
+        """`(version, {(column, row): count})` of a tile."""
+        with self.lock:
+            tile = self.zooms[zoom].get((x, y))
+
+            if tile is None:
+                return 0, {}
+
+            return tile.version, dict(tile.counts)
+
+    def version(self, zoom, x, y):
+        tile = self.zooms[zoom].get((x, y))
+
+        return 0 if tile is None else tile.version
+
+
+class Heatmap:
+    def __init__(self):
+        self.layers = {name: HeatLayer(name) for name in ("demand", "supply")}
+        self.cache = LRUCache(HEATMAP_CACHE_SIZE)
+        self.synced_at = None
+        self.sync_lock = threading.Lock()
+
+    def handle(self, topic, data):
+        """`taxi.events` listener."""
+        if topic == "ride.status":
+            if data["status"] == Ride.REQUESTED:
+                self.layers["demand"].move(data["ride"], data["latitude"], data["longitude"])
+            else:
+                self.layers["demand"].remove(data["ride"])
+
+                if data["status"] == Ride.ASSIGNED:
+                    self.layers["supply"].remove(data["driver"])
+        elif topic == "driver.location":
+            if data["available"]:
+                self.layers["supply"].move(data["driver"], data["latitude"], data["longitude"])
+            else:
+                self.layers["supply"].remove(data["driver"])
+
+    def sync(self, force=False):
+        relay.start()
+
+        if (
+            not force
+            and self.synced_at is not None
+            and time.monotonic() - self.synced_at < HEATMAP_RESYNC_INTERVAL
+        ):
+            return
+
+        if not self.sync_lock.acquire(blocking=False):
+            # Another thread is on it; serve what we have.
+            return
+
+        try:
+            now = timezone.now()
+            requests = (
+                Ride.objects
+                .filter(status=Ride.REQUESTED, requested_at__gte=now - HEATMAP_REQUEST_WINDOW)
+                .values_list("pk", "pickup_latitude", "pickup_longitude")
+            )
+            self.layers["demand"].sync({pk: (latitude, longitude) for pk, latitude, longitude in requests})
+
+            busy = set(Ride.objects.filter(status=Ride.ASSIGNED).values_list("driver_id", flat=True))
+            self.layers["supply"].sync({
+                driver_id: (latitude, longitude)
+                for driver_id, latitude, longitude in zip(*driver_index.snapshot())
+                if driver_id not in busy
+            })
+            self.synced_at = time.monotonic()
+        finally:
+            self.sync_lock.release()
+
+    def etag(self, layer, zoom, x, y):
+        cached = self.cache.get((layer, quadkey(zoom, x, y)))
+
+        if cached is not None and cached[0] == self.layers[layer].version(zoom, x, y):
+            return cached[1]
+
+        return self.render(layer, zoom, x, y)[0]
+
+    def render(self, layer, zoom, x, y):
+        """`(etag, JSON bytes)` of a tile, from the cache when unchanged."""
+        version, counts = self.layers[layer].tile(zoom, x, y)
+        key = (layer, quadkey(zoom, x, y))
+        cached = self.cache.get(key)
+
+        if cached is not None and cached[0] == version:
+            return cached[1:]
+
+        body = json.dumps(
+            {
+                "layer": layer,
+                "z": zoom,
+                "x": x,
+                "y": y,
+                "size": 1 << HEATMAP_TILE_BITS,
+                "cells": sorted([column, row, count] for (column, row), count in counts.items()),
+            },
+            separators=(",", ":"),
+        ).encode()
+        # Versions are per process; the contents are the same everywhere.
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self.cache.set(key, (version, etag, body))
+
+        return etag, body
+
+    def clear(self):
+        with self.sync_lock:
+            self.layers = {name: HeatLayer(name) for name in self.layers}
+            self.cache.clear()
+            self.synced_at = None
+
+
+heatmap = Heatmap()
+broker.listen(heatmap.handle)
@@ -0,0 +1,221 @@
+"""Database-backed background jobs.
+
+A job handler is a generator function registered with `@job(name)`. It
+does its work in bounded batches and yields `(progress, total)` after
+each one, which is saved on the `Job` row and doubles as a heartbeat;
+its return value becomes `Job.result`. Handlers must be safe to run
+again from the start, because a failed job is retried and a job whose
+worker died is picked up again once its lease expires.
+"""
+import csv
+import logging
+import os
+import traceback
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .audit import acting_as, record_bulk_delete
+from .cache import invalidate_fleet_cache
+from .db import immediate_atomic
+from .facets import filter_cars, with_drivers_count
+from .models import Car, Job, Manufacturer
+from .sharding import scatter
+from .sync import SYNC_BATCH_SIZE, sync_drivers
+
+logger = logging.getLogger(__name__)
+
+JOB_BATCH_SIZE = 500
+JOB_LEASE = timedelta(minutes=5)
+JOB_RETRY_DELAY = timedelta(seconds=30)
+
+# Manufacturers with at most this many cars are still deleted in the request.
+INLINE_DELETE_LIMIT = 500
+
+JOBS = {}
+
+
+def job(name):
+    def register(handler):
+        JOBS[name] = handler
+        return handler
+
+    return register
+
+
+def enqueue(name, params=None, user=None, max_attempts=3):
+    if name not in JOBS:
+        raise ValueError(f"Unknown job {name!r}.")
+
+    return Job.objects.create(
+        name=name,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts,
+    )
+
+
+def claim():
+    """Take the next due job, or return None when the queue is empty.
+
+    Jobs still marked running after `JOB_LEASE` without a progress
+    report belong to a dead worker and are claimed again.
+    """
+    now = timezone.now()
+
+    with immediate_atomic(using="default"):
+        job = (
+            Job.objects.using("default")
+            .select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by("run_after", "pk")
+            .first()
+        ) or (
+            Job.objects.using("default")
+            .select_for_update(skip_locked=True)
+            .filter(status=Job.RUNNING, locked_at__lt=now - JOB_LEASE)
+            .order_by("locked_at", "pk")
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_at = now
+        job.save(using="default", update_fields=["status", "attempts", "locked_at"])
+
+    return job
+
+
+def run(job):
+    """Run a claimed job to completion, or schedule its retry."""
+    jobs = Job.objects.using("default").filter(pk=job.pk)
+
+    try:
+        steps = JOBS[job.name](job, **job.params)
+
+        while True:
+            try:
+                with acting_as(job.created_by_id, f"job:{job.name}"):
+                    job.progress, job.total = next(steps)
+            except StopIteration as stop:
+                job.result = stop.value
+                break
+
+            jobs.update(progress=job.progress, total=job.total, locked_at=timezone.now())
+    except Exception:
+        logger.exception("Job %s failed (attempt %s of %s)", job, job.attempts, job.max_attempts)
+        job.error = traceback.format_exc()
+
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.SUCCEEDED
+        job.error = ""
+        job.finished_at = timezone.now()
+
+    jobs.update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+    )
+
+    return job
+
+
+def run_pending():
+    """Run due jobs in this process until the queue is empty."""
+    while (job := claim()) is not None:
+        run(job)
+
+
+@job("delete_manufacturer")
+def delete_manufacturer(job, manufacturer_id):
+    cars = Car.objects.filter(manufacturer_id=manufacturer_id)
+    total = sum(queryset.count() for queryset in scatter(cars))
+    deleted = 0
+
+    yield deleted, total
+
+    for queryset in scatter(cars):
+        using = queryset.db
+
+        while pks := list(queryset.order_by("pk").values_list("pk", flat=True)[:JOB_BATCH_SIZE]):
+            with immediate_atomic(using=using):
+                Car.drivers.through.objects.using(using).filter(car_id__in=pks).delete()
+                # A raw delete skips the per-row signals, which invalidate
+                # caches and audit; both are done once per batch instead.
+                record_bulk_delete(Car.objects.using(using).filter(pk__in=pks))
+                Car.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+
+            invalidate_fleet_cache()
+            deleted += len(pks)
+
+            yield deleted, max(total, deleted)
+
+    Manufacturer.objects.filter(pk=manufacturer_id).delete()
+
+    return {"deleted_cars": deleted}
+
+
+@job("sync_drivers")
+def sync_drivers_job(job, records):
+    summary = Counter()
+
+    yield 0, len(records)
+
+    for start in range(0, len(records), SYNC_BATCH_SIZE):
+        batch = records[start:start + SYNC_BATCH_SIZE]
+        summary.update(result["status"] for result in sync_drivers(batch))
+
+        yield start + len(batch), len(records)
+
+    return {"summary": summary}
+
+
+def export_path(job):
+    return os.path.join(settings.JOB_EXPORT_DIR, f"cars-{job.pk}.csv")
+
+
+@job("export_cars")
+def export_cars(job, filters):
+    cars = filter_cars(with_drivers_count(Car.objects.all()), filters)
+    total = sum(queryset.count() for queryset in scatter(cars))
+    exported = 0
+
+    yield exported, total
+
+    os.makedirs(settings.JOB_EXPORT_DIR, exist_ok=True)
+    path = export_path(job)
+
+    with open(path + ".part", "w", newline="") as export:
+        writer = csv.writer(export)
+        writer.writerow(["id", "model", "manufacturer", "country", "drivers"])
+
+        for queryset in scatter(cars):
+            rows = queryset.order_by("pk").values_list(
+                "pk", "model", "manufacturer__name", "manufacturer__country", "num_drivers"
+            )
+            last_pk = 0
+
+            while batch := list(rows.filter(pk__gt=last_pk)[:JOB_BATCH_SIZE]):
+                writer.writerows(batch)
+                exported += len(batch)
+                last_pk = batch[-1][0]
+
+                yield exported, max(total, exported)
+
+    # Only a complete file is ever visible under the final name.
+    os.replace(path + ".part", path)
+
+    return {"rows": exported, "filename": os.path.basename(path)}
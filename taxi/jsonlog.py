@@ -0,0 +1,44 @@
+import glob
+import json
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+JSON_LOG_MAX_BYTES = 50 * 1024 * 1024
+JSON_LOG_BACKUPS = 10
+
+
+class JsonLinesLog:
+    """Appends JSON lines to `<directory>/<name>-<pid>.jsonl`, rotated by size.
+
+    One file per process, as `RotatingFileHandler` can't share one
+    between processes.
+    """
+
+    def __init__(self, directory, name, max_bytes=JSON_LOG_MAX_BYTES, backups=JSON_LOG_BACKUPS):
+        os.makedirs(directory, exist_ok=True)
+        self.handler = RotatingFileHandler(
+            os.path.join(directory, f"{name}-{os.getpid()}.jsonl"),
+            maxBytes=max_bytes,
+            backupCount=backups,
+            delay=True,
+        )
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, record):
+        self.handler.handle(logging.makeLogRecord({"msg": json.dumps(record, separators=(",", ":"), default=str)}))
+
+    def close(self):
+        self.handler.close()
+
+
+def read_json_lines(patterns):
+    """Records from JSON lines files, given as paths or globs (rotated ones included)."""
+    records = []
+
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path) as lines:
+                records.extend(json.loads(line) for line in lines if line.strip())
+
+    return records
@@ -0,0 +1,411 @@
+"""Driver positions: GPS ping ingestion and nearest-driver lookup.
+
+`DriverLocation` keeps each driver's last known position. Every process
+also keeps those positions in `driver_index`, a grid of
+`CELL_DEGREES`-sized cells, so "k nearest available drivers" only looks
+at the few cells around the query point instead of every row. The index
+catches up with pings stored by other processes incrementally, using
+the `updated_at` column, at most every `INDEX_REFRESH_INTERVAL` seconds.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .db import immediate_atomic
+from .events import publish_on_commit
+from .models import Driver, DriverLocation
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+CELL_DEGREES = 0.0025  # about 280 m north to south
+INDEX_REFRESH_INTERVAL = 2.0
+INDEX_REFRESH_OVERLAP = timedelta(seconds=10)
+LOCATION_MAX_AGE = timedelta(minutes=5)
+MAX_CLOCK_SKEW = timedelta(minutes=1)
+MAX_SEARCH_RADIUS_KM = 50.0
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """Points on a uniform latitude/longitude grid.
+
+    `nearest()` searches rings of cells outwards from the query point and
+    stops as soon as the k-th best distance is within the radius the
+    searched rings are guaranteed to cover. Candidates are ranked by the
+    equirectangular approximation (exact enough at city scale and much
+    cheaper than haversine), results carry the haversine distance.
+    Longitude does not wrap at the antimeridian.
+    """
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.points = {}  # key -> cell
+        self.cells = defaultdict(dict)  # cell -> {key: (latitude, longitude, timestamp)}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def _discard(self, key):
+        cell = self.points.pop(key, None)
+
+        if cell is not None:
+            points = self.cells[cell]
+            del points[key]
+
+            if not points:
+                del self.cells[cell]
+
+    def update(self, key, latitude, longitude, timestamp):
+        cell = self.cell(latitude, longitude)
+
+        with self.lock:
+            self._discard(key)
+            self.points[key] = cell
+            self.cells[cell][key] = (latitude, longitude, timestamp)
+
+    def remove(self, key):
+        with self.lock:
+            self._discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.points.clear()
+            self.cells.clear()
+
+    def ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+
+        for offset in range(-radius, radius + 1):
+            yield row - radius, col + offset
+            yield row + radius, col + offset
+
+        for offset in range(-radius + 1, radius):
+            yield row + offset, col - radius
+            yield row + offset, col + radius
+
+    def nearest(self, latitude, longitude, k=5, max_distance_km=MAX_SEARCH_RADIUS_KM, since=None):
+        """Up to `k` `(distance_km, key)` pairs, nearest first.
+
+        Points with a timestamp before `since` are skipped.
+        """
+        row, col = self.cell(latitude, longitude)
+        # Distances below are in degrees of latitude, with longitude
+        # scaled by the query point's parallel (floored near the poles).
+        scale = max(math.cos(math.radians(latitude)), 0.1)
+        max_squared = (max_distance_km / KM_PER_DEGREE) ** 2
+        since = -math.inf if since is None else since
+        best = []  # max-heap of (-squared distance, key), at most k long
+
+        def visit(points):
+            for key, (point_latitude, point_longitude, timestamp) in points.items():
+                if timestamp < since:
+                    continue
+
+                dy = point_latitude - latitude
+                dx = (point_longitude - longitude) * scale
+                squared = dy * dy + dx * dx
+
+                if squared > max_squared:
+                    continue
+
+                if len(best) < k:
+                    heapq.heappush(best, (-squared, key))
+                elif squared < -best[0][0]:
+                    heapq.heapreplace(best, (-squared, key))
+
+        with self.lock:
+            radius = 0
+
+            while True:
+                for cell in self.ring(row, col, radius):
+                    points = self.cells.get(cell)
+
+                    if points:
+                        visit(points)
+
+                # Rings 0..radius cover every point this close, or closer.
+                covered = radius * self.cell_degrees * scale
+
+                if len(best) == k and -best[0][0] <= covered * covered:
+                    break
+
+                if covered * covered >= max_squared:
+                    break
+
+                if 8 * (radius + 1) > len(self.cells):
+                    # The next ring has more cells than are occupied: visit
+                    # the occupied cells outside the searched square instead.
+                    for (cell_row, cell_col), points in self.cells.items():
+                        if max(abs(cell_row - row), abs(cell_col - col)) > radius:
+                            visit(points)
+                    break
+
+                radius += 1
+
+            found = [
+                (distance_km(latitude, longitude, *self.cells[self.points[key]][key][:2]), key)
+                for _, key in best
+            ]
+
+        return sorted(found)
+
+    def snapshot(self, since=None):
+        """`(keys, latitudes, longitudes)` lists of all points, for bulk use."""
+        since = -math.inf if since is None else since
+        keys, latitudes, longitudes = [], [], []
+
+        with self.lock:
+            for points in self.cells.values():
+                for key, (latitude, longitude, timestamp) in points.items():
+                    if timestamp >= since:
+                        keys.append(key)
+                        latitudes.append(latitude)
+                        longitudes.append(longitude)
+
+        return keys, latitudes, longitudes
+
+
+class DriverLocationIndex(SpatialIndex):
+    """Positions of available drivers, kept in step with `DriverLocation`."""
+
+    def __init__(self, cell_degrees=CELL_DEGREES):
+        super().__init__(cell_degrees)
+        self.synced_until = None
+        self.checked_at = None
+        self.refresh_lock = threading.Lock()
+
+    def apply(self, driver_id, latitude, longitude, recorded_at, is_available):
+        if is_available:
+            self.update(driver_id, latitude, longitude, recorded_at.timestamp())
+        else:
+            self.remove(driver_id)
+
+    def refresh(self, force=False):
+        """Load locations stored since the last refresh (all of them at first)."""
+        if (
+            not force
+            and self.checked_at is not None
+            and time.monotonic() - self.checked_at < INDEX_REFRESH_INTERVAL
+        ):
+            return
+
+        with self.refresh_lock:
+            locations = DriverLocation.objects.order_by()
+
+            if self.synced_until is not None:
+                # `updated_at` is set before commit, so a slow transaction
+                # can commit rows older than the newest one already seen.
+                locations = locations.filter(updated_at__gte=self.synced_until - INDEX_REFRESH_OVERLAP)
+
+            for driver_id, *values, updated_at in locations.values_list(
+                "driver_id", "latitude", "longitude", "recorded_at", "is_available", "updated_at"
+            ).iterator():
+                self.apply(driver_id, *values)
+
+                if self.synced_until is None or updated_at > self.synced_until:
+                    self.synced_until = updated_at
+
+            self.checked_at = time.monotonic()
+
+    def nearest(self, latitude, longitude, k=5, max_distance_km=MAX_SEARCH_RADIUS_KM, since=None):
+        self.refresh()
+
+        if since is None:
+            since = (timezone.now() - LOCATION_MAX_AGE).timestamp()
+
+        return super().nearest(latitude, longitude, k, max_distance_km, since)
+
+    def snapshot(self, since=None):
+        self.refresh()
+
+        if since is None:
+            since = (timezone.now() - LOCATION_MAX_AGE).timestamp()
+
+        return super().snapshot(since)
+
+    def clear(self):
+        with self.refresh_lock:
+            super().clear()
+            self.synced_until = None
+            self.checked_at = None
+
+
+driver_index = DriverLocationIndex()
+
+
+def parse_timestamp(value):
+    if value is None:
+        return timezone.now()
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+
+        if parsed is not None:
+            return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    raise ValueError("Expected a Unix time or an ISO 8601 date and time.")
+
+
+def clean_ping(ping):
+    """Return `(driver_id, values, errors)` for one GPS ping."""
+    errors = {}
+    values = {}
+
+    driver_id = ping.get("driver")
+
+    if not isinstance(driver_id, int) or isinstance(driver_id, bool):
+        errors["driver"] = ["Expected a driver id."]
+
+    for field_name, limit in (("latitude", 90), ("longitude", 180)):
+        value = ping.get(field_name)
+
+        if (
+            not isinstance(value, (int, float))
+            or isinstance(value, bool)
+            or not -limit <= value <= limit
+        ):
+            errors[field_name] = [f"Expected a number between -{limit} and {limit}."]
+        else:
+            values[field_name] = float(value)
+
+    try:
+        values["recorded_at"] = parse_timestamp(ping.get("timestamp"))
+    except (ValueError, OverflowError, OSError) as error:
+        errors["timestamp"] = [str(error)]
+    else:
+        if values["recorded_at"] > timezone.now() + MAX_CLOCK_SKEW:
+            errors["timestamp"] = ["Timestamp is in the future."]
+
+    values["is_available"] = bool(ping.get("available", True))
+
+    return driver_id, values, errors
+
+
+def record_pings(pings):
+    """Store the newest of a batch of pings per driver.
+
+    Pings older than the stored position, as sent by a device flushing
+    its buffer after a reconnect, are counted as stale. Returns a
+    summary and the per-ping errors of rejected pings.
+    """
+    summary = {"accepted": 0, "stale": 0, "invalid": 0}
+    errors = []
+    newest = {}
+
+    for index, ping in enumerate(pings):
+        driver_id, values, ping_errors = clean_ping(ping)
+
+        if ping_errors:
+            errors.append({"index": index, "errors": ping_errors})
+            continue
+
+        previous = newest.get(driver_id)
+
+        if previous is not None:
+            summary["stale"] += 1
+
+            if previous["recorded_at"] >= values["recorded_at"]:
+                continue
+
+        newest[driver_id] = values
+
+    known = set(Driver.objects.filter(pk__in=list(newest)).values_list("pk", flat=True))
+
+    for driver_id in set(newest) - known:
+        del newest[driver_id]
+        errors.append({"driver": driver_id, "errors": {"driver": ["Unknown driver."]}})
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+
+    with immediate_atomic():
+        stored = dict(
+            DriverLocation.objects
+            .filter(driver_id__in=list(newest))
+            .values_list("driver_id", "recorded_at")
+        )
+
+        for driver_id, values in newest.items():
+            location = DriverLocation(driver_id=driver_id, updated_at=now, **values)
+
+            if driver_id not in stored:
+                to_create.append(location)
+            elif stored[driver_id] < values["recorded_at"]:
+                to_update.append(location)
+            else:
+                summary["stale"] += 1
+
+        DriverLocation.objects.bulk_create(to_create)
+        DriverLocation.objects.bulk_update(
+            to_update, ["latitude", "longitude", "is_available", "recorded_at", "updated_at"]
+        )
+
+        # Inside the transaction, so the batch is stored in one INSERT.
+        for location in to_create + to_update:
+            publish_on_commit(
+                "driver.location",
+                {
+                    "driver": location.driver_id,
+                    "latitude": location.latitude,
+                    "longitude": location.longitude,
+                    "available": location.is_available,
+                    "recorded_at": location.recorded_at.isoformat(),
+                },
+                drivers=[location.driver_id],
+            )
+
+    for location in to_create + to_update:
+        driver_index.apply(
+            location.driver_id,
+            location.latitude,
+            location.longitude,
+            location.recorded_at,
+            location.is_available,
+        )
+
+    summary["accepted"] = len(to_create) + len(to_update)
+    summary["invalid"] = len(errors)
+
+    return summary, errors
+
+
+def nearest_drivers(latitude, longitude, k=5, max_distance_km=MAX_SEARCH_RADIUS_KM):
+    """The `k` nearest available drivers with a fresh position, nearest first."""
+    matches = driver_index.nearest(latitude, longitude, k, max_distance_km)
+    drivers = Driver.objects.in_bulk([driver_id for _, driver_id in matches])
+
+    return [
+        (distance, drivers[driver_id])
+        for distance, driver_id in matches
+        if driver_id in drivers
+    ]
@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from taxi.archive import archive_month, archive_path, closed_months
+
+
+class Command(BaseCommand):
+    help = "Move closed monthly ride partitions, with their GPS tracks, to compressed columnar archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months",
+            type=int,
+            default=settings.RIDE_ARCHIVE_KEEP_MONTHS,
+            help="Recent months, besides the current one, kept online.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="List the months that would be archived.")
+
+    def handle(self, *args, **options):
+        months = closed_months(options["keep_months"])
+
+        if not months:
+            self.stdout.write("Nothing to archive.")
+
+        for start in months:
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive {start:%Y-%m}")
+                continue
+
+            started = time.perf_counter()
+            moved = archive_month(start)
+            self.stdout.write(
+                f"Archived {moved} rides of {start:%Y-%m} to {archive_path(start)} "
+                f"({os.path.getsize(archive_path(start)) / 1024:.0f} KiB) "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from taxi.compression import CODINGS, compress
+
+DEFAULT_ROUTES = [
+    "taxi:car-list",
+    "taxi:driver-list",
+    "taxi:manufacturer-list",
+    "taxi:api-car-list",
+    "taxi:api-driver-list",
+    "taxi:api-manufacturer-list",
+]
+
+
+def levels(value):
+    return [int(level) for level in value.split(",") if level]
+
+
+class Command(BaseCommand):
+    help = "Measure the CPU cost and bytes saved of compressing each route's response, per coding and level."
+
+    def add_arguments(self, parser):
+        parser.add_argument("routes", nargs="*", help="URL names or paths (default: the list pages and API lists).")
+        parser.add_argument("--username", help="Render as this user (default: the first superuser).")
+        parser.add_argument("--gzip-levels", type=levels, default=[1, 6, 9])
+        parser.add_argument("--brotli-qualities", type=levels, default=[1, 4, 11])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("pk")
+        user = (
+            users.filter(username=options["username"]).first()
+            if options["username"]
+            else users.filter(is_superuser=True).first()
+        )
+
+        if user is None:
+            raise CommandError("No user to render the pages as.")
+
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != "*"]
+        client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+        client.force_login(user)
+        configurations = [("gzip", level) for level in options["gzip_levels"]]
+
+        if "br" in CODINGS:
+            configurations += [("br", quality) for quality in options["brotli_qualities"]]
+        else:
+            self.stdout.write("brotli isn't installed: gzip only.")
+
+        self.stdout.write(
+            f"{'route':<28} {'bytes':>9} {'render ms':>9}  {'coding':<8} {'bytes':>9} {'saved':>6} {'cpu ms':>7} {'MB/s':>7}"
+        )
+
+        for route in options["routes"] or DEFAULT_ROUTES:
+            path = route if route.startswith("/") else reverse(route)
+            started = time.perf_counter()
+            response = client.get(path, HTTP_ACCEPT_ENCODING="identity")
+            rendered = time.perf_counter() - started
+
+            if response.status_code != 200 or response.streaming:
+                self.stdout.write(f"{route:<28} skipped: status {response.status_code}")
+                continue
+
+            content = response.content
+
+            for coding, level in configurations:
+                started = time.process_time()
+
+                for _ in range(options["repeat"]):
+                    compressed = compress(coding, content, level)
+
+                cpu = (time.process_time() - started) / options["repeat"]
+                self.stdout.write(
+                    f"{route:<28} {len(content):>9} {rendered * 1000:>9.2f}  {f'{coding}-{level}':<8} "
+                    f"{len(compressed):>9} {1 - len(compressed) / max(len(content), 1):>6.1%} "
+                    f"{cpu * 1000:>7.3f} {len(content) / max(cpu, 1e-9) / 1e6:>7.1f}"
+                )
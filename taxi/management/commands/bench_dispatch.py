@@ -0,0 +1,145 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from taxi.dispatch import DISPATCH_RADII_KM, assign
+from taxi.locations import KM_PER_DEGREE
+
+# Around Kyiv, about 35 x 45 km.
+CENTER = (50.45, 30.52)
+SPREAD = (0.16, 0.2)
+SPEED_KMH = 30
+MAX_WAIT = 120  # seconds before a rider gives up
+
+
+def random_points(rng, count):
+    return np.column_stack([
+        CENTER[0] + rng.uniform(-SPREAD[0], SPREAD[0], count),
+        CENTER[1] + rng.uniform(-SPREAD[1], SPREAD[1], count),
+    ])
+
+
+def nearest_first(ride_points, driver_points, radius_km=DISPATCH_RADII_KM[-1]):
+    """Baseline: each ride in turn takes the nearest free driver."""
+    free = np.ones(len(driver_points), dtype=bool)
+    scale = np.cos(np.radians(CENTER[0]))
+    matches = []
+
+    for ride, (latitude, longitude) in enumerate(ride_points):
+        distances = np.hypot(
+            driver_points[:, 0] - latitude, (driver_points[:, 1] - longitude) * scale
+        ) * KM_PER_DEGREE
+        distances[~free] = np.inf
+        driver = int(np.argmin(distances))
+
+        if distances[driver] <= radius_km:
+            free[driver] = False
+            matches.append((ride, driver, distances[driver]))
+
+    return matches
+
+
+class Command(BaseCommand):
+    help = "Simulate ride traffic against the dispatch engine and report its throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drivers", type=int, default=50_000)
+        parser.add_argument("--rate", type=float, default=500, help="Ride requests per second.")
+        parser.add_argument("--duration", type=float, default=60, help="Simulated seconds.")
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds per micro-batch.")
+        parser.add_argument("--trip-minutes", type=float, default=1.5)
+        parser.add_argument(
+            "--baseline-batches",
+            type=int,
+            default=5,
+            help="Also time a per-request loop on this many batches.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        interval = options["interval"]
+        drivers = random_points(rng, options["drivers"])
+        busy_until = np.zeros(options["drivers"])
+        pending = np.empty((0, 2))
+        requested_at = np.empty(0)
+
+        requested = abandoned = 0
+        waits, pickups, batch_timings, baseline_rates, engine_rates = [], [], [], [], []
+
+        for tick in range(int(options["duration"] / interval)):
+            now = tick * interval
+            arrivals = rng.poisson(options["rate"] * interval)
+            requested += arrivals
+            pending = np.concatenate([pending, random_points(rng, arrivals)])
+            requested_at = np.concatenate([requested_at, np.full(arrivals, now)])
+
+            free = np.flatnonzero(busy_until <= now)
+
+            started = time.perf_counter()
+            matches = assign(pending, drivers[free])
+            elapsed = time.perf_counter() - started
+            batch_timings.append(elapsed)
+
+            if len(pending) and len(free):
+                engine_rates.append(len(pending) / elapsed)
+
+            if len(baseline_rates) < options["baseline_batches"] and len(pending) and len(free):
+                started = time.perf_counter()
+                nearest_first(pending, drivers[free])
+                baseline_rates.append(len(pending) / (time.perf_counter() - started))
+
+            if matches:
+                rides = np.array([ride for ride, _, _ in matches])
+                matched = free[[driver for _, driver, _ in matches]]
+                distances = np.array([distance for _, _, distance in matches])
+
+                waits.extend(now - requested_at[rides] + distances / SPEED_KMH * 3600)
+                pickups.extend(distances)
+                busy_until[matched] = (
+                    now + distances / SPEED_KMH * 3600 + options["trip_minutes"] * 60
+                )
+                # Drivers end up at a random drop-off point.
+                drivers[matched] = random_points(rng, len(matched))
+
+                keep = np.ones(len(pending), dtype=bool)
+                keep[rides] = False
+                pending, requested_at = pending[keep], requested_at[keep]
+
+            patient = now - requested_at < MAX_WAIT
+            abandoned += int((~patient).sum())
+            pending, requested_at = pending[patient], requested_at[patient]
+
+        timings_ms = sorted(timing * 1000 for timing in batch_timings)
+        self.stdout.write(
+            f"{requested} requests over {options['duration']:.0f}s, "
+            f"{options['drivers']} drivers, batch every {interval}s"
+        )
+        self.stdout.write(
+            f"Matched {len(pickups)}, abandoned {abandoned}, still waiting {len(pending)}"
+        )
+
+        if pickups:
+            self.stdout.write(
+                f"Mean pickup {statistics.mean(pickups):.2f} km, "
+                f"mean wait until pickup {statistics.mean(waits):.0f}s"
+            )
+
+        self.stdout.write(
+            f"Batch time median {statistics.median(timings_ms):.1f} ms, "
+            f"max {timings_ms[-1]:.1f} ms"
+        )
+
+        if engine_rates:
+            self.stdout.write(
+                f"Engine throughput median {statistics.median(engine_rates):,.0f} requests/s "
+                f"({len(engine_rates)} batches with both rides and free drivers)"
+            )
+
+        if baseline_rates:
+            self.stdout.write(
+                f"Per-request loop   median {statistics.median(baseline_rates):,.0f} requests/s "
+                f"({len(baseline_rates)} batches)"
+            )
@@ -0,0 +1,95 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from taxi.eta import grid_city
+
+
+class Command(BaseCommand):
+    help = "Benchmark travel-time queries on a synthetic city: Dijkstra, A*, ALT and the batch API."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100, help="Streets in each direction.")
+        parser.add_argument("--spacing", type=float, default=150, help="Metres between streets.")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--batch", type=int, default=500, help="Pickups in the dispatch-style batch.")
+        parser.add_argument("--save", help="Also write the graph, with landmarks, to this .npz path.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def timed(self, name, function, queries):
+        timings, results, settled = [], [], []
+
+        for origin, destination in queries:
+            started = time.perf_counter()
+            result = function(origin, destination)
+            timings.append(time.perf_counter() - started)
+
+            if isinstance(result, tuple):
+                result, nodes = result
+                settled.append(nodes)
+
+            results.append(result)
+
+        timings_ms = sorted(timing * 1000 for timing in timings)
+        line = (
+            f"{name:<10} median {statistics.median(timings_ms):7.2f} ms, "
+            f"p99 {timings_ms[int(len(timings_ms) * 0.99)]:7.2f} ms"
+        )
+
+        if settled:
+            line += f", {statistics.mean(settled):6.0f} nodes settled"
+
+        self.stdout.write(line)
+
+        return np.array(results)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        started = time.perf_counter()
+        graph = grid_city(options["size"], options["size"], options["spacing"], options["seed"])
+        self.stdout.write(
+            f"{len(graph)} nodes, {len(graph.targets)} roads, built in {time.perf_counter() - started:.2f}s"
+        )
+
+        queries = rng.integers(len(graph), size=(options["queries"], 2)).tolist()
+
+        dijkstra = self.timed(
+            "Dijkstra",
+            lambda origin, destination: graph.dijkstra(origin, wanted=[destination])[destination],
+            queries,
+        )
+        astar = self.timed("A*", graph.search, queries)
+
+        started = time.perf_counter()
+        graph.precompute_landmarks()
+        self.stdout.write(
+            f"{len(graph.landmarks)} landmarks precomputed in {time.perf_counter() - started:.2f}s"
+        )
+        alt = self.timed("ALT", graph.search, queries)
+        self.timed("ALT+LRU", graph.route_time, queries)
+        cached = self.timed("LRU hit", graph.route_time, queries)
+
+        for name, results in (("A*", astar), ("ALT", alt), ("LRU", cached)):
+            mismatches = int((~np.isclose(results, dijkstra, rtol=1e-4)).sum())
+            self.stdout.write(f"{name} mismatches against Dijkstra: {mismatches}")
+
+        # Dispatch-style: each pickup with its 8 nearest-looking drivers.
+        graph.cache.clear()
+        points = np.column_stack([graph.latitudes, graph.longitudes])
+        pickups = points[rng.integers(len(graph), size=options["batch"])]
+        offsets = rng.normal(0, 0.01, (options["batch"], 8, 2))
+        drivers = (pickups[:, None, :] + offsets).reshape(-1, 2)
+
+        started = time.perf_counter()
+        seconds = graph.travel_times(drivers.tolist(), np.repeat(pickups, 8, axis=0).tolist())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Batch of {len(seconds)} driver-to-pickup times: {elapsed * 1000:.0f} ms "
+            f"({len(seconds) / elapsed:,.0f} pairs/s), median {np.median(seconds):.0f}s"
+        )
+
+        if options["save"]:
+            graph.save(options["save"])
+            self.stdout.write(f"Saved to {options['save']}")
@@ -0,0 +1,96 @@
+import asyncio
+import random
+import resource
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from taxi.events import Broker
+
+
+class Command(BaseCommand):
+    help = "Measure event fan-out latency with many concurrent feed subscribers in one loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument(
+            "--filtered",
+            type=float,
+            default=0.8,
+            help="Share of subscribers following a single car.",
+        )
+        parser.add_argument("--cars", type=int, default=1000)
+        parser.add_argument("--events", type=int, default=2000)
+        parser.add_argument("--rate", type=float, default=500, help="Events per second.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        latencies, delivered = asyncio.run(self.run(options))
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        latencies_ms = sorted(latency * 1000 for latency in latencies)
+        self.stdout.write(
+            f"{options['subscribers']} subscribers ({options['filtered']:.0%} following one car), "
+            f"{options['events']} events at {options['rate']:.0f}/s"
+        )
+        self.stdout.write(f"Delivered {delivered} messages in {len(latencies)} writes")
+        self.stdout.write(
+            f"Latency (oldest event per write) median {statistics.median(latencies_ms):.2f} ms, "
+            f"p99 {latencies_ms[int(len(latencies_ms) * 0.99)]:.2f} ms, "
+            f"max {latencies_ms[-1]:.2f} ms"
+        )
+        self.stdout.write(f"Peak RSS grew by {(rss_after - rss_before) / 1024:.1f} MB")
+
+    async def run(self, options):
+        rng = random.Random(options["seed"])
+        broker = Broker()
+        sent_at = {}
+        latencies = []
+        delivered = 0
+
+        subscriptions = [
+            broker.subscribe(keys={("car", rng.randrange(options["cars"]))})
+            if rng.random() < options["filtered"]
+            else broker.subscribe()
+            for _ in range(options["subscribers"])
+        ]
+
+        async def consume(subscription):
+            nonlocal delivered
+
+            while True:
+                chunk = await subscription.get()
+                received = time.perf_counter()
+
+                # The chunk waited as long as its oldest event.
+                start = chunk.index(b"id: ") + 4
+                event_id = int(chunk[start:chunk.index(b"\n", start)])
+                latencies.append(received - sent_at[event_id])
+                delivered += chunk.count(b"\n\n")
+
+        consumers = [asyncio.ensure_future(consume(subscription)) for subscription in subscriptions]
+
+        def publish():
+            for event_id in range(1, options["events"] + 1):
+                car = rng.randrange(options["cars"])
+                sent_at[event_id] = time.perf_counter()
+                broker.publish("car.drivers", {"car": car, "drivers": [car], "action": "added"}, cars=[car])
+                time.sleep(1 / options["rate"])
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+
+        while publisher.is_alive():
+            await asyncio.sleep(0.05)
+
+        await asyncio.sleep(0.5)
+
+        for consumer in consumers:
+            consumer.cancel()
+
+        await asyncio.gather(*consumers, return_exceptions=True)
+
+        return latencies, delivered
@@ -0,0 +1,104 @@
+import math
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from taxi.locations import SpatialIndex, distance_km
+
+# Around Kyiv, about 35 x 45 km.
+CENTER = (50.45, 30.52)
+SPREAD = 0.2
+
+
+def random_point(rng):
+    return (
+        CENTER[0] + rng.uniform(-SPREAD, SPREAD) * 0.8,
+        CENTER[1] + rng.uniform(-SPREAD, SPREAD),
+    )
+
+
+def scan(connection, latitude, longitude, k):
+    """Naive nearest query: rank every row by equirectangular distance."""
+    scale = math.cos(math.radians(latitude)) ** 2
+    rows = connection.execute(
+        "SELECT driver_id, latitude, longitude FROM location "
+        "ORDER BY (latitude - ?) * (latitude - ?) + (longitude - ?) * (longitude - ?) * ? "
+        "LIMIT ?",
+        (latitude, latitude, longitude, longitude, scale, k),
+    ).fetchall()
+
+    return sorted(
+        (distance_km(latitude, longitude, row_latitude, row_longitude), driver_id)
+        for driver_id, row_latitude, row_longitude in rows
+    )
+
+
+def timed(function, queries):
+    timings = []
+    results = []
+
+    for query in queries:
+        started = time.perf_counter()
+        results.append(function(*query))
+        timings.append(time.perf_counter() - started)
+
+    return timings, results
+
+
+class Command(BaseCommand):
+    help = "Benchmark k-nearest-driver lookups: grid index vs a full SQLite scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drivers", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("-k", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        self.stdout.write(
+            f"{name:<18} median {statistics.median(timings) * 1000:8.3f} ms   "
+            f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:8.3f} ms"
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        drivers = [(driver_id, *random_point(rng)) for driver_id in range(options["drivers"])]
+        queries = [(*random_point(rng), options["k"]) for _ in range(options["queries"])]
+
+        started = time.perf_counter()
+        index = SpatialIndex()
+
+        for driver_id, latitude, longitude in drivers:
+            index.update(driver_id, latitude, longitude, 0)
+
+        self.stdout.write(
+            f"Indexed {len(index)} drivers in {time.perf_counter() - started:.2f}s "
+            f"({len(index.cells)} cells)"
+        )
+
+        connection = sqlite3.connect(":memory:")
+        connection.execute(
+            "CREATE TABLE location (driver_id INTEGER PRIMARY KEY, latitude REAL, longitude REAL)"
+        )
+        connection.executemany("INSERT INTO location VALUES (?, ?, ?)", drivers)
+
+        index_timings, index_results = timed(index.nearest, queries)
+        scan_timings, scan_results = timed(lambda *query: scan(connection, *query), queries)
+
+        self.report("grid index", index_timings)
+        self.report("SQLite scan", scan_timings)
+        self.stdout.write(
+            f"Speed-up: {statistics.median(scan_timings) / statistics.median(index_timings):.0f}x"
+        )
+
+        mismatches = sum(
+            [key for _, key in found] != [key for _, key in expected]
+            for found, expected in zip(index_results, scan_results)
+        )
+        # The scan ranks by a flat-earth approximation, so rare ties at
+        # the k-th place can legitimately differ.
+        self.stdout.write(f"Results differing from the scan: {mismatches} of {len(queries)}")
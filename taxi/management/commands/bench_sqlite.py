@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+ROWS = 10_000
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, isolation_level=None, timeout=5)
+
+    for pragma, value in pragmas.items():
+        connection.execute(f"PRAGMA {pragma} = {value}")
+
+    return connection
+
+
+def seed(path, pragmas):
+    connection = connect(path, pragmas)
+    connection.executescript(
+        """
+        CREATE TABLE manufacturer (id INTEGER PRIMARY KEY, name TEXT, country TEXT);
+        CREATE TABLE car (
+            id INTEGER PRIMARY KEY,
+            model TEXT,
+            manufacturer_id INTEGER REFERENCES manufacturer(id)
+        );
+        CREATE INDEX car_manufacturer_id ON car (manufacturer_id);
+        """
+    )
+    connection.execute("BEGIN")
+    connection.executemany(
+        "INSERT INTO manufacturer (id, name, country) VALUES (?, ?, ?)",
+        [(num, f"Manufacturer {num}", f"Country {num % 10}") for num in range(100)],
+    )
+    connection.executemany(
+        "INSERT INTO car (id, model, manufacturer_id) VALUES (?, ?, ?)",
+        [(num, f"Model {num}", num % 100) for num in range(ROWS)],
+    )
+    connection.execute("COMMIT")
+    connection.close()
+
+
+def worker(path, pragmas, begin, duration, write_ratio, results):
+    connection = connect(path, pragmas)
+    rng = random.Random(os.getpid())
+    reads = writes = errors = 0
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        car_id = rng.randrange(ROWS)
+
+        try:
+            if rng.random() < write_ratio:
+                # read-modify-write, like a form post
+                connection.execute(begin)
+                connection.execute("SELECT model FROM car WHERE id = ?", (car_id,)).fetchone()
+                connection.execute(
+                    "UPDATE car SET model = ? WHERE id = ?", (f"Model {rng.random()}", car_id)
+                )
+                connection.execute("COMMIT")
+                writes += 1
+            else:
+                connection.execute(
+                    "SELECT car.model, manufacturer.name FROM car "
+                    "JOIN manufacturer ON manufacturer.id = car.manufacturer_id "
+                    "WHERE car.manufacturer_id = ?",
+                    (car_id % 100,),
+                ).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+
+    results.put((reads, writes, errors))
+
+
+class Command(BaseCommand):
+    help = "Benchmark mixed SQLite read/write throughput with N worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per profile.")
+        parser.add_argument("--write-ratio", type=float, default=0.2)
+
+    def run_profile(self, name, pragmas, begin, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite3")
+            seed(path, pragmas)
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(
+                    target=worker,
+                    args=(path, pragmas, begin, options["duration"], options["write_ratio"], results),
+                )
+                for _ in range(options["workers"])
+            ]
+
+            for process in processes:
+                process.start()
+
+            totals = [sum(column) for column in zip(*(results.get() for _ in processes))]
+
+            for process in processes:
+                process.join()
+
+        reads, writes, errors = totals
+        self.stdout.write(
+            f"{name:<28} {reads / options['duration']:>10.0f} reads/s "
+            f"{writes / options['duration']:>8.0f} writes/s {errors:>6} lock errors"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['workers']} workers, {options['write_ratio']:.0%} writes, "
+            f"{options['duration']:.0f}s per profile"
+        )
+        self.run_profile("default (rollback journal)", {"busy_timeout": 5000}, "BEGIN", options)
+        self.run_profile("tuned, BEGIN", settings.SQLITE_PRAGMAS, "BEGIN", options)
+        self.run_profile("tuned, BEGIN IMMEDIATE", settings.SQLITE_PRAGMAS, "BEGIN IMMEDIATE", options)
@@ -0,0 +1,95 @@
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from taxi.pricing import SURGE_ZONE_DEGREES, compute_surge
+
+# Around Kyiv, about 35 x 45 km.
+CENTER = (50.45, 30.52)
+SPREAD = (0.16, 0.2)
+
+
+def clustered_points(rng, count, hotspots, share):
+    """Uniform points, with `share` of them around a few hotspots."""
+    clustered = int(count * share)
+    uniform = np.column_stack([
+        CENTER[0] + rng.uniform(-SPREAD[0], SPREAD[0], count - clustered),
+        CENTER[1] + rng.uniform(-SPREAD[1], SPREAD[1], count - clustered),
+    ])
+    around = hotspots[rng.integers(len(hotspots), size=clustered)] + rng.normal(0, 0.01, (clustered, 2))
+
+    return np.concatenate([uniform, around])
+
+
+def count_in_python(request_points, driver_points):
+    """Baseline: per-point dict counting, ratios zone by zone."""
+    demand = Counter(
+        (int(latitude // SURGE_ZONE_DEGREES), int(longitude // SURGE_ZONE_DEGREES))
+        for latitude, longitude in request_points.tolist()
+    )
+    supply = Counter(
+        (int(latitude // SURGE_ZONE_DEGREES), int(longitude // SURGE_ZONE_DEGREES))
+        for latitude, longitude in driver_points.tolist()
+    )
+
+    return {zone: count / max(supply[zone], 1) for zone, count in demand.items()}
+
+
+class Command(BaseCommand):
+    help = "Benchmark a full-city surge recompute and snapshot lookups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20_000, help="Open ride requests.")
+        parser.add_argument("--drivers", type=int, default=50_000, help="Free drivers.")
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument("--lookups", type=int, default=100_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        hotspots = np.array(CENTER) + rng.uniform(-0.1, 0.1, (5, 2))
+        requests = clustered_points(rng, options["requests"], hotspots, 0.5)
+        drivers = clustered_points(rng, options["drivers"], hotspots, 0.1)
+
+        snapshot = None
+        timings = []
+
+        for _ in range(options["rounds"]):
+            started = time.perf_counter()
+            snapshot = compute_surge(requests, drivers, snapshot)
+            timings.append(time.perf_counter() - started)
+
+        baseline = []
+
+        for _ in range(min(options["rounds"], 5)):
+            started = time.perf_counter()
+            count_in_python(requests, drivers)
+            baseline.append(time.perf_counter() - started)
+
+        points = clustered_points(rng, options["lookups"], hotspots, 0.5).tolist()
+        started = time.perf_counter()
+
+        for latitude, longitude in points:
+            snapshot.multiplier(latitude, longitude)
+
+        lookup = (time.perf_counter() - started) / len(points)
+        surging = snapshot.surging()
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['drivers']} drivers, "
+            f"{snapshot.multipliers.size} zones of {SURGE_ZONE_DEGREES} degrees"
+        )
+        self.stdout.write(
+            f"Recompute median {statistics.median(timings) * 1000:.2f} ms, "
+            f"max {max(timings) * 1000:.2f} ms"
+        )
+        self.stdout.write(
+            f"Counting in Python alone median {statistics.median(baseline) * 1000:.2f} ms"
+        )
+        self.stdout.write(f"Snapshot lookup {lookup * 1e6:.2f} us")
+        self.stdout.write(
+            f"{len(surging)} zones surging, highest x{max((m for _, _, m in surging), default=1.0):.1f}"
+        )
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from taxi.telemetry import SEGMENT_POINTS, decode_points, encode_points, quantize
+
+CENTER = (50.45, 30.52)
+
+
+def random_track(rng, points, start_ms):
+    """A ping every second, moving up to ~15 m/s with GPS jitter."""
+    times = start_ms + np.arange(points) * 1000 + rng.integers(-50, 50, points)
+    steps = rng.normal(0, 0.00005, (points, 2)).cumsum(axis=0)
+    jitter = rng.normal(0, 0.00001, (points, 2))
+
+    return np.column_stack([times, CENTER + steps + jitter])
+
+
+def file_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+
+class Command(BaseCommand):
+    help = "Compare GPS track storage: a row per point vs delta-encoded segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rides", type=int, default=200)
+        parser.add_argument("--points", type=int, default=1800, help="Points per ride.")
+        parser.add_argument("--reads", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        tracks = [
+            quantize(random_track(rng, options["points"], 1_700_000_000_000 + ride * 10_000_000))
+            for ride in range(options["rides"])
+        ]
+        reads = rng.integers(0, options["rides"], options["reads"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            rows_path = os.path.join(directory, "rows.sqlite3")
+            rows = sqlite3.connect(rows_path)
+            rows.execute(
+                "CREATE TABLE point (ride_id INTEGER, time INTEGER, latitude REAL, longitude REAL)"
+            )
+            rows.execute("CREATE INDEX point_ride_time ON point (ride_id, time)")
+
+            started = time.perf_counter()
+
+            for ride, track in enumerate(tracks):
+                rows.executemany(
+                    "INSERT INTO point VALUES (?, ?, ?, ?)",
+                    ((ride, int(t), lat / 1e6, lon / 1e6) for t, lat, lon in track.tolist()),
+                )
+
+            rows.commit()
+            rows_write = time.perf_counter() - started
+
+            segments_path = os.path.join(directory, "segments.sqlite3")
+            segments = sqlite3.connect(segments_path)
+            segments.execute(
+                "CREATE TABLE segment (ride_id INTEGER, start_time INTEGER, point_count INTEGER, data BLOB)"
+            )
+            segments.execute("CREATE INDEX segment_ride_start ON segment (ride_id, start_time)")
+
+            started = time.perf_counter()
+
+            for ride, track in enumerate(tracks):
+                segments.executemany(
+                    "INSERT INTO segment VALUES (?, ?, ?, ?)",
+                    (
+                        (ride, int(chunk[0, 0]), len(chunk), encode_points(chunk))
+                        for chunk in np.split(track, range(SEGMENT_POINTS, len(track), SEGMENT_POINTS))
+                    ),
+                )
+
+            segments.commit()
+            segments_write = time.perf_counter() - started
+
+            row_timings, segment_timings = [], []
+
+            for ride in reads.tolist():
+                started = time.perf_counter()
+                np.array(
+                    rows.execute(
+                        "SELECT time, latitude, longitude FROM point WHERE ride_id = ? ORDER BY time",
+                        (ride,),
+                    ).fetchall()
+                )
+                row_timings.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                np.concatenate([
+                    decode_points(data)
+                    for data, in segments.execute(
+                        "SELECT data FROM segment WHERE ride_id = ? ORDER BY start_time", (ride,)
+                    )
+                ])
+                segment_timings.append(time.perf_counter() - started)
+
+            rows.close()
+            segments.close()
+            total_points = sum(len(track) for track in tracks)
+
+            self.stdout.write(
+                f"{options['rides']} rides, {total_points} points, {options['reads']} track reads"
+            )
+
+            for name, path, write, timings in (
+                ("Row per point", rows_path, rows_write, row_timings),
+                ("Segments     ", segments_path, segments_write, segment_timings),
+            ):
+                size = file_size(path)
+                self.stdout.write(
+                    f"{name} {size / 1024 / 1024:6.2f} MB ({size / total_points:5.1f} B/point), "
+                    f"write {write:.2f}s, read median {statistics.median(timings) * 1000:.2f} ms"
+                )
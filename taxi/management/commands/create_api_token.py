@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from taxi.tokens import create_token
+
+
+class Command(BaseCommand):
+    help = "Create an API token for a device or feed to send as `Authorization: Bearer <token>`."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="The user the token acts as.")
+        parser.add_argument("name", help="What the token is for, e.g. hr-feed.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["username"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user {options['username']!r}.")
+
+        # Printed once: only its hash is stored.
+        self.stdout.write(create_token(user, options["name"]))
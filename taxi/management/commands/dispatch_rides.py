@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from taxi.dispatch import DISPATCH_BATCH_SIZE, dispatch_batch
+
+
+class Command(BaseCommand):
+    help = "Assign pending rides to nearby available drivers in micro-batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds between batches.",
+        )
+        parser.add_argument("--batch-size", type=int, default=DISPATCH_BATCH_SIZE)
+        parser.add_argument("--once", action="store_true", help="Run a single batch and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            assigned = dispatch_batch(options["batch_size"])
+            elapsed = time.perf_counter() - started
+
+            if assigned or options["verbosity"] > 1:
+                self.stdout.write(f"Assigned {assigned} rides in {elapsed * 1000:.1f} ms")
+
+            if options["once"]:
+                return
+
+            time.sleep(max(0.0, options["interval"] - elapsed))
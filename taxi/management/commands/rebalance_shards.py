@@ -0,0 +1,146 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from taxi.db import immediate_atomic
+from taxi.models import Car, Manufacturer
+from taxi.sharding import get_shards, mirror, shard_map
+
+MOVE_BATCH_SIZE = 500
+
+
+def shard_loads():
+    """`{shard: {manufacturer_id: num_cars}}` for every shard."""
+    return {
+        shard: dict(
+            Car.objects.using(shard)
+            .order_by()
+            .values("manufacturer_id")
+            .annotate(num_cars=Count("pk"))
+            .values_list("manufacturer_id", "num_cars")
+        )
+        for shard in get_shards()
+    }
+
+
+def plan_moves(loads, tolerance):
+    """Greedily move manufacturers from the fullest to the emptiest shard.
+
+    A move is only planned if it narrows the gap between the two, and
+    planning stops once all shards are within `tolerance` cars.
+    """
+    loads = {shard: dict(manufacturers) for shard, manufacturers in loads.items()}
+    moves = []
+
+    while True:
+        totals = {shard: sum(manufacturers.values()) for shard, manufacturers in loads.items()}
+        fullest = max(totals, key=totals.get)
+        emptiest = min(totals, key=totals.get)
+        gap = totals[fullest] - totals[emptiest]
+
+        if gap <= tolerance:
+            return moves
+
+        candidates = [
+            (num_cars, manufacturer_id)
+            for manufacturer_id, num_cars in loads[fullest].items()
+            if num_cars < gap
+        ]
+
+        if not candidates:
+            return moves
+
+        # The move that leaves the two shards closest to even.
+        num_cars, manufacturer_id = min(
+            candidates, key=lambda candidate: (abs(gap - 2 * candidate[0]), -candidate[0])
+        )
+        loads[emptiest][manufacturer_id] = loads[fullest].pop(manufacturer_id)
+        moves.append((manufacturer_id, fullest, emptiest, num_cars))
+
+
+def move_manufacturer(manufacturer_id, source, target):
+    """Copy a manufacturer's cars to `target` in batches, repoint it, then clean up `source`."""
+    manufacturer = Manufacturer.objects.using("default").get(pk=manufacturer_id)
+    mirror(Manufacturer, [manufacturer], ["name", "country"], shards=[target])
+    through = Car.drivers.through
+    last_pk = 0
+
+    while True:
+        cars = list(
+            Car.objects.using(source)
+            .filter(manufacturer_id=manufacturer_id, pk__gt=last_pk)
+            .order_by("pk")[:MOVE_BATCH_SIZE]
+        )
+
+        if not cars:
+            break
+
+        pks = [car.pk for car in cars]
+        links = list(
+            through.objects.using(source).filter(car_id__in=pks).values_list("car_id", "driver_id")
+        )
+
+        with immediate_atomic(using=target):
+            Car.objects.using(target).filter(pk__in=pks).delete()
+            Car.objects.using(target).bulk_create(
+                Car(pk=car.pk, model=car.model, manufacturer_id=car.manufacturer_id) for car in cars
+            )
+            through.objects.using(target).bulk_create(
+                through(car_id=car_id, driver_id=driver_id) for car_id, driver_id in links
+            )
+
+        last_pk = pks[-1]
+
+    shard_map.assign(manufacturer_id, target)
+
+    with immediate_atomic(using=source):
+        Manufacturer.objects.using(source).filter(pk=manufacturer_id).delete()
+
+
+class Command(BaseCommand):
+    help = (
+        "Move manufacturers, with their cars, between fleet shards. Writes to a "
+        "manufacturer's cars made while it is being moved can be lost, so run it "
+        "during a quiet period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--move",
+            nargs=2,
+            metavar=("MANUFACTURER_ID", "SHARD"),
+            help="Move one manufacturer to the given shard.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=int,
+            default=100,
+            help="Acceptable difference in cars between shards when balancing.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+
+        if not shards:
+            raise CommandError("No shards configured, set DATABASE_SHARD_URLS.")
+
+        if options["move"]:
+            manufacturer_id, target = int(options["move"][0]), options["move"][1]
+
+            if target not in shards:
+                raise CommandError(f"Unknown shard {target}, expected one of {', '.join(shards)}.")
+
+            source = shard_map.shard_for(manufacturer_id)
+            moves = [(manufacturer_id, source, target, None)] if source != target else []
+        else:
+            moves = plan_moves(shard_loads(), options["tolerance"])
+
+        if not moves:
+            self.stdout.write("Nothing to move.")
+
+        for manufacturer_id, source, target, num_cars in moves:
+            cars = "" if num_cars is None else f" ({num_cars} cars)"
+            self.stdout.write(f"Manufacturer {manufacturer_id}{cars}: {source} -> {target}")
+
+            if not options["dry_run"]:
+                move_manufacturer(manufacturer_id, source, target)
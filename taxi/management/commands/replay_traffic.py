@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taxi.traffic import COMPARE_THRESHOLD, compare, latencies, read_capture, replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay captured traffic against an instance and compare per-route latencies "
+        "with a baseline run or capture."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("captures", nargs="+", help="Capture or result files (globs allowed).")
+        parser.add_argument("--target", help="Base URL to replay against, e.g. https://staging.example.com.")
+        parser.add_argument("--speed", type=float, default=1.0, help="2 replays twice as fast.")
+        parser.add_argument("--workers", type=int, default=64)
+        parser.add_argument("--route", help="Only routes starting with this, e.g. taxi:api-.")
+        parser.add_argument("--limit", type=int, help="Only the first N requests.")
+        parser.add_argument("--sessions", help='JSON file of {"user id" or "*": session id}.')
+        parser.add_argument("--output", help="Write the replayed requests here, for later comparisons.")
+        parser.add_argument("--baseline", help="Capture or result file to compare latencies against.")
+        parser.add_argument("--threshold", type=float, default=COMPARE_THRESHOLD)
+
+    def handle(self, *args, **options):
+        records = read_capture(options["captures"])
+
+        if options["route"]:
+            records = [record for record in records if record["route"].startswith(options["route"])]
+
+        records = records[:options["limit"]]
+
+        if options["target"]:
+            if options["speed"] <= 0:
+                raise CommandError("--speed must be positive.")
+
+            sessions = None
+
+            if options["sessions"]:
+                with open(options["sessions"]) as sessions_file:
+                    sessions = json.load(sessions_file)
+
+            self.stdout.write(f"Replaying {len(records)} requests at {options['speed']:g}x...")
+            records = replay(records, options["target"], options["speed"], sessions, options["workers"])
+
+            if options["output"]:
+                with open(options["output"], "w") as output:
+                    output.writelines(json.dumps(record) + "\n" for record in records)
+
+        if options["baseline"]:
+            self.write_comparison(read_capture([options["baseline"]]), records, options["threshold"])
+        else:
+            self.write_summary(records)
+
+    def write_summary(self, records):
+        errors = sum(1 for record in records if record.get("status") is None or record["status"] >= 500)
+        self.stdout.write(f"{len(records)} requests, {errors} failed")
+        self.stdout.write(f"{'route':<40} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+
+        for route, values in sorted(latencies(records).items()):
+            p50, p90, p99 = (values[min(len(values) - 1, int(len(values) * q))] for q in (0.5, 0.9, 0.99))
+            self.stdout.write(f"{route:<40} {len(values):>7} {p50:>9.1f} {p90:>9.1f} {p99:>9.1f}")
+
+    def write_comparison(self, baseline, records, threshold):
+        self.stdout.write(f"{'route':<40} {'count':>13} {'p50 ms':>17} {'p99 ms':>17} {'KS':>5}")
+
+        for row in compare(baseline, records, threshold):
+            self.stdout.write(
+                f"{row['route']:<40} {row['count'][0]:>6}/{row['count'][1]:<6} "
+                f"{row['p50'][0]:>8.1f}/{row['p50'][1]:<8.1f} {row['p99'][0]:>8.1f}/{row['p99'][1]:<8.1f} "
+                f"{row['ks']:>5.2f}{'  changed' if row['changed'] else ''}"
+            )
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from taxi.archive import STATUSES, RideHistory, from_microseconds, month_start, next_month, to_microseconds
+from taxi.models import Ride
+
+
+class Command(BaseCommand):
+    help = "Monthly ride statistics, from online and archived rides alike."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First month, YYYY-MM.")
+        parser.add_argument("--until", help="Month after the last one, YYYY-MM.")
+        parser.add_argument("--driver", type=int, help="Only this driver's rides.")
+
+    def parse_month(self, value):
+        if value is None:
+            return None
+
+        try:
+            return timezone.make_aware(datetime.strptime(value, "%Y-%m"))
+        except ValueError:
+            raise CommandError(f"Expected YYYY-MM, got {value!r}.")
+
+    def handle(self, *args, **options):
+        filters = {} if options["driver"] is None else {"driver_id": options["driver"]}
+        history = RideHistory(self.parse_month(options["since"]), self.parse_month(options["until"]), **filters)
+        columns = history.columns("requested_at", "status", "pickup_distance_km", "surge_multiplier")
+
+        if not len(columns["requested_at"]):
+            self.stdout.write("No rides.")
+            return
+
+        self.stdout.write(
+            f"{'month':<8} {'rides':>8} {'completed':>10} {'cancelled':>10} {'pickup km':>10} {'surge':>6}"
+        )
+        start = month_start(from_microseconds(int(columns["requested_at"].min())))
+        last = columns["requested_at"].max()
+
+        while to_microseconds(start) <= last:
+            end = next_month(start)
+            month = (columns["requested_at"] >= to_microseconds(start)) & (
+                columns["requested_at"] < to_microseconds(end)
+            )
+
+            if month.any():
+                statuses = columns["status"][month]
+                distances = columns["pickup_distance_km"][month]
+                self.stdout.write(
+                    f"{start:%Y-%m}  {month.sum():>8} "
+                    f"{(statuses == STATUSES.index(Ride.COMPLETED)).sum():>10} "
+                    f"{(statuses == STATUSES.index(Ride.CANCELLED)).sum():>10} "
+                    f"{np.nanmean(distances) if (~np.isnan(distances)).any() else 0:>10.2f} "
+                    f"{columns['surge_multiplier'][month].mean():>6.2f}"
+                )
+
+            start = end
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from taxi.models import Car, Driver
+from taxi.sharding import scatter
+from taxi.shifts import ROSTER_SHIFT_LENGTH, book_shifts, weekly_roster
+
+
+class Command(BaseCommand):
+    help = "Roster every active driver onto the fleet's cars, around the clock, for a week."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--week", help="First day, YYYY-MM-DD (default: next Monday).")
+        parser.add_argument("--days", type=int, default=7)
+        parser.add_argument(
+            "--shift-hours", type=float, default=ROSTER_SHIFT_LENGTH.total_seconds() / 3600
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Plan the roster without booking it.")
+
+    def handle(self, *args, **options):
+        if options["week"]:
+            try:
+                day = datetime.strptime(options["week"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--week must be YYYY-MM-DD.")
+        else:
+            today = timezone.localdate()
+            day = today + timedelta(days=7 - today.weekday())
+
+        starts_at = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        driver_ids = list(Driver.objects.filter(is_active=True).order_by("pk").values_list("pk", flat=True))
+        car_ids = sorted(
+            car_id
+            for queryset in scatter(Car.objects.order_by())
+            for car_id in queryset.values_list("pk", flat=True)
+        )
+
+        started = time.perf_counter()
+
+        try:
+            shifts = weekly_roster(
+                starts_at, driver_ids, car_ids, options["days"], timedelta(hours=options["shift_hours"])
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        planned = time.perf_counter() - started
+        self.stdout.write(
+            f"Planned {len(shifts)} shifts for {len(car_ids)} cars and {len(driver_ids)} drivers "
+            f"from {starts_at:%Y-%m-%d %H:%M} in {planned * 1000:.0f} ms"
+        )
+
+        if options["dry_run"]:
+            return
+
+        started = time.perf_counter()
+
+        try:
+            book_shifts(shifts)
+        except ValidationError as error:
+            raise CommandError("; ".join(error.messages))
+
+        self.stdout.write(f"Booked them in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,75 @@
+import multiprocessing
+import signal
+import time
+
+from django import db
+from django.core.management.base import BaseCommand
+
+from taxi.events import EVENT_PRUNE_INTERVAL, prune_events
+from taxi.jobs import claim, run
+
+
+def work(poll_interval, burst):
+    stopping = []
+    # Finish the current batch loop and exit, rather than dying mid-job.
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    pruned_at = None
+
+    while not stopping:
+        if pruned_at is None or time.monotonic() - pruned_at >= EVENT_PRUNE_INTERVAL:
+            prune_events()
+            pruned_at = time.monotonic()
+
+        job = claim()
+
+        if job is None:
+            if burst:
+                return
+
+            time.sleep(poll_interval)
+            continue
+
+        run(job)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (manufacturer deletes, driver imports, car exports) and prune relayed events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Running jobs with {options['workers']} worker(s)")
+
+        if options["workers"] == 1:
+            work(options["poll_interval"], options["burst"])
+            return
+
+        # Children must not share the parent's database connections.
+        db.connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work, args=(options["poll_interval"], options["burst"]))
+            for _ in range(options["workers"])
+        ]
+
+        for process in processes:
+            process.start()
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+                process.join()
@@ -0,0 +1,59 @@
+import os
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from taxi.jsonlog import read_json_lines
+
+
+class Command(BaseCommand):
+    help = "Rank slow-query fingerprints by total time spent in them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "logs",
+            nargs="*",
+            help="Slow-query log files (globs allowed); defaults to all of SLOW_QUERY_LOG_DIR.",
+        )
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--route", help="Only queries from routes starting with this.")
+        parser.add_argument("--plans", action="store_true", help="Show each fingerprint's SQL and query plan.")
+
+    def handle(self, *args, **options):
+        logs = options["logs"] or [os.path.join(settings.SLOW_QUERY_LOG_DIR, "slow-queries-*.jsonl*")]
+        entries = [
+            entry for entry in read_json_lines(logs)
+            if not options["route"] or (entry.get("route") or "").startswith(options["route"])
+        ]
+
+        if not entries:
+            self.stdout.write("No slow queries logged.")
+            return
+
+        groups = defaultdict(list)
+
+        for entry in entries:
+            groups[entry["fingerprint"]].append(entry)
+
+        ranked = sorted(groups.values(), key=lambda group: -sum(entry["ms"] for entry in group))
+        self.stdout.write(
+            f"{'fingerprint':<16} {'count':>6} {'total ms':>10} {'mean':>8} {'p95':>8} {'max':>8}  top routes"
+        )
+
+        for group in ranked[:options["limit"]]:
+            timings = np.array([entry["ms"] for entry in group])
+            routes = Counter(entry.get("route") or "-" for entry in group).most_common(3)
+            self.stdout.write(
+                f"{group[0]['fingerprint']:<16} {len(group):>6} {timings.sum():>10.1f} {timings.mean():>8.1f} "
+                f"{np.percentile(timings, 95):>8.1f} {timings.max():>8.1f}  "
+                + ", ".join(f"{route} ({count})" for route, count in routes)
+            )
+
+            if options["plans"]:
+                plan = next((entry["plan"] for entry in group if entry.get("plan")), None)
+                self.stdout.write(f"    {group[0]['sql']}")
+
+                for line in plan or ["(no plan captured)"]:
+                    self.stdout.write(f"      {line}")
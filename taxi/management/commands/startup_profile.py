@@ -0,0 +1,121 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+PHASES = ("django.setup", "middleware", "urlconf", "first request")
+
+# Runs in a fresh interpreter, like a worker booting.
+COLD_START = """
+import json, sys, time
+
+started = time.perf_counter()
+import django
+
+django.setup()
+marks = [time.perf_counter()]
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+marks.append(time.perf_counter())
+
+from django.urls import get_resolver
+
+get_resolver().url_patterns
+marks.append(time.perf_counter())
+
+from django.test import RequestFactory
+
+hosts = [host for host in settings.ALLOWED_HOSTS if host != "*"]
+environ = RequestFactory().get(sys.argv[1], HTTP_HOST=hosts[0] if hosts else "localhost").environ
+response = application(environ, lambda status, headers: None)
+b"".join(response)
+marks.append(time.perf_counter())
+
+print(json.dumps([mark - started for mark in marks]))
+"""
+
+
+def parse_importtime(output):
+    """`[(module, self_us, cumulative_us, depth)]` from `-X importtime` output."""
+    modules = []
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+
+    return modules
+
+
+def by_package(modules):
+    """`{top-level package: microseconds}` of the modules' own import times."""
+    packages = defaultdict(int)
+
+    for name, self_us, _, _ in modules:
+        packages[name.split(".")[0]] += self_us
+
+    return packages
+
+
+class Command(BaseCommand):
+    help = "Report worker cold-start time by phase and where its import time goes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Cold starts to take the median of.")
+        parser.add_argument("--limit", type=int, default=15, help="Packages and modules to list.")
+        parser.add_argument("--path", default="/accounts/login/", help="Path of the first request.")
+        parser.add_argument(
+            "--env", action="append", default=[], metavar="NAME=VALUE",
+            help="Environment for the profiled processes, e.g. DJANGO_DEBUG_TOOLBAR=0.",
+        )
+
+    def start(self, environment, path, importtime=False):
+        command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", COLD_START, path]
+        result = subprocess.run(command, env=environment, capture_output=True, text=True)
+
+        if result.returncode:
+            raise CommandError(f"The profiled process failed:\n{result.stderr[-2000:]}")
+
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        environment = dict(os.environ)
+
+        for assignment in options["env"]:
+            name, _, value = assignment.partition("=")
+            environment[name] = value
+
+        runs = [self.start(environment, options["path"])[0] for _ in range(options["runs"])]
+        phases = [statistics.median(run[number] - (run[number - 1] if number else 0) for run in runs)
+                  for number in range(len(PHASES))]
+        total = statistics.median(run[-1] for run in runs)
+
+        self.stdout.write(f"Cold start, median of {options['runs']}: {total * 1000:.1f} ms")
+
+        for phase, seconds in zip(PHASES, phases):
+            self.stdout.write(f"  {phase:<14} {seconds * 1000:>8.1f} ms  {seconds / total:>6.1%}")
+
+        _, output = self.start(environment, options["path"], importtime=True)
+        modules = parse_importtime(output)
+        imported = sum(self_us for _, self_us, _, _ in modules)
+
+        self.stdout.write(f"\nImports: {len(modules)} modules, {imported / 1000:.1f} ms (self times, under -X importtime)")
+
+        for package, self_us in sorted(by_package(modules).items(), key=lambda item: -item[1])[:options["limit"]]:
+            self.stdout.write(f"  {package:<32} {self_us / 1000:>8.1f} ms  {self_us / imported:>6.1%}")
+
+        # Depth 0: what Django itself loads (settings, apps, middleware, URLconf).
+        self.stdout.write("\nSlowest top-level imports, cumulative:")
+        top_level = [module for module in modules if module[3] == 0]
+
+        for name, _, cumulative_us, _ in sorted(top_level, key=lambda module: -module[2])[:options["limit"]]:
+            self.stdout.write(f"  {name:<48} {cumulative_us / 1000:>8.1f} ms")
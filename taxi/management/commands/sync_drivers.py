@@ -0,0 +1,53 @@
+import csv
+import json
+from collections import Counter
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taxi.sync import SYNC_BATCH_SIZE, sync_drivers
+
+
+class Command(BaseCommand):
+    help = "Create or update drivers from an HR feed (JSON list or CSV) keyed on license_number."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to a .json or .csv feed file.")
+        parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE)
+        parser.add_argument(
+            "--show-invalid",
+            action="store_true",
+            help="Print validation errors for rejected records.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+
+        try:
+            with open(path, newline="") as feed:
+                if path.endswith(".csv"):
+                    records = list(csv.DictReader(feed))
+                else:
+                    records = json.load(feed)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read feed {path}: {error}")
+
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise CommandError(f"Cannot read feed {path}: expected a list of driver records.")
+
+        started = perf_counter()
+        results = sync_drivers(records, batch_size=options["batch_size"])
+        elapsed = perf_counter() - started
+
+        if options["show_invalid"]:
+            for result in results:
+                if result.get("errors"):
+                    self.stderr.write(f"{result['license_number']}: {result['errors']}")
+
+        summary = Counter(result["status"] for result in results)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Synced {len(results)} records in {elapsed:.2f}s: "
+                + ", ".join(f"{status} {count}" for status, count in sorted(summary.items()))
+            )
+        )
@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default SQLite database onto the SQLite replicas in "
+        "DATABASE_REPLICAS, to stand in for real replication locally."
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("The default database is not SQLite.")
+
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured, set DATABASE_REPLICA_URLS.")
+
+        source = sqlite3.connect(primary["NAME"])
+
+        for alias in settings.DATABASE_REPLICAS:
+            replica = settings.DATABASES[alias]
+
+            if replica["ENGINE"] != "django.db.backends.sqlite3":
+                self.stderr.write(f"Skipping {alias}: not SQLite.")
+                continue
+
+            target = sqlite3.connect(replica["NAME"])
+            # The backup API gives a consistent snapshot even while the
+            # primary is being written to.
+            source.backup(target)
+            target.close()
+            self.stdout.write(self.style.SUCCESS(f"Copied {primary['NAME']} to {alias} ({replica['NAME']})."))
+
+        source.close()
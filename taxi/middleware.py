@@ -0,0 +1,303 @@
+import math
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from .audit import current_request
+from .compression import COMPRESSIBLE_TYPES, compress, compress_stream, negotiate
+from .routers import choose_replica, read_replica
+from .slowlog import SlowQueryLogger
+from .jsonlog import JsonLinesLog
+from .ratelimit import take_token
+from .tokens import authenticate_token
+from .traffic import TRAFFIC_CAPTURE_NAMESPACES, sanitize_params
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PRIMARY_PIN_COOKIE = "pin_primary"
+
+
+class ApiTokenMiddleware:
+    """Authenticate `Authorization: Bearer <token>` requests (taxi.tokens).
+
+    Runs after AuthenticationMiddleware and replaces its user; an unknown
+    token gets a 401 instead of falling back to the session. Marks the
+    request with `api_token`, which exempts it from CSRF checks in
+    `taxi.api.MachineApiView`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        scheme, _, key = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+
+        if scheme.lower() == "bearer":
+            user = authenticate_token(key.strip())
+
+            if user is None:
+                return JsonResponse({"error": "Invalid token."}, status=401)
+
+            request.user = user
+            request.api_token = True
+
+        return self.get_response(request)
+
+
+def too_many_requests(retry_after, status=429):
+    response = HttpResponse(
+        "Too many requests, please retry later." if status == 429 else "Service overloaded, please retry later.",
+        status=status,
+        content_type="text/plain",
+    )
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+
+    return response
+
+
+class OverloadProtectionMiddleware:
+    """Rate limit by user and route, and shed load before the DB does.
+
+    * `RATE_LIMIT_PER_USER` is a `(rate, burst)` bucket per client and
+      route; `RATE_LIMIT_PER_ROUTE` maps URL names to a bucket shared by
+      all clients. Buckets live in `RATE_LIMIT_DB` (`taxi.ratelimit`),
+      so they are shared by every gunicorn worker on the host.
+    * `LOAD_SHED_LATENCY` sheds a growing share of a route's requests
+      while its average latency is above the target. A sync worker only
+      ever has one request in flight, so latency, not concurrency, is
+      what shows requests queueing for the workers.
+    """
+
+    latency_decay = 0.2
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.latency = {}
+
+    def __call__(self, request):
+        started = time.monotonic()
+        response = self.get_response(request)
+        route = getattr(request, "resolver_match", None)
+
+        if route and route.view_name:
+            self.record_latency(route.view_name, time.monotonic() - started)
+
+        return response
+
+    def record_latency(self, route, elapsed):
+        with self.lock:
+            average = self.latency.get(route, elapsed)
+            self.latency[route] = average + self.latency_decay * (elapsed - average)
+
+    def should_shed(self, route):
+        target = getattr(settings, "LOAD_SHED_LATENCY", None)
+        average = self.latency.get(route)
+
+        if not target or not average or average <= target:
+            return False
+
+        # Always let some requests through so the average can recover.
+        return random.random() < min(0.9, 1 - target / average)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = request.resolver_match.view_name
+
+        if self.should_shed(route):
+            return too_many_requests(self.latency[route], status=503)
+
+        now = time.time()
+        buckets = []
+
+        user_limit = getattr(settings, "RATE_LIMIT_PER_USER", None)
+        if user_limit:
+            if request.user.is_authenticated:
+                client = f"user:{request.user.pk}"
+            else:
+                client = f"ip:{request.META.get('REMOTE_ADDR')}"
+
+            buckets.append((f"ratelimit:{route}:{client}", user_limit))
+
+        route_limit = getattr(settings, "RATE_LIMIT_PER_ROUTE", {}).get(route)
+        if route_limit:
+            buckets.append((f"ratelimit:{route}", route_limit))
+
+        for key, (rate, burst) in buckets:
+            retry_after = take_token(key, rate, burst, now)
+
+            if retry_after:
+                return too_many_requests(retry_after)
+
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests read from replicas, with read-your-writes.
+
+    A successful write request sets a short-lived cookie, and requests
+    carrying it keep reading from the primary for `REPLICA_PIN_SECONDS`,
+    longer than the replicas are expected to lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = PRIMARY_PIN_COOKIE in request.COOKIES
+        # One replica for the whole request, so its reads see one snapshot.
+        replica = choose_replica() if request.method in SAFE_METHODS and not pinned else None
+        token = read_replica.set(replica)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            read_replica.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 500:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+
+class AuditContextMiddleware:
+    """Make the request, and so its user and route, known to taxi.audit."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+
+        try:
+            return self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+
+class TrafficCaptureMiddleware:
+    """Record `taxi:` requests for `manage.py replay_traffic` (taxi.traffic).
+
+    Enabled by `TRAFFIC_CAPTURE_DIR`; `TRAFFIC_CAPTURE_SAMPLE` is the
+    share of requests recorded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log = JsonLinesLog(settings.TRAFFIC_CAPTURE_DIR, "traffic")
+        self.sample = getattr(settings, "TRAFFIC_CAPTURE_SAMPLE", 1.0)
+
+    def __call__(self, request):
+        if self.sample < 1 and random.random() >= self.sample:
+            return self.get_response(request)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        route = getattr(request, "resolver_match", None)
+
+        if route and route.namespace in TRAFFIC_CAPTURE_NAMESPACES:
+            user = getattr(request, "user", None)
+            self.log.write({
+                "t": round(started_at, 6),
+                "route": route.view_name,
+                "method": request.method,
+                "path": request.path,
+                "params": sanitize_params(request.GET),
+                "user": user.pk if user is not None and user.is_authenticated else None,
+                "status": response.status_code,
+                "ms": round(elapsed * 1000, 3),
+            })
+
+        return response
+
+
+class SlowQueryLogMiddleware:
+    """Log the request's queries slower than `SLOW_QUERY_MS` (taxi.slowlog)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log = JsonLinesLog(settings.SLOW_QUERY_LOG_DIR, "slow-queries")
+
+    def __call__(self, request):
+        logger = SlowQueryLogger(self.log, settings.SLOW_QUERY_MS, request)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(logger))
+
+            return self.get_response(request)
+
+
+class CompressionMiddleware:
+    """Brotli or gzip responses for clients that accept them (taxi.compression)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_bytes = settings.RESPONSE_COMPRESSION_MIN_BYTES
+        self.levels = {"br": settings.RESPONSE_BROTLI_QUALITY, "gzip": settings.RESPONSE_GZIP_LEVEL}
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not self.compressible(response):
+            return response
+
+        # Whatever the coding, caches must key on the header.
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = negotiate(request.headers.get("Accept-Encoding"))
+
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(coding, response.streaming_content, self.levels[coding])
+            del response["Content-Length"]
+        else:
+            content = compress(coding, response.content, self.levels[coding])
+
+            if len(content) >= len(response.content):
+                return response
+
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        etag = response.get("ETag")
+
+        if etag and etag.startswith('"'):
+            # Same entity, different bytes.
+            response["ETag"] = "W/" + etag
+
+        response["Content-Encoding"] = coding
+
+        return response
+
+    def compressible(self, response):
+        if response.status_code not in (200, 201, 203) or response.has_header("Content-Encoding"):
+            return False
+
+        if "no-transform" in response.get("Cache-Control", ""):
+            return False
+
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+
+        if content_type not in COMPRESSIBLE_TYPES:
+            return False
+
+        if response.streaming:
+            length = response.get("Content-Length")
+
+            return length is None or int(length) >= self.min_bytes
+
+        return len(response.content) >= self.min_bytes
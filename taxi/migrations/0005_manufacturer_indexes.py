@@ -0,0 +1,21 @@
+# Generated by Django 4.0.2 on 2026-10-19 00:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0004_alter_driver_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='manufacturer',
+            index=models.Index(fields=['name'], name='taxi_manufa_name_13c564_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manufacturer',
+            index=models.Index(fields=['country', 'name'], name='taxi_manufa_country_a2b64d_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.2 on 2026-10-19 01:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0008_driver_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pickup_latitude', models.FloatField()),
+                ('pickup_longitude', models.FloatField()),
+                ('dropoff_latitude', models.FloatField(blank=True, null=True)),
+                ('dropoff_longitude', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('requested', 'Requested'), ('assigned', 'Assigned'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='requested', max_length=16)),
+                ('pickup_distance_km', models.FloatField(blank=True, null=True)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('car', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rides', to='taxi.car')),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rides', to=settings.AUTH_USER_MODEL)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requested_rides', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-requested_at', '-pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['status', 'requested_at'], name='taxi_ride_status_068cba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['status', 'driver'], name='taxi_ride_status_3d6fbd_idx'),
+        ),
+    ]
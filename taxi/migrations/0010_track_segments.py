@@ -0,0 +1,34 @@
+# Generated by Django 4.0.2 on 2026-10-19 01:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0009_rides'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.BigIntegerField()),
+                ('end_time', models.BigIntegerField()),
+                ('end_latitude', models.IntegerField()),
+                ('end_longitude', models.IntegerField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_segments', to='taxi.ride')),
+            ],
+            options={
+                'ordering': ['ride', 'start_time'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tracksegment',
+            index=models.Index(fields=['ride', 'start_time'], name='taxi_tracks_ride_id_73f79e_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.2 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0010_track_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='pickup_eta_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.2 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0011_ride_pickup_eta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='surge_multiplier',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
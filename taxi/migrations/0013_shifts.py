@@ -0,0 +1,45 @@
+# Generated by Django 4.0.2 on 2026-10-19 01:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0012_ride_surge_multiplier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('car', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='shifts', to='taxi.car')),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shifts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['starts_at', 'pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['car', 'starts_at', 'ends_at'], name='taxi_shift_car_id_401568_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['driver', 'starts_at', 'ends_at'], name='taxi_shift_driver__198f04_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['ends_at'], name='taxi_shift_ends_at_25b1d7_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shift',
+            constraint=models.CheckConstraint(check=models.Q(('ends_at__gt', django.db.models.expressions.F('starts_at'))), name='shift_ends_after_start'),
+        ),
+    ]
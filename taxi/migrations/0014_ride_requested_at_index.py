@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0013_shifts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['requested_at'], name='taxi_ride_request_c6e816_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.2 on 2026-10-19 02:12
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxi', '0015_audit_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublishedEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=63)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('cars', models.JSONField(default=list)),
+                ('drivers', models.JSONField(default=list)),
+                ('origin', models.CharField(max_length=63)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+    ]
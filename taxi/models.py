@@ -1,6 +1,11 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
+from django.utils import timezone
+
+from .sharding import ShardedQuerySet
 
 
 class Manufacturer(models.Model):
@@ -9,10 +14,17 @@ class Manufacturer(models.Model):
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name"]),
+            models.Index(fields=["country", "name"]),
+        ]
 
     def __str__(self):
         return f"{self.name} {self.country}"
 
+    def get_absolute_url(self):
+        return reverse("taxi:manufacturer-detail", kwargs={"pk": self.pk})
+
 
 class Driver(AbstractUser):
     license_number = models.CharField(max_length=8, unique=True)
@@ -34,8 +46,291 @@ class Car(models.Model):
     manufacturer = models.ForeignKey(Manufacturer, on_delete=models.CASCADE)
     drivers = models.ManyToManyField(Driver, related_name="cars")
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ["model"]
 
     def __str__(self):
         return f"{self.manufacturer.name} {self.model}"
+
+
+class DriverLocation(models.Model):
+    """A driver's last known position, from the newest GPS ping received."""
+
+    driver = models.OneToOneField(
+        Driver, primary_key=True, on_delete=models.CASCADE, related_name="location"
+    )
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    is_available = models.BooleanField(default=True)
+    # When the device took the fix, and when the server stored it.
+    recorded_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.driver_id} at {self.latitude:.5f}, {self.longitude:.5f}"
+
+
+class Ride(models.Model):
+    """A ride request, matched to a driver and car by `taxi.dispatch`."""
+
+    REQUESTED = "requested"
+    ASSIGNED = "assigned"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (REQUESTED, "Requested"),
+        (ASSIGNED, "Assigned"),
+        (COMPLETED, "Completed"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="requested_rides",
+    )
+    pickup_latitude = models.FloatField()
+    pickup_longitude = models.FloatField()
+    dropoff_latitude = models.FloatField(null=True, blank=True)
+    dropoff_longitude = models.FloatField(null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=REQUESTED)
+    driver = models.ForeignKey(
+        Driver, null=True, blank=True, on_delete=models.SET_NULL, related_name="rides"
+    )
+    # Cars may live on a shard (taxi.sharding), so no database constraint.
+    car = models.ForeignKey(
+        Car,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        related_name="rides",
+    )
+    pickup_distance_km = models.FloatField(null=True, blank=True)
+    pickup_eta_seconds = models.PositiveIntegerField(null=True, blank=True)
+    surge_multiplier = models.FloatField(default=1.0)
+    requested_at = models.DateTimeField(default=timezone.now)
+    assigned_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-requested_at", "-pk"]
+        indexes = [
+            models.Index(fields=["status", "requested_at"]),
+            models.Index(fields=["status", "driver"]),
+            # Monthly partitions, see taxi.archive.
+            models.Index(fields=["requested_at"]),
+        ]
+
+    def __str__(self):
+        return f"Ride #{self.pk} ({self.status})"
+
+
+class Shift(models.Model):
+    """A driver booked onto a car for `[starts_at, ends_at)` (taxi.shifts)."""
+
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name="shifts")
+    # Cars may live on a shard (taxi.sharding), so no database constraint.
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, db_constraint=False, related_name="shifts")
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["starts_at", "pk"]
+        indexes = [
+            models.Index(fields=["car", "starts_at", "ends_at"]),
+            models.Index(fields=["driver", "starts_at", "ends_at"]),
+            models.Index(fields=["ends_at"]),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(ends_at__gt=models.F("starts_at")), name="shift_ends_after_start"),
+        ]
+
+    def __str__(self):
+        return f"{self.driver_id} on car {self.car_id} from {self.starts_at} to {self.ends_at}"
+
+    def clean(self):
+        from .shifts import check_shift
+
+        check_shift(self.driver_id, self.car_id, self.starts_at, self.ends_at, exclude=self.pk)
+
+
+class TrackSegment(models.Model):
+    """Up to a few hundred GPS points of a ride, delta-encoded (taxi.telemetry).
+
+    Times are milliseconds since the epoch and coordinates microdegrees;
+    the `end_*` columns hold the last point, so points can be appended
+    without decoding `data`.
+    """
+
+    ride = models.ForeignKey(Ride, on_delete=models.CASCADE, related_name="track_segments")
+    start_time = models.BigIntegerField()
+    end_time = models.BigIntegerField()
+    end_latitude = models.IntegerField()
+    end_longitude = models.IntegerField()
+    point_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ["ride", "start_time"]
+        indexes = [models.Index(fields=["ride", "start_time"])]
+
+    def __str__(self):
+        return f"Ride #{self.ride_id}: {self.point_count} points from {self.start_time}"
+
+
+class ManufacturerShard(models.Model):
+    """Directory entry placing a manufacturer and its cars on a shard."""
+
+    manufacturer_id = models.BigIntegerField(primary_key=True)
+    shard = models.CharField(max_length=63)
+
+    def __str__(self):
+        return f"{self.manufacturer_id} -> {self.shard}"
+
+
+class IdSequence(models.Model):
+    """Allocates primary keys that are unique across all shards."""
+
+    name = models.CharField(max_length=63, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class Job(models.Model):
+    """A unit of background work, run in batches by `manage.py run_jobs`."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    name = models.CharField(max_length=63)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at", "-pk"]
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    def get_absolute_url(self):
+        return reverse("taxi:job-detail", kwargs={"pk": self.pk})
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == self.SUCCEEDED else 0
+
+        return min(100, self.progress * 100 // self.total)
+
+
+class ApiToken(models.Model):
+    """A bearer token a device or feed calls the API with (taxi.tokens)."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="api_tokens")
+    name = models.CharField(max_length=63)
+    # SHA-256 of the token, which is only shown when it is created.
+    key_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["user", "name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.user})"
+
+
+class AuditEntry(models.Model):
+    """A change to a car, driver or manufacturer, written by taxi.audit."""
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ADDED = "added"
+    REMOVED = "removed"
+    ACTION_CHOICES = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (DELETED, "Deleted"),
+        (ADDED, "Added"),
+        (REMOVED, "Removed"),
+    ]
+
+    model = models.CharField(max_length=63)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES)
+    # `{field: [old, new]}`, or `{field: [related ids]}` when added or removed.
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Written after the request, so the actor may be gone by then.
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        related_name="+",
+    )
+    route = models.CharField(max_length=100, blank=True)
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-recorded_at", "-pk"]
+        indexes = [models.Index(fields=["model", "object_id", "recorded_at"])]
+        verbose_name_plural = "audit entries"
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} {self.action} at {self.recorded_at}"
+
+
+class PublishedEvent(models.Model):
+    """A `taxi.events` event, kept briefly for the other processes to relay."""
+
+    topic = models.CharField(max_length=63)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    cars = models.JSONField(default=list)
+    drivers = models.JSONField(default=list)
+    # The publishing process, which has delivered the event already.
+    origin = models.CharField(max_length=63)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["pk"]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
@@ -0,0 +1,245 @@
+"""Zone-based surge pricing.
+
+The city is split into square zones `SURGE_ZONE_DEGREES` wide. Every
+`SURGE_INTERVAL` seconds, open ride requests (demand) and free drivers
+(supply) are binned into the zones around the requests with a single
+`np.bincount`. Both counts are blurred into the neighbouring zones, so
+a request at a zone's edge also sees the drivers just across it. Their ratio is smoothed over
+time and mapped through `SURGE_CURVE` to a multiplier.
+
+Each recompute builds a new read-only `SurgeSnapshot` and swaps it in
+with a single assignment. Readers never take a lock or compute: they use
+whichever snapshot they picked up. A background thread in each process
+refreshes the snapshot through `taxi.singleflight`, so one worker on the
+host recomputes it per interval and the others load its result from the
+shared cache.
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from .locations import LOCATION_MAX_AGE, driver_index
+from .models import Ride
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+SURGE_ZONE_DEGREES = 0.01
+SURGE_CACHE_KEY = "taxi:surge:snapshot"
+# Requests waiting longer than this are assumed to be abandoned.
+SURGE_REQUEST_WINDOW = LOCATION_MAX_AGE
+# Share of each zone's count spread evenly over its eight neighbours.
+SURGE_NEIGHBOUR_WEIGHT = 0.5
+# Weight of the latest ratio against the previous, smoothed one.
+SURGE_SMOOTHING = 0.5
+# (demand / supply ratio, multiplier) points, interpolated linearly.
+SURGE_CURVE = ((1.0, 1.0), (1.5, 1.2), (2.0, 1.5), (3.0, 2.0), (5.0, 3.0))
+SURGE_STEP = 0.1
+# About 300 x 300 zones: a metropolitan area, not a country.
+SURGE_MAX_ZONES = 100_000
+
+
+class SurgeSnapshot:
+    """Read-only multipliers for a block of zones, origin at `(row, col)`."""
+
+    def __init__(self, row, col, ratios, multipliers, computed_at):
+        self.row = row
+        self.col = col
+        self.ratios = ratios
+        self.multipliers = multipliers
+        self.computed_at = computed_at
+
+        for array in (ratios, multipliers):
+            array.setflags(write=False)
+
+    @classmethod
+    def empty(cls, computed_at=None):
+        return cls(0, 0, np.zeros((0, 0)), np.ones((0, 0)), computed_at)
+
+    @staticmethod
+    def zone(latitude, longitude):
+        return math.floor(latitude / SURGE_ZONE_DEGREES), math.floor(longitude / SURGE_ZONE_DEGREES)
+
+    def multiplier(self, latitude, longitude):
+        row, col = self.zone(latitude, longitude)
+        row, col = row - self.row, col - self.col
+
+        if 0 <= row < self.multipliers.shape[0] and 0 <= col < self.multipliers.shape[1]:
+            return float(self.multipliers[row, col])
+
+        return 1.0
+
+    def surging(self):
+        """`(row, col, multiplier)` of zones priced above normal."""
+        rows, cols = np.nonzero(self.multipliers > 1)
+
+        return [
+            (int(row) + self.row, int(col) + self.col, float(self.multipliers[row, col]))
+            for row, col in zip(rows, cols)
+        ]
+
+
+def blur(counts, weight=SURGE_NEIGHBOUR_WEIGHT):
+    padded = np.pad(counts, 1)
+    rows, cols = counts.shape
+    neighbours = sum(
+        padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]
+        for dy in (-1, 0, 1)
+        for dx in (-1, 0, 1)
+        if dy or dx
+    )
+
+    return (1 - weight) * counts + weight * neighbours / 8
+
+
+def realign(snapshot, row, col, shape):
+    """The snapshot's ratios on another block of zones, NaN where unknown."""
+    ratios = np.full(shape, np.nan)
+    top, left = max(row, snapshot.row), max(col, snapshot.col)
+    bottom = min(row + shape[0], snapshot.row + snapshot.ratios.shape[0])
+    right = min(col + shape[1], snapshot.col + snapshot.ratios.shape[1])
+
+    if top < bottom and left < right:
+        ratios[top - row:bottom - row, left - col:right - col] = snapshot.ratios[
+            top - snapshot.row:bottom - snapshot.row, left - snapshot.col:right - snapshot.col
+        ]
+
+    return ratios
+
+
+def compute_surge(request_points, driver_points, previous=None, computed_at=None):
+    """A `SurgeSnapshot` from `(n, 2)` arrays of latitudes and longitudes."""
+    request_points = np.asarray(request_points, dtype=float).reshape(-1, 2)
+    driver_points = np.asarray(driver_points, dtype=float).reshape(-1, 2)
+
+    if not len(request_points):
+        # Nothing to surge: everywhere is back to normal.
+        return SurgeSnapshot.empty(computed_at)
+
+    requested = np.floor(request_points / SURGE_ZONE_DEGREES).astype(np.int64)
+    available = np.floor(driver_points / SURGE_ZONE_DEGREES).astype(np.int64)
+    # The requests' zones and a ring around them, for the blur.
+    row, col = (int(value) - 1 for value in requested.min(axis=0))
+    shape = tuple(int(value) for value in requested.max(axis=0) - (row, col) + 2)
+
+    if shape[0] * shape[1] > SURGE_MAX_ZONES:
+        raise ValueError(f"Requests span {shape[0]} x {shape[1]} zones, over {SURGE_MAX_ZONES}.")
+
+    available = available[
+        (available[:, 0] >= row)
+        & (available[:, 0] < row + shape[0])
+        & (available[:, 1] >= col)
+        & (available[:, 1] < col + shape[1])
+    ]
+    size = shape[0] * shape[1]
+
+    # A 2-D histogram of both point sets at once: requests fill the
+    # first `size` bins, drivers the next.
+    zones = np.concatenate([requested, available])
+    bins = (zones[:, 0] - row) * shape[1] + (zones[:, 1] - col)
+    bins[len(requested):] += size
+    demand, supply = np.bincount(bins, minlength=2 * size).reshape(2, *shape)
+
+    ratios = blur(demand) / np.maximum(blur(supply), 1.0)
+
+    if previous is not None:
+        earlier = realign(previous, row, col, shape)
+        known = ~np.isnan(earlier)
+        ratios[known] = SURGE_SMOOTHING * ratios[known] + (1 - SURGE_SMOOTHING) * earlier[known]
+
+    xs, ys = zip(*SURGE_CURVE)
+    multipliers = np.floor(np.interp(ratios, xs, ys) / SURGE_STEP + 1e-9) * SURGE_STEP
+
+    return SurgeSnapshot(row, col, ratios, np.round(multipliers, 1), computed_at)
+
+
+class SurgePricer:
+    """This process's current snapshot, refreshed by a background thread."""
+
+    def __init__(self):
+        self.snapshot = SurgeSnapshot.empty()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def current(self):
+        self.start()
+
+        return self.snapshot
+
+    def refresh(self):
+        """Swap in the host's snapshot, recomputing it once `SURGE_INTERVAL` old."""
+        row, col, ratios, multipliers, computed_at = single_flight.get(
+            SURGE_CACHE_KEY, self.recompute, timeout=settings.SURGE_INTERVAL
+        )
+        self.snapshot = SurgeSnapshot(row, col, ratios, multipliers, computed_at)
+
+    def start(self):
+        """Refresh in a background thread, unless `SURGE_INTERVAL` is 0."""
+        if not settings.SURGE_INTERVAL:
+            return
+
+        # A forked worker doesn't inherit its parent's thread.
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+
+        with self.lock:
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="surge-pricer", daemon=True)
+                self.pid = os.getpid()
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.refresh()
+            except DatabaseError:
+                logger.exception("Couldn't recompute surge pricing")
+            finally:
+                connections["default"].close_if_unusable_or_obsolete()
+
+            time.sleep(settings.SURGE_INTERVAL)
+
+    def recompute(self):
+        """`(row, col, ratios, multipliers, computed_at)` of a new snapshot."""
+        now = timezone.now()
+        requests = np.array(
+            Ride.objects
+            .filter(status=Ride.REQUESTED, requested_at__gte=now - SURGE_REQUEST_WINDOW)
+            .values_list("pickup_latitude", "pickup_longitude"),
+            dtype=float,
+        )
+        busy = set(Ride.objects.filter(status=Ride.ASSIGNED).values_list("driver_id", flat=True))
+        driver_ids, latitudes, longitudes = driver_index.snapshot()
+        free = [index for index, driver_id in enumerate(driver_ids) if driver_id not in busy]
+
+        try:
+            snapshot = compute_surge(
+                requests,
+                np.column_stack([np.asarray(latitudes)[free], np.asarray(longitudes)[free]]),
+                self.snapshot,
+                now,
+            )
+        except ValueError:
+            logger.exception("Surge pricing disabled until the next recompute")
+            snapshot = SurgeSnapshot.empty(now)
+
+        return snapshot.row, snapshot.col, snapshot.ratios, snapshot.multipliers, snapshot.computed_at
+
+    def clear(self):
+        self.snapshot = SurgeSnapshot.empty()
+        single_flight.cache.delete(SURGE_CACHE_KEY)
+
+
+surge_pricer = SurgePricer()
+
+
+def surge_multiplier(latitude, longitude):
+    return surge_pricer.current().multiplier(latitude, longitude)
@@ -0,0 +1,98 @@
+"""Token buckets for `OverloadProtectionMiddleware`.
+
+Buckets are rows of a small SQLite database of their own,
+`RATE_LIMIT_DB`, which every gunicorn worker on the host opens. Taking
+a token is one short `BEGIN IMMEDIATE` transaction: SQLite serialises
+them across processes, so two workers can't take the same token, and
+the cost doesn't depend on how many buckets there are. `":memory:"`
+keeps per-process buckets instead.
+
+Buckets use the GCRA formulation of a token bucket: the only state is
+the "theoretical arrival time" of the next request. A bucket whose
+arrival time has passed is full, the same as a missing one, so those
+rows are deleted every `BUCKET_PRUNE_INTERVAL` seconds.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BUCKET_PRUNE_INTERVAL = 60.0
+
+
+class BucketStore:
+    """One connection per process to `RATE_LIMIT_DB`."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.key = None
+        self.pruned_at = None
+
+    def connect(self):
+        # A forked worker must not share its parent's connection.
+        key = (settings.RATE_LIMIT_DB, os.getpid())
+
+        if self.key != key:
+            connection = sqlite3.connect(key[0], timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Buckets are worth nothing after a crash.
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, arrival REAL NOT NULL) WITHOUT ROWID"
+            )
+            self.connection, self.key, self.pruned_at = connection, key, None
+
+        return self.connection
+
+    def take(self, key, rate, burst, now):
+        """Take one token; returns 0 when allowed, else the seconds until it would be."""
+        interval = 1 / rate
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                row = connection.execute("SELECT arrival FROM bucket WHERE key = ?", (key,)).fetchone()
+                arrival = max(row[0] if row else now, now) + interval
+                allowed_at = arrival - burst * interval
+
+                if allowed_at > now:
+                    return allowed_at - now
+
+                connection.execute(
+                    "INSERT INTO bucket (key, arrival) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET arrival = excluded.arrival",
+                    (key, arrival),
+                )
+
+                if self.pruned_at is None or time.monotonic() - self.pruned_at >= BUCKET_PRUNE_INTERVAL:
+                    connection.execute("DELETE FROM bucket WHERE arrival < ?", (now,))
+                    self.pruned_at = time.monotonic()
+
+                return 0
+            finally:
+                connection.execute("COMMIT")
+
+    def clear(self):
+        with self.lock:
+            self.connect().execute("DELETE FROM bucket")
+
+
+buckets = BucketStore()
+
+
+def take_token(key, rate, burst, now):
+    """`buckets.take()`, letting the request through if the store fails."""
+    try:
+        return buckets.take(key, rate, burst, now)
+    except sqlite3.Error:
+        logger.exception("Couldn't take a rate limit token for %s", key)
+
+        return 0
@@ -0,0 +1,32 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# The replica this request reads from, picked once per request by
+# ReplicaRoutingMiddleware; everything else (management commands,
+# workers, shell) reads from the primary.
+read_replica = ContextVar("read_replica", default=None)
+
+
+def choose_replica():
+    replicas = getattr(settings, "DATABASE_REPLICAS", ())
+
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    """Send reads to `DATABASE_REPLICAS` when the current request allows it."""
+
+    def db_for_read(self, model, **hints):
+        return read_replica.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,293 @@
+"""Fleet sharding by manufacturer.
+
+With `DATABASE_SHARDS` configured, every manufacturer is placed on one
+shard (`ManufacturerShard` directory in the default database) and its
+cars, with their `drivers` through rows, live only on that shard.
+Manufacturers and drivers stay in the default database, which remains
+the source of truth for them, and are mirrored to the shards so foreign
+keys and joins work there. Car primary keys come from `IdSequence`, so
+they are unique across shards.
+"""
+import heapq
+import threading
+import time
+import zlib
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import models
+
+from .db import immediate_atomic
+
+SHARD_MAP_TTL = 30
+ID_BLOCK_SIZE = 100
+
+
+def get_shards():
+    return getattr(settings, "DATABASE_SHARDS", [])
+
+
+def sharding_enabled():
+    return bool(get_shards())
+
+
+def default_shard(manufacturer_id):
+    shards = get_shards()
+
+    return shards[zlib.crc32(str(manufacturer_id).encode()) % len(shards)]
+
+
+class ShardMap:
+    """Cached manufacturer -> shard directory, reloaded every `SHARD_MAP_TTL` seconds."""
+
+    def __init__(self):
+        self.assignments = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        from .models import ManufacturerShard
+
+        assignments = dict(
+            ManufacturerShard.objects.using("default").values_list("manufacturer_id", "shard")
+        )
+
+        with self.lock:
+            self.assignments = assignments
+            self.loaded_at = time.monotonic()
+
+    def shard_for(self, manufacturer_id):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > SHARD_MAP_TTL:
+            self.load()
+
+        shard = self.assignments.get(manufacturer_id)
+
+        if shard is None:
+            # Possibly assigned by another worker since the last load.
+            self.load()
+            shard = self.assignments.get(manufacturer_id)
+
+        return shard or default_shard(manufacturer_id)
+
+    def assign(self, manufacturer_id, shard):
+        from .models import ManufacturerShard
+
+        ManufacturerShard.objects.using("default").update_or_create(
+            manufacturer_id=manufacturer_id, defaults={"shard": shard}
+        )
+
+        with self.lock:
+            self.assignments[manufacturer_id] = shard
+
+    def clear(self):
+        with self.lock:
+            self.assignments = {}
+            self.loaded_at = None
+
+
+shard_map = ShardMap()
+
+
+class IdAllocator:
+    """Hands out ids from blocks reserved in the default database."""
+
+    def __init__(self):
+        self.blocks = {}
+        self.lock = threading.Lock()
+
+    def allocate(self, name):
+        from .models import IdSequence
+
+        with self.lock:
+            block = self.blocks.get(name)
+
+            if block is None or block[0] >= block[1]:
+                with immediate_atomic(using="default"):
+                    sequence, _ = (
+                        IdSequence.objects.using("default")
+                        .select_for_update()
+                        .get_or_create(name=name)
+                    )
+                    block = [sequence.next_value, sequence.next_value + ID_BLOCK_SIZE]
+                    sequence.next_value = block[1]
+                    sequence.save(using="default")
+
+                self.blocks[name] = block
+
+            block[0] += 1
+
+            return block[0] - 1
+
+
+id_allocator = IdAllocator()
+
+
+def mirror(model, instances, fields, shards=None):
+    """Upsert default-database rows of `model` onto the shards."""
+    # Copies, so saving them doesn't rebind the originals to a shard.
+    instances = [
+        model(**{field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields})
+        for instance in instances
+    ]
+    pks = [instance.pk for instance in instances]
+
+    for shard in shards or get_shards():
+        existing = set(
+            model.objects.using(shard).filter(pk__in=pks).values_list("pk", flat=True)
+        )
+        model.objects.using(shard).bulk_create(
+            [instance for instance in instances if instance.pk not in existing]
+        )
+        model.objects.using(shard).bulk_update(
+            [instance for instance in instances if instance.pk in existing], fields
+        )
+
+
+class ShardedQuerySet(models.QuerySet):
+    """`create()` routes each new row by its instance, like `save()` does.
+
+    `QuerySet.create()` otherwise picks the database from the model alone,
+    before the router can see which manufacturer the row belongs to.
+    """
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+
+        return obj
+
+
+class ScatterGather:
+    """Read-only, sliceable view of a queryset across all shards.
+
+    Every shard is queried in the same `ordering` and the results are
+    merged with `heapq.merge`, so a slice `[start:stop]` reads at most
+    `stop` rows per shard. It supports what `Paginator` needs.
+    """
+
+    def __init__(self, queryset, ordering):
+        self.model = queryset.model
+        self.querysets = [
+            queryset.using(shard).order_by(*ordering) for shard in get_shards()
+        ]
+        self.key = attrgetter(*ordering)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return heapq.merge(*self.querysets, key=self.key)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.stop is None:
+                return list(islice(iter(self), index.start, None))
+
+            return list(
+                islice(
+                    heapq.merge(*(queryset[:index.stop] for queryset in self.querysets), key=self.key),
+                    index.start,
+                    index.stop,
+                )
+            )
+
+        return self[index:index + 1][0]
+
+
+def gather(queryset, ordering):
+    """`queryset` itself, or its scatter-gather across shards when sharded."""
+    if not sharding_enabled():
+        return queryset
+
+    return ScatterGather(queryset, ordering)
+
+
+def scatter(queryset):
+    """One copy of `queryset` per shard, or just `queryset` when not sharded."""
+    if not sharding_enabled():
+        return [queryset]
+
+    return [queryset.using(shard) for shard in get_shards()]
+
+
+class ShardRouter:
+    """Route cars, and anything reached through them, to their shard.
+
+    Reads that start from an object loaded from a shard (`car.drivers`,
+    `car.manufacturer`) stay on that shard. Cars are written to their
+    manufacturer's shard; manufacturers and drivers are written to the
+    default database and mirrored by signal receivers.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+
+        if instance is not None and instance._state.db in get_shards():
+            return instance._state.db
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        from .models import Car, Manufacturer
+
+        instance = hints.get("instance")
+
+        if model is Car and isinstance(instance, Car):
+            return shard_map.shard_for(instance.manufacturer_id)
+
+        if model is Car and isinstance(instance, Manufacturer):
+            # Assigning `car.manufacturer` binds the car to that shard.
+            return shard_map.shard_for(instance.pk)
+
+        if (
+            instance is not None
+            and isinstance(instance, Car)
+            and instance._state.db in get_shards()
+        ):
+            return instance._state.db
+
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Manufacturers and drivers exist on the default database and on
+        # every shard, so relations between them and cars are valid.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_shards():
+            return True
+
+        return None
+
+
+def manufacturer_stats(manufacturer_ids=None):
+    """`{manufacturer_id: (num_cars, num_drivers)}` from grouped aggregates on every shard."""
+    from django.db.models import Count
+
+    from .models import Car
+
+    queryset = Car.objects.all()
+
+    if manufacturer_ids is not None:
+        queryset = queryset.filter(manufacturer_id__in=manufacturer_ids)
+
+    stats = {}
+
+    for shard_queryset in scatter(queryset):
+        rows = (
+            shard_queryset
+            .order_by()
+            .values("manufacturer_id")
+            .annotate(num_cars=Count("pk", distinct=True), num_drivers=Count("drivers", distinct=True))
+        )
+        # A manufacturer's cars are all on one shard, so no merging is needed.
+        stats.update(
+            (row["manufacturer_id"], (row["num_cars"], row["num_drivers"])) for row in rows
+        )
+
+    return stats
@@ -0,0 +1,352 @@
+"""Driver shifts: which driver has which car, and when.
+
+A `Shift` books a driver onto a car for `[starts_at, ends_at)`; neither
+may be booked twice at once. Every process keeps the shifts ending
+after `SHIFT_INDEX_HISTORY` ago in `shift_schedule`: for each car and
+each driver, a `Timeline` of its shifts sorted by start. One car's (or
+driver's) shifts never overlap, so their ends are sorted too, and a
+single bisect finds the only shift that can contain a moment or be the
+first to clash with a window, in O(log n).
+
+The index is rebuilt when the shared shifts version changes (any shift
+saved or deleted), checked at most every `SHIFT_INDEX_REFRESH_INTERVAL`
+seconds, and swapped in with a single assignment, so readers never
+lock. Bookings are checked against the database inside their write
+transaction: small ones with range scans on the `(car, starts_at)` and
+`(driver, starts_at)` indexes, which `SHIFT_MAX_LENGTH` bounds, large
+ones against a freshly rebuilt index.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import get_shifts_version, invalidate_shifts_cache
+from .db import immediate_atomic
+from .models import Shift
+
+SHIFT_MAX_LENGTH = timedelta(hours=12)
+SHIFT_INDEX_HISTORY = timedelta(days=7)
+SHIFT_INDEX_REFRESH_INTERVAL = 2.0
+# Bookings up to this size are checked shift by shift in the database.
+SHIFT_DB_CHECK_LIMIT = 20
+SHIFT_MAX_CONFLICTS = 10
+ROSTER_SHIFT_LENGTH = timedelta(hours=8)
+# Rest a driver gets between two rostered shifts.
+ROSTER_MIN_REST = timedelta(hours=8)
+
+
+class Timeline:
+    """Non-overlapping `[start, end)` intervals in order, with a value each."""
+
+    __slots__ = ("starts", "ends", "values")
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.values = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find(self, start, end):
+        """Value of an interval overlapping `[start, end)`, or None."""
+        # Every interval before the first one ending after `start` is
+        # over by then, and every one after it starts later.
+        index = bisect_right(self.ends, start)
+
+        if index < len(self.starts) and self.starts[index] < end:
+            return self.values[index]
+
+        return None
+
+    def at(self, moment):
+        index = bisect_right(self.ends, moment)
+
+        if index < len(self.starts) and self.starts[index] <= moment:
+            return self.values[index]
+
+        return None
+
+    def add(self, start, end, value):
+        """Insert an interval, which the caller has checked is free."""
+        index = bisect_left(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.values.insert(index, value)
+
+
+class ShiftIndex:
+    """`Timeline`s per car and per driver, in Unix times.
+
+    Holds every shift ending after `horizon`, so it can answer for any
+    window starting at or after it.
+    """
+
+    def __init__(self, horizon=-math.inf):
+        self.horizon = horizon
+        # car -> (shift, driver) and driver -> (shift, car)
+        self.cars = defaultdict(Timeline)
+        self.drivers = defaultdict(Timeline)
+
+    def covers(self, start):
+        return start >= self.horizon
+
+    def add(self, shift_id, driver_id, car_id, start, end):
+        self.cars[car_id].add(start, end, (shift_id, driver_id))
+        self.drivers[driver_id].add(start, end, (shift_id, car_id))
+
+    def busy(self, timelines, key, start, end):
+        timeline = timelines.get(key)
+
+        return timeline is not None and timeline.find(start, end) is not None
+
+    def clash(self, driver_id, car_id, start, end):
+        """`"car"` or `"driver"`, whichever is already booked in `[start, end)`."""
+        if self.busy(self.cars, car_id, start, end):
+            return "car"
+
+        if self.busy(self.drivers, driver_id, start, end):
+            return "driver"
+
+        return None
+
+
+def load_index(horizon):
+    index = ShiftIndex(horizon.timestamp())
+    shifts = (
+        Shift.objects
+        .filter(ends_at__gt=horizon)
+        .order_by("starts_at")
+        .values_list("pk", "driver_id", "car_id", "starts_at", "ends_at")
+    )
+
+    for shift_id, driver_id, car_id, starts_at, ends_at in shifts.iterator():
+        index.add(shift_id, driver_id, car_id, starts_at.timestamp(), ends_at.timestamp())
+
+    return index
+
+
+def validate_times(starts_at, ends_at):
+    if ends_at <= starts_at:
+        raise ValidationError("A shift must end after it starts.")
+
+    if ends_at - starts_at > SHIFT_MAX_LENGTH:
+        raise ValidationError(f"A shift can't be longer than {SHIFT_MAX_LENGTH}.")
+
+
+def database_clash(driver_id, car_id, starts_at, ends_at, exclude=None):
+    """Like `ShiftIndex.clash()`, from the shifts table."""
+    overlapping = (
+        Shift.objects
+        # Anything starting earlier is over by `starts_at`.
+        .filter(starts_at__gt=starts_at - SHIFT_MAX_LENGTH, starts_at__lt=ends_at, ends_at__gt=starts_at)
+        .exclude(pk=exclude)
+    )
+
+    if overlapping.filter(car_id=car_id).exists():
+        return "car"
+
+    if overlapping.filter(driver_id=driver_id).exists():
+        return "driver"
+
+    return None
+
+
+def check_shift(driver_id, car_id, starts_at, ends_at, exclude=None):
+    """Raise `ValidationError` unless the shift fits the schedule."""
+    if starts_at is None or ends_at is None:
+        return
+
+    validate_times(starts_at, ends_at)
+
+    if driver_id is not None and car_id is not None:
+        clash = database_clash(driver_id, car_id, starts_at, ends_at, exclude)
+
+        if clash is not None:
+            raise ValidationError(f"The {clash} already has a shift at that time.")
+
+
+class ShiftSchedule:
+    def __init__(self):
+        self.index = ShiftIndex(math.inf)
+        self.version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def current(self, force=False):
+        """The latest `ShiftIndex`; `force` rebuilds it from the database."""
+        if (
+            not force
+            and self.checked_at is not None
+            and time.monotonic() - self.checked_at < SHIFT_INDEX_REFRESH_INTERVAL
+        ):
+            return self.index
+
+        with self.lock:
+            version = get_shifts_version()
+
+            if force or version != self.version:
+                self.index = load_index(timezone.now() - SHIFT_INDEX_HISTORY)
+                self.version = version
+
+            self.checked_at = time.monotonic()
+
+            return self.index
+
+    def invalidate(self):
+        invalidate_shifts_cache()
+        self.checked_at = None
+
+    def clear(self):
+        with self.lock:
+            self.index = ShiftIndex(math.inf)
+            self.version = None
+            self.checked_at = None
+
+    def driver_at(self, car_id, moment=None):
+        """`(shift_id, driver_id)` of who has the car at `moment`, or None."""
+        moment = moment or timezone.now()
+        index = self.current()
+
+        if index.covers(moment.timestamp()):
+            timeline = index.cars.get(car_id)
+
+            return None if timeline is None else timeline.at(moment.timestamp())
+
+        return (
+            Shift.objects
+            .filter(
+                car_id=car_id,
+                starts_at__gt=moment - SHIFT_MAX_LENGTH,
+                starts_at__lte=moment,
+                ends_at__gt=moment,
+            )
+            .values_list("pk", "driver_id")
+            .first()
+        )
+
+    def free_cars(self, car_ids, starts_at, ends_at):
+        """Those of `car_ids` without a shift in `[starts_at, ends_at)`."""
+        start, end = starts_at.timestamp(), ends_at.timestamp()
+        index = self.current()
+
+        if index.covers(start):
+            return [car_id for car_id in car_ids if not index.busy(index.cars, car_id, start, end)]
+
+        busy = set(
+            Shift.objects
+            .filter(car_id__in=car_ids, starts_at__lt=ends_at, ends_at__gt=starts_at)
+            .values_list("car_id", flat=True)
+        )
+
+        return [car_id for car_id in car_ids if car_id not in busy]
+
+    def cars_at(self, moment=None):
+        """`{driver_id: car_id}` of the drivers on shift at `moment`."""
+        moment = (moment or timezone.now()).timestamp()
+        cars = {}
+
+        for driver_id, timeline in self.current().drivers.items():
+            found = timeline.at(moment)
+
+            if found is not None:
+                cars[driver_id] = found[1]
+
+        return cars
+
+
+shift_schedule = ShiftSchedule()
+
+
+def book_shifts(shifts):
+    """Save new `Shift`s, all or none; raises `ValidationError` on clashes."""
+    shifts = list(shifts)
+
+    for shift in shifts:
+        validate_times(shift.starts_at, shift.ends_at)
+
+    booked = ShiftIndex()
+    conflicts = []
+
+    with immediate_atomic():
+        # Holding the write lock: no other booking can commit until we do.
+        index = shift_schedule.current(force=True) if len(shifts) > SHIFT_DB_CHECK_LIMIT else None
+
+        for number, shift in enumerate(shifts):
+            start, end = shift.starts_at.timestamp(), shift.ends_at.timestamp()
+            clash = booked.clash(shift.driver_id, shift.car_id, start, end)
+
+            if clash is None:
+                if index is not None and index.covers(start):
+                    clash = index.clash(shift.driver_id, shift.car_id, start, end)
+                else:
+                    clash = database_clash(shift.driver_id, shift.car_id, shift.starts_at, shift.ends_at)
+
+            if clash is None:
+                booked.add(number, shift.driver_id, shift.car_id, start, end)
+            else:
+                conflicts.append(f"Shift {number}: the {clash} already has a shift at that time.")
+
+        if conflicts:
+            raise ValidationError(conflicts[:SHIFT_MAX_CONFLICTS])
+
+        Shift.objects.bulk_create(shifts, batch_size=500)
+        transaction.on_commit(shift_schedule.invalidate)
+
+    return shifts
+
+
+def weekly_roster(starts_at, driver_ids, car_ids, days=7, shift_length=ROSTER_SHIFT_LENGTH):
+    """Unsaved `Shift`s keeping `car_ids` driven around the clock.
+
+    The `days` from `starts_at` are cut into `shift_length` slots. In
+    each slot every car that is still free gets the next driver, in
+    rotation, who is free too and has had `ROSTER_MIN_REST` since their
+    last shift. Cars left without a driver stay unbooked.
+    """
+    index = shift_schedule.current()
+    start = starts_at.timestamp()
+
+    if not index.covers(start):
+        raise ValueError("Can't roster shifts that far back.")
+
+    length = shift_length.total_seconds()
+    rest = ROSTER_MIN_REST.total_seconds()
+    rostered = ShiftIndex()
+    rotation = deque(driver_ids)
+    shifts = []
+
+    for slot in range(int(timedelta(days=days) / shift_length)):
+        slot_start = start + slot * length
+        slot_end = slot_start + length
+
+        for car_id in car_ids:
+            if index.busy(index.cars, car_id, slot_start, slot_end) or rostered.busy(
+                rostered.cars, car_id, slot_start, slot_end
+            ):
+                continue
+
+            for _ in range(len(rotation)):
+                driver_id = rotation[0]
+                rotation.rotate(-1)
+
+                if not index.busy(
+                    index.drivers, driver_id, slot_start - rest, slot_end + rest
+                ) and not rostered.busy(rostered.drivers, driver_id, slot_start - rest, slot_end + rest):
+                    rostered.add(len(shifts), driver_id, car_id, slot_start, slot_end)
+                    shifts.append(Shift(
+                        driver_id=driver_id,
+                        car_id=car_id,
+                        starts_at=starts_at + slot * shift_length,
+                        ends_at=starts_at + (slot + 1) * shift_length,
+                    ))
+                    break
+
+    return shifts
@@ -0,0 +1,159 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import audit
+from .cache import invalidate_fleet_cache
+from .db import configure_sqlite
+from .events import publish_on_commit
+from .models import Car, Driver, Manufacturer, ManufacturerShard, Shift
+from .sharding import get_shards, id_allocator, mirror, shard_map, sharding_enabled
+from .shifts import shift_schedule
+
+DRIVER_MIRROR_FIELDS = [
+    field.name for field in Driver._meta.concrete_fields if not field.primary_key
+]
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=Driver)
+def invalidate_fleet(sender, **kwargs):
+    invalidate_fleet_cache()
+
+
+@receiver(m2m_changed, sender=Car.drivers.through)
+def invalidate_fleet_on_drivers_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_fleet_cache()
+
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+def invalidate_shifts(sender, **kwargs):
+    transaction.on_commit(shift_schedule.invalidate)
+
+
+@receiver(m2m_changed, sender=Car.drivers.through)
+def car_drivers_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action == "pre_clear":
+        # `post_clear` has no pk_set: remember who is being removed.
+        related = instance.cars if reverse else instance.drivers
+        instance._cleared_pks = set(related.values_list("pk", flat=True))
+        return
+
+    if action == "post_clear":
+        action, pk_set = "post_remove", vars(instance).pop("_cleared_pks", set())
+
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    if reverse:
+        changes = [(car_id, [instance.pk]) for car_id in sorted(pk_set)]
+    else:
+        changes = [(instance.pk, sorted(pk_set))]
+
+    for car_id, driver_ids in changes:
+        change = "added" if action == "post_add" else "removed"
+        audit.record_car_drivers(car_id, driver_ids, change, using)
+        publish_on_commit(
+            "car.drivers",
+            {"car": car_id, "drivers": driver_ids, "action": change},
+            cars=[car_id],
+            drivers=driver_ids,
+            using=using,
+        )
+
+
+@receiver(post_init, sender=Car)
+@receiver(post_init, sender=Driver)
+@receiver(post_init, sender=Manufacturer)
+def remember_audited_fields(sender, instance, **kwargs):
+    instance._audit_snapshot = audit.snapshot(instance)
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_save, sender=Driver)
+@receiver(post_save, sender=Manufacturer)
+def audit_save(sender, instance, created, using, update_fields=None, **kwargs):
+    audit.record_save(instance, created, using, update_fields)
+
+
+@receiver(post_delete, sender=Car)
+@receiver(post_delete, sender=Driver)
+@receiver(post_delete, sender=Manufacturer)
+def audit_delete(sender, instance, using, **kwargs):
+    audit.record_delete(instance, using)
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    configure_sqlite(connection)
+
+
+@receiver(post_save, sender=Manufacturer)
+def mirror_manufacturer_to_shard(sender, instance, created, using, **kwargs):
+    if not sharding_enabled() or using != "default":
+        return
+
+    shard = shard_map.shard_for(instance.pk)
+
+    if created:
+        shard_map.assign(instance.pk, shard)
+
+    mirror(Manufacturer, [instance], ["name", "country"], shards=[shard])
+
+
+@receiver(post_delete, sender=Manufacturer)
+def delete_manufacturer_from_shard(sender, instance, using, **kwargs):
+    if not sharding_enabled() or using != "default":
+        return
+
+    # Cascades to the manufacturer's cars, which only exist on the shard.
+    Manufacturer.objects.using(shard_map.shard_for(instance.pk)).filter(pk=instance.pk).delete()
+    ManufacturerShard.objects.using("default").filter(manufacturer_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Driver)
+def mirror_driver_to_shards(sender, instance, using, **kwargs):
+    if sharding_enabled() and using == "default":
+        mirror(Driver, [instance], DRIVER_MIRROR_FIELDS)
+
+
+@receiver(post_delete, sender=Driver)
+def delete_driver_from_shards(sender, instance, using, **kwargs):
+    if sharding_enabled() and using == "default":
+        for shard in get_shards():
+            Driver.objects.using(shard).filter(pk=instance.pk).delete()
+
+
+@receiver(pre_save, sender=Car)
+def place_car_on_shard(sender, instance, **kwargs):
+    if not sharding_enabled():
+        return
+
+    if instance.pk is None:
+        instance.pk = id_allocator.allocate("car")
+        return
+
+    current = instance._state.db
+
+    if current in get_shards() and current != shard_map.shard_for(instance.manufacturer_id):
+        # Its manufacturer moved to another shard: take the car along.
+        instance._moved_driver_ids = list(
+            Car.drivers.through.objects.using(current)
+            .filter(car_id=instance.pk)
+            .values_list("driver_id", flat=True)
+        )
+        Car.objects.using(current).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=Car)
+def restore_moved_car_drivers(sender, instance, **kwargs):
+    driver_ids = vars(instance).pop("_moved_driver_ids", None)
+
+    if driver_ids:
+        instance.drivers.add(*driver_ids)
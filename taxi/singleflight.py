@@ -0,0 +1,120 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .cache import shared_cache
+
+
+class SingleFlight:
+    """Coalesce concurrent recomputations of the same cached value.
+
+    Values are cached as `(expires_at, version, value)`. When an entry is
+    missing, expired or from an older version, only the caller holding
+    the key's lock recomputes it; everybody else gets the stale value if
+    there is one, or waits for the lock and re-reads the cache. The lock
+    is a thread lock plus an `flock` on a file in `SINGLE_FLIGHT_LOCK_DIR`,
+    so it also coalesces across gunicorn workers on the same host, which
+    share values through `SHARED_CACHE`. Keys are striped over a
+    fixed number of locks to keep both bounded.
+    """
+
+    stripes = 256
+    wait_timeout = 2.0
+    poll_interval = 0.01
+    stale_timeout = 60 * 10
+
+    def __init__(self):
+        self.metrics = Counter()
+        self.thread_locks = [threading.Lock() for _ in range(self.stripes)]
+
+    @property
+    def cache(self):
+        return shared_cache()
+
+    @property
+    def lock_dir(self):
+        return getattr(
+            settings,
+            "SINGLE_FLIGHT_LOCK_DIR",
+            os.path.join(tempfile.gettempdir(), "taxi_service_singleflight"),
+        )
+
+    def get(self, key, compute, timeout, version=None):
+        entry = self.cache.get(key)
+
+        if self.is_fresh(entry, version):
+            self.metrics["hits"] += 1
+            return entry[2]
+
+        lock = self.acquire(key, blocking=False)
+
+        if lock is None and entry is not None:
+            self.metrics["stale"] += 1
+            return entry[2]
+
+        if lock is None:
+            lock = self.acquire(key, blocking=True)
+
+        try:
+            if lock is not None:
+                entry = self.cache.get(key)
+
+                if self.is_fresh(entry, version):
+                    self.metrics["coalesced"] += 1
+                    return entry[2]
+            else:
+                self.metrics["lock_timeouts"] += 1
+
+            value = compute()
+            self.cache.set(
+                key, (time.time() + timeout, version, value), timeout + self.stale_timeout
+            )
+            self.metrics["computed"] += 1
+
+            return value
+        finally:
+            if lock is not None:
+                self.release(lock)
+
+    @staticmethod
+    def is_fresh(entry, version):
+        return entry is not None and entry[0] > time.time() and entry[1] == version
+
+    def acquire(self, key, blocking):
+        stripe = int(hashlib.md5(key.encode()).hexdigest()[:8], 16) % self.stripes
+        thread_lock = self.thread_locks[stripe]
+        deadline = time.monotonic() + self.wait_timeout
+
+        if not thread_lock.acquire(blocking, self.wait_timeout if blocking else -1):
+            return None
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        fd = os.open(os.path.join(self.lock_dir, f"{stripe}.lock"), os.O_CREAT | os.O_RDWR)
+
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return thread_lock, fd
+            except BlockingIOError:
+                if not blocking or time.monotonic() >= deadline:
+                    os.close(fd)
+                    thread_lock.release()
+                    return None
+
+                time.sleep(self.poll_interval)
+
+    @staticmethod
+    def release(lock):
+        thread_lock, fd = lock
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        thread_lock.release()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,139 @@
+"""Slow-query log.
+
+With `SLOW_QUERY_MS` set, `SlowQueryLogMiddleware` wraps every database
+connection for the duration of a request (`connection.execute_wrapper`)
+and logs each query that took at least that long to `SLOW_QUERY_LOG_DIR`:
+the URL name and path it came from, its fingerprint, its parameters
+with strings redacted, and, the first time a process sees the
+fingerprint, its `EXPLAIN` plan.
+
+A fingerprint is the SQL with literals replaced by `?` and `IN` lists
+collapsed, so the same ORM query with different values, or a different
+number of ids, adds up in `manage.py slow_queries`.
+"""
+import datetime
+import decimal
+import hashlib
+import re
+import threading
+import time
+
+from django.db import DatabaseError, transaction
+
+from .cache import LRUCache
+
+SLOW_QUERY_EXPLAINED_FINGERPRINTS = 1000
+SLOW_QUERY_MAX_PARAMS = 50
+EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE), "IN (...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_sql(sql):
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+
+    return sql.strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def redact(value):
+    """Numbers, dates, booleans and NULLs as they are; anything else by type and size."""
+    if value is None or isinstance(value, (bool, int, float, decimal.Decimal, datetime.date, datetime.time)):
+        return value
+
+    if isinstance(value, (str, bytes, memoryview)):
+        return f"<{type(value).__name__} of {len(value)}>"
+
+    return f"<{type(value).__name__}>"
+
+
+explained = LRUCache(SLOW_QUERY_EXPLAINED_FINGERPRINTS)
+local = threading.local()
+
+
+def explain(connection, sql, params):
+    """The query plan, one line per row, or None if it can't be had."""
+    if not EXPLAINABLE.match(sql):
+        return None
+
+    local.explaining = True
+
+    try:
+        # In a savepoint, so a failing EXPLAIN can't break the request's
+        # transaction on PostgreSQL.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        local.explaining = False
+
+
+class SlowQueryLogger:
+    """An execute wrapper logging queries that took at least `threshold_ms`."""
+
+    def __init__(self, log, threshold_ms, request=None):
+        self.log = log
+        self.threshold_ms = threshold_ms
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(local, "explaining", False):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        failed = True
+
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+
+            return result
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+
+            if elapsed >= self.threshold_ms:
+                self.record(sql, params, many, context["connection"], elapsed, failed)
+
+    def record(self, sql, params, many, connection, elapsed, failed=False):
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        match = getattr(self.request, "resolver_match", None)
+        entry = {
+            "t": round(time.time(), 3),
+            "fingerprint": key,
+            "sql": normalized,
+            "ms": round(elapsed, 3),
+            "database": connection.alias,
+            "route": match.view_name if match else None,
+            "path": getattr(self.request, "path", None),
+            "method": getattr(self.request, "method", None),
+        }
+
+        if many:
+            entry["batches"] = len(params) if hasattr(params, "__len__") else None
+        elif isinstance(params, dict):
+            entry["params"] = {name: redact(value) for name, value in params.items()}
+        else:
+            entry["params"] = [redact(value) for value in list(params or ())[:SLOW_QUERY_MAX_PARAMS]]
+
+        if failed:
+            # The transaction may be unusable until rolled back.
+            entry["failed"] = True
+        elif not many and explained.get(key) is None:
+            explained.set(key, True)
+            entry["plan"] = explain(connection, sql, params)
+
+        self.log.write(entry)
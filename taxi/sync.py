@@ -0,0 +1,197 @@
+import hashlib
+import secrets
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError
+
+from .audit import record_bulk_create, record_bulk_update
+from .db import immediate_atomic
+from .forms import LICENSE_NUMBER_VALIDATOR
+from .models import Driver
+
+SYNC_BATCH_SIZE = 1000
+SYNC_FIELDS = ("username", "first_name", "last_name", "email")
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+INVALID = "invalid"
+
+SYNC_MAX_LENGTHS = {
+    field_name: Driver._meta.get_field(field_name).max_length
+    for field_name in SYNC_FIELDS
+}
+
+
+def content_hash(values):
+    return hashlib.sha1("\x1f".join(values).encode()).hexdigest()
+
+
+def clean_record(record):
+    """Return `(license_number, values, errors)` for one feed record."""
+    errors = {}
+    license_number = str(record.get("license_number") or "").strip()
+
+    try:
+        LICENSE_NUMBER_VALIDATOR(license_number)
+        if len(license_number) != 8:
+            raise ValidationError("Enter correct value like AAA00000")
+    except ValidationError as error:
+        errors["license_number"] = error.messages
+
+    values = {}
+
+    for field_name in SYNC_FIELDS:
+        value = str(record.get(field_name) or "").strip()
+        max_length = SYNC_MAX_LENGTHS[field_name]
+
+        if len(value) > max_length:
+            errors[field_name] = [f"Ensure this value has at most {max_length} characters."]
+
+        values[field_name] = value
+
+    if not values["username"]:
+        errors["username"] = ["This field is required."]
+
+    if values["email"]:
+        try:
+            validate_email(values["email"])
+        except ValidationError as error:
+            errors["email"] = error.messages
+
+    return license_number, values, errors
+
+
+def _sync_batch(records):
+    results = {}
+    cleaned = {}
+    usernames = {}
+
+    for index, record in records:
+        license_number, values, errors = clean_record(record)
+
+        if not errors and license_number in cleaned:
+            errors["license_number"] = ["Duplicate license number in feed."]
+
+        if not errors and values["username"] in usernames:
+            errors["username"] = ["Duplicate username in feed."]
+
+        if errors:
+            results[index] = {
+                "license_number": license_number,
+                "status": INVALID,
+                "errors": errors,
+            }
+            continue
+
+        cleaned[license_number] = (index, values)
+        usernames[values["username"]] = license_number
+
+    existing = {
+        license_number: (pk, content_hash(values), dict(zip(SYNC_FIELDS, values)))
+        for pk, license_number, *values in Driver.objects.filter(
+            license_number__in=list(cleaned)
+        ).values_list("pk", "license_number", *SYNC_FIELDS)
+    }
+    # Including the drivers of this batch: a username moved or swapped
+    # between drivers is only free once the sync releasing it is done.
+    taken_usernames = dict(
+        Driver.objects
+        .filter(username__in=list(usernames))
+        .values_list("username", "license_number")
+    )
+
+    to_create = []
+    to_update = []
+    # The stored values of `to_update`, for the audit trail.
+    before = {}
+
+    for license_number, (index, values) in cleaned.items():
+        if taken_usernames.get(values["username"], license_number) != license_number:
+            results[index] = {
+                "license_number": license_number,
+                "status": INVALID,
+                "errors": {"username": ["A driver with that username already exists."]},
+            }
+            continue
+
+        if license_number not in existing:
+            to_create.append(
+                Driver(
+                    license_number=license_number,
+                    # Synced drivers log in through a password reset. This is
+                    # what make_password(None) stores, without its slow
+                    # per-character random string.
+                    password=UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(30),
+                    **values,
+                )
+            )
+            status = CREATED
+        else:
+            pk, stored_hash, stored = existing[license_number]
+
+            if stored_hash == content_hash(values[field] for field in SYNC_FIELDS):
+                status = UNCHANGED
+            else:
+                to_update.append(Driver(pk=pk, license_number=license_number, **values))
+                before[pk] = stored
+                status = UPDATED
+
+        results[index] = {"license_number": license_number, "status": status}
+
+    try:
+        with immediate_atomic():
+            Driver.objects.bulk_create(to_create, batch_size=SYNC_BATCH_SIZE)
+            Driver.objects.bulk_update(to_update, SYNC_FIELDS, batch_size=SYNC_BATCH_SIZE)
+
+            # Backends that can't return ids from a bulk insert leave them unset.
+            if any(driver.pk is None for driver in to_create):
+                pks = dict(
+                    Driver.objects
+                    .filter(license_number__in=[driver.license_number for driver in to_create])
+                    .values_list("license_number", "pk")
+                )
+
+                for driver in to_create:
+                    driver.pk = pks[driver.license_number]
+
+            # Bulk writes send no signals for taxi.audit to record.
+            record_bulk_create(to_create)
+            record_bulk_update(to_update, before, SYNC_FIELDS)
+    except IntegrityError:
+        # A driver written concurrently since the lookups above: nothing
+        # in the batch was written, so report its changes for a retry.
+        for index, _ in records:
+            if results[index]["status"] in (CREATED, UPDATED):
+                results[index] = {
+                    "license_number": results[index]["license_number"],
+                    "status": INVALID,
+                    "errors": {NON_FIELD_ERRORS: ["Conflicts with a concurrent change; sync it again."]},
+                }
+
+    return [results[index] for index, _ in records]
+
+
+def sync_drivers(records, batch_size=SYNC_BATCH_SIZE):
+    """Create or update drivers from HR feed records keyed on `license_number`.
+
+    Records are validated and written `batch_size` at a time with
+    `bulk_create`/`bulk_update`; rows whose content hash matches the
+    stored driver are skipped. Returns one result dict per record.
+    """
+    results = []
+    batch = []
+
+    for index, record in enumerate(records):
+        batch.append((index, record))
+
+        if len(batch) >= batch_size:
+            results += _sync_batch(batch)
+            batch = []
+
+    if batch:
+        results += _sync_batch(batch)
+
+    return results
@@ -0,0 +1,245 @@
+"""Compact storage of ride GPS tracks.
+
+Points are `(time_ms, latitude, longitude)`, with coordinates rounded to
+microdegrees (about 0.1 m). A track is a sequence of `TrackSegment`
+rows of at most `SEGMENT_POINTS` points each. A segment's `data` holds
+the differences from the previous point, zigzag- and varint-encoded, so
+a point sampled every second takes a few bytes instead of a row. New
+points are appended by encoding them against the segment's `end_*`
+columns and concatenating, without decoding what is already stored.
+
+Reads decode one segment at a time, and only the segments overlapping
+the requested time range, with NumPy.
+"""
+import math
+
+import numpy as np
+
+from .db import immediate_atomic
+from .locations import KM_PER_DEGREE
+from .models import TrackSegment
+
+SEGMENT_POINTS = 512
+MICRODEGREES = 1_000_000
+
+
+def zigzag(values):
+    values = values.astype(np.int64)
+
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def unzigzag(values):
+    values = values.astype(np.uint64)
+
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def encode_varints(values):
+    """LEB128 bytes of an array of unsigned integers."""
+    values = np.asarray(values, dtype=np.uint64)
+
+    if not len(values):
+        return b""
+
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    positions = np.arange(lengths.max())
+    groups = (
+        (values[:, None] >> (positions * 7).astype(np.uint64)) & np.uint64(0x7F)
+    ).astype(np.uint8)
+    groups[positions[None, :] < lengths[:, None] - 1] |= 0x80
+
+    return groups[positions[None, :] < lengths[:, None]].tobytes()
+
+
+def decode_varints(data):
+    groups = np.frombuffer(data, dtype=np.uint8)
+
+    if not len(groups):
+        return np.empty(0, dtype=np.uint64)
+
+    ends = np.flatnonzero(groups < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    positions = np.arange(len(groups)) - np.repeat(starts, ends - starts + 1)
+    # The 7-bit groups don't overlap, so adding them up is OR-ing them.
+    parts = (groups & 0x7F).astype(np.uint64) << (positions * 7).astype(np.uint64)
+
+    return np.add.reduceat(parts, starts)
+
+
+def encode_points(points, previous=(0, 0, 0)):
+    """Delta-encode `(n, 3)` integer points following `previous`."""
+    deltas = np.diff(np.vstack([np.asarray(previous, dtype=np.int64), points]), axis=0)
+
+    return encode_varints(zigzag(deltas.ravel()))
+
+
+def decode_points(data):
+    return np.cumsum(unzigzag(decode_varints(data)).reshape(-1, 3), axis=0)
+
+
+def quantize(points):
+    """`(time_ms, latitude, longitude)` floats to sorted, de-duplicated integers."""
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    quantized = np.column_stack([
+        np.round(points[:, 0]),
+        np.round(points[:, 1] * MICRODEGREES),
+        np.round(points[:, 2] * MICRODEGREES),
+    ]).astype(np.int64)
+    if not len(quantized):
+        return quantized
+
+    quantized = quantized[np.argsort(quantized[:, 0], kind="stable")]
+    # Keep the last point reported for any given millisecond.
+    last = np.append(np.diff(quantized[:, 0]) > 0, True)
+
+    return quantized[last]
+
+
+def append_points(ride_id, points):
+    """Append points to a ride's track; returns how many were stored.
+
+    Points at or before the last stored one are dropped: tracks only
+    grow forwards in time.
+    """
+    points = quantize(points)
+
+    with immediate_atomic():
+        last = (
+            TrackSegment.objects
+            .select_for_update()
+            .filter(ride_id=ride_id)
+            .order_by("-start_time")
+            .first()
+        )
+
+        if last is not None:
+            points = points[points[:, 0] > last.end_time]
+
+        stored = len(points)
+
+        if last is not None and last.point_count < SEGMENT_POINTS and len(points):
+            room = SEGMENT_POINTS - last.point_count
+            head, points = points[:room], points[room:]
+            last.data = bytes(last.data) + encode_points(
+                head, (last.end_time, last.end_latitude, last.end_longitude)
+            )
+            last.end_time, last.end_latitude, last.end_longitude = (int(value) for value in head[-1])
+            last.point_count += len(head)
+            last.save(
+                update_fields=["data", "end_time", "end_latitude", "end_longitude", "point_count"]
+            )
+
+        TrackSegment.objects.bulk_create(
+            TrackSegment(
+                ride_id=ride_id,
+                start_time=int(chunk[0, 0]),
+                end_time=int(chunk[-1, 0]),
+                end_latitude=int(chunk[-1, 1]),
+                end_longitude=int(chunk[-1, 2]),
+                point_count=len(chunk),
+                data=encode_points(chunk),
+            )
+            for chunk in np.split(points, range(SEGMENT_POINTS, len(points), SEGMENT_POINTS))
+            if len(chunk)
+        )
+
+    return stored
+
+
+class Track:
+    """Lazily decoded points of one ride, optionally within `[since, until]` ms."""
+
+    def __init__(self, ride_id, since=None, until=None):
+        self.ride_id = ride_id
+        self.since = since
+        self.until = until
+
+    def segments(self):
+        segments = TrackSegment.objects.filter(ride_id=self.ride_id).order_by("start_time")
+
+        if self.since is not None:
+            segments = segments.filter(end_time__gte=self.since)
+
+        if self.until is not None:
+            segments = segments.filter(start_time__lte=self.until)
+
+        return segments
+
+    def count(self):
+        return sum(self.segments().values_list("point_count", flat=True))
+
+    def __iter__(self):
+        """Decoded `(n, 3)` integer arrays, one per segment."""
+        for data in self.segments().values_list("data", flat=True).iterator():
+            points = decode_points(bytes(data))
+
+            if self.since is not None:
+                points = points[points[:, 0] >= self.since]
+
+            if self.until is not None:
+                points = points[points[:, 0] <= self.until]
+
+            yield points
+
+    def points(self):
+        """`(n, 3)` float array of `(time_ms, latitude, longitude)`."""
+        points = np.concatenate(list(self) or [np.empty((0, 3), dtype=np.int64)])
+
+        return np.column_stack([points[:, 0], points[:, 1:] / MICRODEGREES])
+
+
+def simplify(points, tolerance_m):
+    """Indexes of points kept by Ramer-Douglas-Peucker at `tolerance_m`."""
+    if len(points) < 3:
+        return np.arange(len(points))
+
+    scale = math.cos(math.radians(points[:, 1].mean()))
+    xy = np.column_stack([points[:, 2] * scale, points[:, 1]]) * KM_PER_DEGREE * 1000
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, len(points) - 1)]
+
+    while spans:
+        start, end = spans.pop()
+
+        if end - start < 2:
+            continue
+
+        direction = xy[end] - xy[start]
+        offsets = xy[start + 1:end] - xy[start]
+        length = math.hypot(*direction)
+
+        if length:
+            distances = np.abs(np.cross(direction, offsets)) / length
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        farthest = int(np.argmax(distances))
+
+        if distances[farthest] > tolerance_m:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            spans.extend([(start, middle), (middle, end)])
+
+    return np.flatnonzero(keep)
+
+
+def downsample(points, tolerance_m=None, max_points=None):
+    """Fewer points for display: simplified, then thinned to `max_points`."""
+    indexes = np.arange(len(points))
+
+    if tolerance_m:
+        indexes = simplify(points, tolerance_m)
+
+    if max_points and len(indexes) > max_points:
+        # Evenly spaced, always keeping both ends.
+        indexes = indexes[np.round(np.linspace(0, len(indexes) - 1, max(max_points, 2))).astype(int)]
+
+    return points[indexes]
@@ -0,0 +1,112 @@
+"""Test runner reporting the slowest tests, with optional seeded databases.
+
+`TimedTestRunner` times every test, in the worker processes too when
+run with `--parallel`, and lists the `--slowest` ones after the run.
+`--seed-fixture` loads fixtures into the test databases once, after
+migrating them and before `--parallel` clones them for the workers, so
+every `TestCase` starts from the same seeded data for free (a
+`TransactionTestCase` flushes it).
+"""
+import time
+import unittest
+
+from django.core.management import call_command
+from django.db import connections
+from django.test.runner import DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner
+from django.test.utils import get_unique_databases_and_mirrors
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = {}
+
+    def startTest(self, test):
+        self.started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.durations[test.id()] = time.perf_counter() - self.started
+
+    def addTestDuration(self, test, seconds):
+        # From a `--parallel` worker, replayed after its stopTest.
+        self.durations[test.id()] = seconds
+
+
+class TimedRemoteTestResult(RemoteTestResult):
+    def startTest(self, test):
+        self.started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.events.append(("addTestDuration", self.test_index, time.perf_counter() - self.started))
+
+
+class TimedRemoteTestRunner(RemoteTestRunner):
+    resultclass = TimedRemoteTestResult
+
+
+class TimedParallelTestSuite(ParallelTestSuite):
+    runner_class = TimedRemoteTestRunner
+
+
+class TimedTestRunner(DiscoverRunner):
+    parallel_test_suite = TimedParallelTestSuite
+
+    def __init__(self, slowest=10, seed_fixtures=(), **kwargs):
+        super().__init__(**kwargs)
+        self.slowest = slowest
+        self.seed_fixtures = seed_fixtures
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--slowest", type=int, default=10, help="Number of slowest tests to list; 0 lists none."
+        )
+        parser.add_argument(
+            "--seed-fixture", action="append", dest="seed_fixtures", default=[],
+            help="Fixture loaded into the test databases before they are cloned.",
+        )
+
+    def get_resultclass(self):
+        # --debug-sql and --pdb have their own result classes.
+        return super().get_resultclass() or TimedTextTestResult
+
+    def setup_databases(self, **kwargs):
+        if not self.seed_fixtures:
+            return super().setup_databases(**kwargs)
+
+        parallel, self.parallel = self.parallel, 1
+
+        try:
+            old_config = super().setup_databases(**kwargs)
+        finally:
+            self.parallel = parallel
+
+        test_databases, _ = get_unique_databases_and_mirrors(kwargs.get("aliases"))
+
+        for _, aliases in test_databases.values():
+            call_command("loaddata", *self.seed_fixtures, database=aliases[0], verbosity=self.verbosity)
+
+            if self.parallel > 1:
+                for index in range(self.parallel):
+                    connections[aliases[0]].creation.clone_test_db(
+                        suffix=str(index + 1), verbosity=self.verbosity, keepdb=self.keepdb
+                    )
+
+        return old_config
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        durations = getattr(result, "durations", None)
+
+        if durations and self.slowest:
+            self.log(f"\nSlowest {min(self.slowest, len(durations))} of {len(durations)} tests:")
+
+            for test_id, seconds in sorted(durations.items(), key=lambda item: -item[1])[:self.slowest]:
+                self.log(f"  {seconds:7.3f}s  {test_id}")
+
+        return result
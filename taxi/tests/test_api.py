@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from taxi.cache import invalidate_fleet_cache
+from taxi.models import Car, Manufacturer
+
+API_CAR_LIST_URL = reverse("taxi:api-car-list")
+API_DRIVER_LIST_URL = reverse("taxi:api-driver-list")
+
+
+class PublicApiTest(TestCase):
+    def test_login_required(self):
+        response = self.client.get(API_CAR_LIST_URL)
+
+        self.assertEqual(response.status_code, 401)
+
+
+class PrivateApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+        cls.manufacturer = Manufacturer.objects.create(name="Audi", country="Germany")
+
+        for num in range(5):
+            car = Car.objects.create(model=f"Model {num}", manufacturer=cls.manufacturer)
+            car.drivers.add(cls.user)
+
+    def setUp(self) -> None:
+        invalidate_fleet_cache()
+        self.client.force_login(self.user)
+
+    def test_car_list_fields(self):
+        response = self.client.get(API_CAR_LIST_URL + "?fields=model")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["data"][0],
+            {"id": Car.objects.order_by("pk").first().id, "model": "Model 0"}
+        )
+
+    def test_unknown_fields_rejected(self):
+        response = self.client.get(API_CAR_LIST_URL + "?fields=password")
+
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(API_DRIVER_LIST_URL + "?include=manufacturer")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_includes_use_one_query_per_relation(self):
+        # session + user lookup, the page, then one query per relation
+        with self.assertNumQueries(5):
+            response = self.client.get(API_CAR_LIST_URL + "?include=manufacturer,drivers")
+
+        payload = response.json()
+
+        self.assertEqual(len(payload["data"]), 5)
+        self.assertEqual(payload["data"][0]["drivers"], [self.user.id])
+        self.assertEqual(payload["included"]["manufacturers"][0]["name"], "Audi")
+        self.assertEqual(payload["included"]["drivers"][0]["username"], "test_user")
+
+    def test_cursor_pagination(self):
+        response = self.client.get(API_CAR_LIST_URL + "?limit=2&fields=model")
+        models = [car["model"] for car in response.json()["data"]]
+        next_url = response.json()["next"]
+
+        while next_url:
+            response = self.client.get(next_url)
+            models += [car["model"] for car in response.json()["data"]]
+            next_url = response.json()["next"]
+
+        self.assertEqual(models, [f"Model {num}" for num in range(5)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(API_CAR_LIST_URL + "?cursor=%%%")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_driver_detail_with_cars(self):
+        response = self.client.get(
+            reverse("taxi:api-driver-detail", kwargs={"pk": self.user.pk}) + "?include=cars"
+        )
+
+        payload = response.json()
+
+        self.assertEqual(payload["data"]["license_number"], "AAA00001")
+        self.assertEqual(len(payload["data"]["cars"]), 5)
+        self.assertEqual(len(payload["included"]["cars"]), 5)
+
+    def test_detail_not_found(self):
+        response = self.client.get(
+            reverse("taxi:api-manufacturer-detail", kwargs={"pk": 999})
+        )
+
+        self.assertEqual(response.status_code, 404)
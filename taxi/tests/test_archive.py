@@ -0,0 +1,92 @@
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from taxi.archive import ArchiveFile, RideHistory, archive_month, archive_path, closed_months, track_points
+from taxi.models import Ride, TrackSegment
+from taxi.telemetry import append_points
+
+
+class RideArchiveTest(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(RIDE_ARCHIVE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.driver = get_user_model().objects.create_user(
+            username="test_user", password="test_password", license_number="AAA00001"
+        )
+        self.march = timezone.make_aware(datetime(2026, 3, 1))
+        self.rides = [
+            Ride.objects.create(
+                pickup_latitude=50.45 + day / 1000,
+                pickup_longitude=30.52,
+                status=Ride.COMPLETED if day % 2 else Ride.CANCELLED,
+                driver=self.driver if day % 2 else None,
+                pickup_distance_km=day / 10 if day % 2 else None,
+                requested_at=self.march + timedelta(days=day, hours=1),
+            )
+            for day in range(40)
+        ]
+        append_points(self.rides[1].pk, [[1_000, 50.45, 30.52], [2_000, 50.4501, 30.5203]])
+
+    def test_closed_months_are_archived_and_still_queryable(self):
+        now = timezone.make_aware(datetime(2026, 7, 10))
+        self.assertEqual(closed_months(3, now), [self.march])
+
+        # An open ride keeps its month online.
+        Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52, requested_at=self.march + timedelta(days=35))
+        self.assertEqual(closed_months(0, now), [self.march])
+
+        expected = list(RideHistory(driver_id=self.driver.pk))
+        points = track_points(self.rides[1].pk)
+
+        self.assertEqual(archive_month(self.march), 31)
+        self.assertEqual(Ride.objects.filter(requested_at__lt=self.march + timedelta(days=31)).count(), 0)
+        self.assertFalse(TrackSegment.objects.exists())
+
+        archive = ArchiveFile(archive_path(self.march))
+        self.assertEqual(len(archive), 31)
+        self.assertEqual(archive.columns, {})
+
+        history = RideHistory(driver_id=self.driver.pk)
+        self.assertEqual(history.count(), 20)
+        self.assertEqual(
+            [(ride["id"], ride["status"], ride["pickup_distance_km"], ride["requested_at"]) for ride in history],
+            [(ride["id"], ride["status"], ride["pickup_distance_km"], ride["requested_at"]) for ride in expected],
+        )
+        np.testing.assert_array_equal(track_points(self.rides[1].pk), points)
+
+        april = RideHistory(since=self.march + timedelta(days=20), until=self.march + timedelta(days=35))
+        self.assertEqual(april.count(), 15)
+        self.assertEqual(
+            april.columns("id")["id"].tolist(), [ride.pk for ride in self.rides[20:35]]
+        )
+
+        # Late rows for an archived month are merged into its file.
+        Ride.objects.create(
+            pickup_latitude=50.45, pickup_longitude=30.52, status=Ride.COMPLETED, requested_at=self.march
+        )
+        self.assertEqual(archive_month(self.march), 1)
+        self.assertEqual(len(ArchiveFile(archive_path(self.march))), 32)
+        self.assertEqual(RideHistory().count(), 42)
+
+    def test_commands(self):
+        output = StringIO()
+        call_command("archive_rides", keep_months=0, stdout=output)
+        self.assertIn("Archived 31 rides of 2026-03", output.getvalue())
+        self.assertIn("Archived 9 rides of 2026-04", output.getvalue())
+        self.assertFalse(Ride.objects.exists())
+
+        output = StringIO()
+        call_command("ride_report", stdout=output)
+        march = next(line for line in output.getvalue().splitlines() if line.startswith("2026-03"))
+        self.assertEqual(march.split()[1:4], ["31", "15", "16"])
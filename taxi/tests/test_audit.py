@@ -0,0 +1,195 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from taxi.audit import audit_log
+from taxi.jobs import enqueue, run_pending
+from taxi.models import AuditEntry, Car, Driver, Manufacturer
+from taxi.sync import sync_drivers
+
+
+@override_settings(AUDIT_FLUSH_INTERVAL=0)
+class AuditTrailTest(TestCase):
+    def setUp(self) -> None:
+        audit_log.clear()
+        self.user = get_user_model().objects.create_user(
+            username="dispatcher", password="test_password", license_number="AAA00001"
+        )
+        self.driver = get_user_model().objects.create_user(
+            username="driver", password="test_password", license_number="BBB00001"
+        )
+        self.manufacturer = Manufacturer.objects.create(name="Toyota", country="Japan")
+        self.car = Car.objects.create(model="Corolla", manufacturer=self.manufacturer)
+        audit_log.clear()
+        self.client.force_login(self.user)
+
+    def history(self, instance):
+        return list(AuditEntry.objects.filter(
+            model=instance._meta.label_lower, object_id=instance.pk
+        ).order_by("pk"))
+
+    def test_license_update_is_buffered_until_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("taxi:driver-license-update", kwargs={"pk": self.driver.pk}),
+                {"license_number": "CCC00001"},
+            )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.history(self.driver), [])
+        self.assertEqual(audit_log.flush(), 1)
+
+        [entry] = self.history(self.driver)
+        self.assertEqual(entry.action, AuditEntry.UPDATED)
+        self.assertEqual(entry.changes, {"license_number": ["BBB00001", "CCC00001"]})
+        self.assertEqual(entry.actor, self.user)
+        self.assertEqual(entry.route, "taxi:driver-license-update")
+
+    def test_create_update_and_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            manufacturer = Manufacturer.objects.create(name="Honda", country="Japan")
+            manufacturer.save()
+            manufacturer.country = "USA"
+            manufacturer.save()
+            manufacturer_id = manufacturer.pk
+            manufacturer.delete()
+
+        audit_log.flush()
+        manufacturer.pk = manufacturer_id
+        entries = self.history(manufacturer)
+
+        self.assertEqual(
+            [(entry.action, entry.changes) for entry in entries],
+            [
+                (AuditEntry.CREATED, {"name": [None, "Honda"], "country": [None, "Japan"]}),
+                (AuditEntry.UPDATED, {"country": ["Japan", "USA"]}),
+                (AuditEntry.DELETED, {"name": ["Honda", None], "country": ["USA", None]}),
+            ],
+        )
+        self.assertIsNone(entries[0].actor)
+
+    def test_loaded_instance_diffs_against_database_values(self):
+        car = Car.objects.get(pk=self.car.pk)
+        car.model = "Camry"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save(update_fields=["model"])
+
+        audit_log.flush()
+
+        self.assertEqual([entry.changes for entry in self.history(car)], [{"model": ["Corolla", "Camry"]}])
+
+    def test_car_drivers_changes(self):
+        other = get_user_model().objects.create_user(
+            username="other", password="test_password", license_number="DDD00001"
+        )
+        audit_log.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.drivers.add(self.driver, other)
+            self.car.drivers.remove(other)
+            self.driver.cars.clear()
+
+        audit_log.flush()
+
+        self.assertEqual(
+            [(entry.action, entry.changes) for entry in self.history(self.car)],
+            [
+                (AuditEntry.ADDED, {"drivers": sorted([self.driver.pk, other.pk])}),
+                (AuditEntry.REMOVED, {"drivers": [other.pk]}),
+                (AuditEntry.REMOVED, {"drivers": [self.driver.pk]}),
+            ],
+        )
+
+    def test_bulk_driver_sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_drivers([
+                {"license_number": "BBB00001", "username": "driver", "first_name": "Taras"},
+                {"license_number": "EEE00001", "username": "new_driver"},
+            ])
+
+        audit_log.flush()
+        created = Driver.objects.get(license_number="EEE00001")
+
+        self.assertEqual(
+            [(entry.action, entry.changes) for entry in self.history(self.driver)],
+            [(AuditEntry.UPDATED, {"first_name": ["", "Taras"]})],
+        )
+        [entry] = self.history(created)
+        self.assertEqual(entry.action, AuditEntry.CREATED)
+        self.assertEqual(entry.changes["license_number"], [None, "EEE00001"])
+        self.assertEqual(entry.changes["username"], [None, "new_driver"])
+
+    def test_bulk_car_delete_job(self):
+        job = enqueue("delete_manufacturer", {"manufacturer_id": self.manufacturer.pk}, user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+
+        audit_log.flush()
+        [entry] = self.history(self.car)
+
+        self.assertEqual(entry.action, AuditEntry.DELETED)
+        self.assertEqual(entry.changes, {"model": ["Corolla", None], "manufacturer": [self.manufacturer.pk, None]})
+        self.assertEqual(entry.actor, self.user)
+        self.assertEqual(entry.route, f"job:{job.name}")
+        self.assertEqual(self.history(self.manufacturer)[0].action, AuditEntry.DELETED)
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.manufacturer.name = "Lexus"
+                    self.manufacturer.save()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+
+        self.assertEqual(audit_log.flush(), 0)
+
+    def test_full_buffer_is_flushed(self):
+        with mock.patch("taxi.audit.AUDIT_FLUSH_SIZE", 2), self.captureOnCommitCallbacks(execute=True):
+            self.car.model = "Camry"
+            self.car.save()
+            self.assertEqual(AuditEntry.objects.count(), 0)
+            self.car.model = "Yaris"
+            self.car.save()
+
+        self.assertEqual(AuditEntry.objects.count(), 2)
+
+    def test_failed_flush_keeps_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.model = "Camry"
+            self.car.save()
+
+        with mock.patch.object(AuditEntry.objects, "using", side_effect=DatabaseError), self.assertLogs("taxi.audit"):
+            self.assertEqual(audit_log.flush(), 0)
+
+        self.assertEqual(audit_log.flush(), 1)
+
+    def test_history_view(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("taxi:driver-license-update", kwargs={"pk": self.driver.pk}),
+                {"license_number": "CCC00001"},
+            )
+
+        audit_log.flush()
+        response = self.client.get(reverse("taxi:driver-history", kwargs={"pk": self.driver.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["object_list"]), 1)
+        self.assertContains(response, "CCC00001")
+        self.assertContains(response, reverse("taxi:driver-detail", kwargs={"pk": self.driver.pk}))
+
+        response = self.client.get(reverse("taxi:car-history", kwargs={"pk": self.car.pk}))
+        self.assertContains(response, "No changes recorded yet.")
+
+    def test_history_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse("taxi:manufacturer-history", kwargs={"pk": self.manufacturer.pk}))
+
+        self.assertNotEqual(response.status_code, 200)
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from taxi.cache import invalidate_fleet_cache
+from taxi.facets import get_facet_counts
+from taxi.models import Car, Manufacturer
+from taxi.singleflight import single_flight
+
+CAR_LIST_VIEW_URL = reverse("taxi:car-list")
+
+
+class CarFacetsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+        cls.audi = Manufacturer.objects.create(name="Audi", country="Germany")
+        cls.bmw = Manufacturer.objects.create(name="BMW", country="Germany")
+        cls.fiat = Manufacturer.objects.create(name="Fiat", country="Italy")
+
+        Car.objects.create(model="A4", manufacturer=cls.audi)
+        Car.objects.create(model="A6", manufacturer=cls.audi)
+        Car.objects.create(model="X5", manufacturer=cls.bmw)
+        Car.objects.create(model="Panda", manufacturer=cls.fiat).drivers.add(cls.user)
+
+    def setUp(self) -> None:
+        invalidate_fleet_cache()
+        single_flight.cache.clear()
+        self.client.force_login(self.user)
+
+    def test_facet_counts(self):
+        facets = get_facet_counts({})
+
+        self.assertEqual(
+            facets["manufacturer"],
+            [
+                (str(self.audi.id), "Audi", 2),
+                (str(self.bmw.id), "BMW", 1),
+                (str(self.fiat.id), "Fiat", 1),
+            ]
+        )
+        self.assertEqual(
+            facets["country"],
+            [("Germany", "Germany", 3), ("Italy", "Italy", 1)]
+        )
+        self.assertEqual(facets["drivers"], [("0", "0", 3), ("1", "1", 1)])
+
+    def test_facet_counts_ignore_own_selection(self):
+        facets = get_facet_counts({"country": "Italy"})
+
+        self.assertEqual(len(facets["country"]), 2)
+        self.assertEqual(facets["manufacturer"], [(str(self.fiat.id), "Fiat", 1)])
+
+    def test_facet_counts_are_cached(self):
+        get_facet_counts({})
+
+        with self.assertNumQueries(0):
+            get_facet_counts({})
+
+    def test_facet_counts_invalidated_on_changes(self):
+        get_facet_counts({})
+
+        car = Car.objects.create(model="Q7", manufacturer=self.audi)
+        self.assertEqual(get_facet_counts({})["manufacturer"][0][2], 3)
+
+        car.drivers.add(self.user)
+        self.assertEqual(get_facet_counts({})["drivers"], [("0", "0", 3), ("1", "1", 2)])
+
+        self.fiat.delete()
+        self.assertEqual(get_facet_counts({})["country"], [("Germany", "Germany", 4)])
+
+    def test_car_list_filtered_by_facets(self):
+        response = self.client.get(CAR_LIST_VIEW_URL + "?country=Germany&drivers=0")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["paginator"].count, 3)
+        self.assertIn("facets", response.context)
+
+        response = self.client.get(CAR_LIST_VIEW_URL + f"?manufacturer={self.fiat.id}")
+
+        self.assertEqual(
+            [car.model for car in response.context["car_list"]],
+            ["Panda"]
+        )
+        self.assertEqual(response.context["car_list"][0].num_drivers, 1)
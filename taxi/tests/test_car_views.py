@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 
+from taxi.cache import invalidate_fleet_cache
 from taxi.models import Car, Manufacturer, Driver
 
 CAR_LIST_VIEW_URL = reverse("taxi:car-list")
@@ -23,12 +24,12 @@ class PublicCarTest(TestCase):
 
 
 class PrivateCarTest(TestCase):
-    def setUp(self) -> None:
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             username="test_user",
             password="test_password"
         )
-        self.client.force_login(self.user)
 
         test_manufacturer = Manufacturer.objects.create(
             name="Manufacturer",
@@ -42,6 +43,10 @@ class PrivateCarTest(TestCase):
                 manufacturer=test_manufacturer,
             )
 
+    def setUp(self) -> None:
+        invalidate_fleet_cache()
+        self.client.force_login(self.user)
+
     # CarListView section tests
 
     def test_pagination_is_two(self):
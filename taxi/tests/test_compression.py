@@ -0,0 +1,119 @@
+import unittest
+import zlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from taxi.compression import CODINGS, compress_stream, decompress, negotiate, parse_accept_encoding
+from taxi.middleware import CompressionMiddleware
+from taxi.models import Manufacturer
+
+PAGE = ("<tr><td>Toyota</td><td>Corolla</td></tr>" * 100).encode()
+
+
+class NegotiationTest(SimpleTestCase):
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip, deflate;q=0.5, br;q=0, *;q=bad"),
+            {"gzip": 1.0, "deflate": 0.5, "br": 0.0, "*": 0.0},
+        )
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate("gzip;q=0.8, br", ("br", "gzip")), "br")
+        self.assertEqual(negotiate("gzip, br;q=0.5", ("br", "gzip")), "gzip")
+        self.assertEqual(negotiate("br, gzip", ("gzip",)), "gzip")
+        self.assertEqual(negotiate("*", ("br", "gzip")), "br")
+        self.assertEqual(negotiate("gzip;q=0, *", ("gzip",)), None)
+        self.assertIsNone(negotiate("identity"))
+        self.assertIsNone(negotiate(None))
+
+    def test_streaming_chunks_decode_as_they_arrive(self):
+        chunks = list(compress_stream("gzip", [PAGE, PAGE], 6))
+        # A client can decode the first chunk before the rest is sent.
+        self.assertEqual(zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0]), PAGE)
+        self.assertEqual(decompress("gzip", b"".join(chunks)), PAGE * 2)
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_BYTES=1024, RESPONSE_GZIP_LEVEL=6, RESPONSE_BROTLI_QUALITY=4)
+class CompressionMiddlewareTest(SimpleTestCase):
+    def respond(self, response, accept="gzip, deflate"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept)
+
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_html(self):
+        response = HttpResponse(PAGE)
+        response["ETag"] = '"v1"'
+        response = self.respond(response)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["ETag"], 'W/"v1"')
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertLess(len(response.content), len(PAGE) // 10)
+        self.assertEqual(decompress("gzip", response.content), PAGE)
+
+    @unittest.skipUnless("br" in CODINGS, "brotli isn't installed")
+    def test_prefers_brotli(self):
+        response = self.respond(HttpResponse(PAGE), "gzip, br")
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(decompress("br", response.content), PAGE)
+
+    def test_leaves_small_binary_and_encoded_responses(self):
+        self.assertFalse(self.respond(HttpResponse(b"short")).has_header("Content-Encoding"))
+        self.assertFalse(
+            self.respond(HttpResponse(PAGE, content_type="image/png")).has_header("Content-Encoding")
+        )
+        response = HttpResponse(PAGE)
+        response["Content-Encoding"] = "br"
+        self.assertEqual(self.respond(response).content, PAGE)
+        response = HttpResponse(PAGE)
+        response["Cache-Control"] = "no-transform"
+        self.assertFalse(self.respond(response).has_header("Content-Encoding"))
+
+    def test_identity_still_varies(self):
+        response = self.respond(HttpResponse(PAGE), "identity")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_compresses_streaming_responses(self):
+        response = StreamingHttpResponse(iter([PAGE, PAGE]), content_type="text/csv")
+        response["Content-Length"] = str(len(PAGE) * 2)
+        response = self.respond(response)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(decompress("gzip", b"".join(response.streaming_content)), PAGE * 2)
+
+
+class CompressedPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test", password="test_password", license_number="AAA00001"
+        )
+        Manufacturer.objects.bulk_create(
+            [Manufacturer(name=f"Manufacturer {number}", country="Country") for number in range(50)]
+        )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def test_api_list_is_compressed(self):
+        response = self.client.get(reverse("taxi:api-manufacturer-list"), HTTP_ACCEPT_ENCODING="gzip")
+        plain = self.client.get(reverse("taxi:api-manufacturer-list"))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(decompress("gzip", response.content), plain.content)
+
+    @unittest.skipUnless(settings.DEBUG_TOOLBAR and settings.RESPONSE_COMPRESSION, "no toolbar to compress")
+    def test_debug_toolbar_sees_uncompressed_pages(self):
+        self.assertGreater(
+            settings.MIDDLEWARE.index("debug_toolbar.middleware.DebugToolbarMiddleware"),
+            settings.MIDDLEWARE.index("taxi.middleware.CompressionMiddleware"),
+        )
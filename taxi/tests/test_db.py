@@ -0,0 +1,37 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from taxi.db import immediate_atomic
+from taxi.models import Manufacturer
+
+
+class SqliteTuningTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute("PRAGMA temp_store")
+            temp_store = cursor.fetchone()[0]
+
+        self.assertEqual(busy_timeout, 5000)
+        self.assertEqual(temp_store, 2)  # MEMORY
+
+
+class ImmediateAtomicTest(TransactionTestCase):
+    def test_begins_immediate_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            with immediate_atomic():
+                Manufacturer.objects.create(name="Audi", country="Germany")
+
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+        self.assertTrue(Manufacturer.objects.filter(name="Audi").exists())
+
+    def test_rolls_back_and_restores_plain_begin(self):
+        with self.assertRaises(ValueError):
+            with immediate_atomic():
+                Manufacturer.objects.create(name="Audi", country="Germany")
+                raise ValueError
+
+        self.assertFalse(Manufacturer.objects.exists())
+        self.assertNotIn("_start_transaction_under_autocommit", vars(connection))
@@ -0,0 +1,147 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from taxi.dispatch import assign, dispatch_batch
+from taxi.locations import driver_index, record_pings
+from taxi.models import Car, Manufacturer, Ride
+from taxi.singleflight import single_flight
+from taxi.tokens import create_token
+
+API_RIDE_REQUEST_URL = reverse("taxi:api-ride-request")
+
+
+class AssignTest(SimpleTestCase):
+    def test_shortest_pickups_first(self):
+        rides = [(50.450, 30.520), (50.452, 30.520)]
+        drivers = [(50.4525, 30.520), (50.460, 30.520), (51.0, 30.520)]
+
+        matches = assign(rides, drivers)
+
+        self.assertEqual(
+            [(ride, driver) for ride, driver, _ in matches],
+            [(1, 0), (0, 1)]
+        )
+        self.assertAlmostEqual(matches[0][2], 0.0556, places=3)
+
+    def test_drivers_beyond_radius_are_not_assigned(self):
+        self.assertEqual(assign([(50.45, 30.52)], [(50.55, 30.52)]), [])
+        self.assertEqual(assign([], [(50.45, 30.52)]), [])
+
+    def test_each_driver_is_assigned_once(self):
+        rides = [(50.45 + index * 0.0001, 30.52) for index in range(50)]
+        drivers = [(50.45, 30.52 + index * 0.0001) for index in range(30)]
+
+        matches = assign(rides, drivers, radii=(0.5, 5.0))
+
+        self.assertEqual(len(matches), 30)
+        self.assertEqual(len({driver for _, driver, _ in matches}), 30)
+        self.assertEqual(len({ride for ride, _, _ in matches}), 30)
+
+
+class DispatchBatchTest(TestCase):
+    def setUp(self) -> None:
+        single_flight.cache.clear()
+        driver_index.clear()
+        manufacturer = Manufacturer.objects.create(name="Audi", country="Germany")
+        self.car = Car.objects.create(model="A4", manufacturer=manufacturer)
+        self.near, self.far, self.carless = (
+            get_user_model().objects.create_user(
+                username=username,
+                password="test_password",
+                license_number=license_number,
+            )
+            for username, license_number in (
+                ("near", "AAA00001"), ("far", "AAA00002"), ("carless", "AAA00003")
+            )
+        )
+        self.car.drivers.add(self.near, self.far)
+        record_pings([
+            {"driver": self.near.pk, "latitude": 50.451, "longitude": 30.52},
+            {"driver": self.far.pk, "latitude": 50.47, "longitude": 30.52},
+            {"driver": self.carless.pk, "latitude": 50.45, "longitude": 30.52},
+        ])
+
+    def test_rides_get_nearest_driver_with_a_car(self):
+        first = Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52)
+        second = Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52)
+        cancelled = Ride.objects.create(
+            pickup_latitude=50.45, pickup_longitude=30.52, status=Ride.CANCELLED
+        )
+
+        self.assertEqual(dispatch_batch(), 2)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual(
+            {first.driver, second.driver}, {self.near, self.far}
+        )
+        self.assertEqual((first.status, first.car), (Ride.ASSIGNED, self.car))
+        self.assertIsNone(cancelled.driver)
+
+    def test_busy_drivers_are_skipped(self):
+        Ride.objects.create(
+            pickup_latitude=50.45, pickup_longitude=30.52, status=Ride.ASSIGNED, driver=self.near
+        )
+        ride = Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52)
+
+        self.assertEqual(dispatch_batch(), 1)
+
+        ride.refresh_from_db()
+        self.assertEqual(ride.driver, self.far)
+        self.assertEqual(dispatch_batch(), 0)
+
+
+class RideApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def post(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type="application/json")
+
+    def test_request_and_cancel_ride(self):
+        response = self.post(API_RIDE_REQUEST_URL, {"pickup_latitude": 50.45, "pickup_longitude": 30.52})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["data"]["status"], "requested")
+
+        status_url = reverse("taxi:api-ride-status", kwargs={"pk": response.json()["data"]["id"]})
+
+        self.assertEqual(self.post(status_url, {"status": "completed"}).status_code, 409)
+        self.assertEqual(
+            self.post(status_url, {"status": "cancelled"}).json()["data"]["status"], "cancelled"
+        )
+
+    def test_app_requests_ride_with_token(self):
+        client = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=f"Bearer {create_token(self.user, 'app')}")
+        response = client.post(
+            API_RIDE_REQUEST_URL,
+            json.dumps({"pickup_latitude": 50.45, "pickup_longitude": 30.52}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+
+        response = client.post(
+            reverse("taxi:api-ride-status", kwargs={"pk": response.json()["data"]["id"]}),
+            json.dumps({"status": "cancelled"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.json()["data"]["status"], "cancelled")
+
+    def test_invalid_ride_request(self):
+        response = self.post(API_RIDE_REQUEST_URL, {"pickup_latitude": 95, "pickup_longitude": 30.52})
+
+        self.assertEqual(response.status_code, 400)
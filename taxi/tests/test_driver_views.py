@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 
+from taxi.cache import invalidate_fleet_cache
 from taxi.models import Driver
 
 DRIVER_LIST_VIEW_URL = reverse("taxi:driver-list")
@@ -22,12 +23,12 @@ class PublicDriverTest(TestCase):
 
 
 class PrivateDriverTest(TestCase):
-    def setUp(self) -> None:
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             username="test_user",
             password="test_password",
         )
-        self.client.force_login(self.user)
 
         number_of_drivers = 2
         for num in range(number_of_drivers):
@@ -37,6 +38,10 @@ class PrivateDriverTest(TestCase):
                 license_number=f"AAA0000{num}",
             )
 
+    def setUp(self) -> None:
+        invalidate_fleet_cache()
+        self.client.force_login(self.user)
+
     # DriverListView section tests
 
     def test_pagination_is_two(self):
@@ -0,0 +1,133 @@
+import json
+import os
+import random
+import tempfile
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from taxi.dispatch import assign
+from taxi.eta import MANY_ORIGINS, RoadGraph, grid_city
+from taxi.tokens import create_token
+
+API_ETA_URL = reverse("taxi:api-eta")
+
+
+class RoadGraphTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph = grid_city(20, 20, seed=1)
+
+    def test_searches_match_dijkstra(self):
+        rng = random.Random(1)
+        queries = [(rng.randrange(len(self.graph)), rng.randrange(len(self.graph))) for _ in range(30)]
+        expected = [self.graph.dijkstra(origin)[destination] for origin, destination in queries]
+        plain = [self.graph.search(origin, destination) for origin, destination in queries]
+
+        self.graph.precompute_landmarks(count=4)
+        alt = [self.graph.search(origin, destination) for origin, destination in queries]
+
+        np.testing.assert_allclose([seconds for seconds, _ in plain], expected, rtol=1e-5)
+        np.testing.assert_allclose([seconds for seconds, _ in alt], expected, rtol=1e-5)
+        self.assertLess(sum(nodes for _, nodes in alt), sum(nodes for _, nodes in plain))
+
+    def test_one_way_roads_and_save(self):
+        graph = RoadGraph([50.0, 50.001, 50.002], [30.0, 30.0, 30.0], [0, 1], [1, 2], [10.0, 20.0])
+
+        self.assertEqual(graph.route_time(0, 2), 30.0)
+        self.assertEqual(graph.route_time(2, 0), float("inf"))
+        self.assertEqual(graph.cache.get((0, 2)), 30.0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.npz")
+            graph.precompute_landmarks(count=2)
+            graph.save(path)
+            loaded = RoadGraph.load(path)
+
+        self.assertEqual(loaded.route_time(0, 2), 30.0)
+        self.assertEqual(loaded.landmarks.tolist(), graph.landmarks.tolist())
+
+    def test_batch_travel_times(self):
+        points = np.column_stack([self.graph.latitudes, self.graph.longitudes])
+        destination = points[210].tolist()
+        origins = [points[node].tolist() for node in range(0, 400, 400 // (MANY_ORIGINS * 2))]
+        self.graph.cache.clear()
+
+        seconds = self.graph.travel_times(origins + [origins[0]], [destination] * (len(origins) + 1))
+
+        np.testing.assert_allclose(
+            seconds[:-1],
+            [self.graph.search(self.graph.snap(*origin)[0], 210)[0] for origin in origins],
+            rtol=1e-5,
+        )
+        self.assertEqual(seconds[-1], seconds[0])
+        self.assertEqual(len(self.graph.cache.entries), len(origins))
+
+
+class RankedAssignTest(SimpleTestCase):
+    def test_travel_times_rank_candidates(self):
+        rides = [(50.45, 30.52)]
+        drivers = [(50.451, 30.52), (50.455, 30.52)]
+
+        def travel_times(origins, destinations):
+            # The nearer driver is across a river.
+            return np.array([600.0 if tuple(origin) == drivers[0] else 120.0 for origin in origins])
+
+        self.assertEqual([driver for _, driver, _ in assign(rides, drivers)], [0])
+        self.assertEqual(
+            [driver for _, driver, _ in assign(rides, drivers, travel_times=travel_times)], [1]
+        )
+        self.assertEqual(
+            assign(rides, drivers, travel_times=lambda origins, _: np.full(len(origins), np.inf)), []
+        )
+
+
+class EtaApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def post(self, pairs):
+        return self.client.post(API_ETA_URL, json.dumps({"pairs": pairs}), content_type="application/json")
+
+    def test_travel_times(self):
+        with override_settings(ROAD_GRAPH_PATH=None):
+            self.assertEqual(self.post([[50.45, 30.52, 50.46, 30.52]]).status_code, 503)
+
+        graph = grid_city(10, 10)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.npz")
+            graph.save(path)
+
+            with override_settings(ROAD_GRAPH_PATH=path):
+                response = self.post([
+                    [graph.latitudes[0], graph.longitudes[0], graph.latitudes[0], graph.longitudes[0]],
+                    [graph.latitudes[0], graph.longitudes[0], graph.latitudes[99], graph.longitudes[99]],
+                ])
+
+        self.assertEqual(response.json()["data"][0], 0)
+        self.assertEqual(response.json()["data"][1], round(graph.route_time(0, 99)))
+        self.assertEqual(self.post([[95, 30.52, 50.46, 30.52]]).status_code, 400)
+
+    @override_settings(ROAD_GRAPH_PATH=None)
+    def test_token_authentication(self):
+        response = Client(enforce_csrf_checks=True).post(
+            API_ETA_URL,
+            json.dumps({"pairs": [[50.45, 30.52, 50.46, 30.52]]}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {create_token(self.user, 'dispatch')}",
+        )
+
+        # Past authentication and CSRF: there's just no road graph.
+        self.assertEqual(response.status_code, 503)
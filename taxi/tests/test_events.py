@@ -0,0 +1,289 @@
+import asyncio
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from taxi.events import EVENTS_PATH, Broker, broker, origin, publish_on_commit, relay
+from taxi.locations import driver_index, record_pings
+from taxi.models import Car, Manufacturer, PublishedEvent
+from taxi_service.asgi import application
+
+
+class BrokerTest(SimpleTestCase):
+    async def test_fan_out_with_filters(self):
+        broker = Broker()
+        everything = broker.subscribe()
+        car = broker.subscribe(keys={("car", 1)})
+        locations = broker.subscribe(topics={"driver.location"}, keys={("driver", 5)})
+
+        # From another thread, as sync views and signal handlers do.
+        thread = threading.Thread(target=lambda: (
+            broker.publish("car.drivers", {"car": 1}, cars=[1], drivers=[5]),
+            broker.publish("car.drivers", {"car": 2}, cars=[2]),
+            broker.publish("driver.location", {"driver": 5}, drivers=[5]),
+        ))
+        thread.start()
+        thread.join()
+
+        self.assertEqual((await everything.get()).count(b"event: "), 3)
+        self.assertEqual(
+            await car.get(), b'id: 1\nevent: car.drivers\ndata: {"car":1}\n\n'
+        )
+        self.assertIn(b'data: {"driver":5}', await locations.get())
+
+        broker.unsubscribe(everything)
+        broker.unsubscribe(car)
+        broker.unsubscribe(locations)
+        self.assertEqual(len(broker), 0)
+        self.assertEqual(broker.loops, {})
+
+    async def test_slow_subscriber_drops_oldest(self):
+        broker = Broker()
+        subscription = broker.subscribe(size=2)
+
+        for car in range(5):
+            broker.publish("car.drivers", {"car": car}, cars=[car])
+
+        await asyncio.sleep(0)
+        events = await subscription.get()
+
+        self.assertTrue(events.startswith(b'event: lagged\ndata: {"dropped":3}\n\n'))
+        self.assertEqual(events.count(b"event: car.drivers"), 2)
+        self.assertIn(b'{"car":4}', events)
+        broker.unsubscribe(subscription)
+
+
+@override_settings(EVENT_RELAY=True)
+class PublishTest(TestCase):
+    def setUp(self) -> None:
+        driver_index.clear()
+        manufacturer = Manufacturer.objects.create(name="Audi", country="Germany")
+        self.car = Car.objects.create(model="A4", manufacturer=manufacturer)
+        self.driver = get_user_model().objects.create_user(
+            username="test_driver",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+    def test_driver_changes_are_published_on_commit(self):
+        with mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.car.drivers.add(self.driver)
+
+                publish.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.driver.cars.clear()
+                record_pings([{"driver": self.driver.pk, "latitude": 50.45, "longitude": 30.52}])
+
+        self.assertEqual(
+            [call.args[:2] for call in publish.call_args_list[:2]],
+            [
+                ("car.drivers", {"car": self.car.pk, "drivers": [self.driver.pk], "action": "added"}),
+                ("car.drivers", {"car": self.car.pk, "drivers": [self.driver.pk], "action": "removed"}),
+            ],
+        )
+        self.assertEqual(publish.call_args_list[2].args[0], "driver.location")
+        self.assertEqual(publish.call_args_list[2].args[3], [self.driver.pk])
+        self.assertEqual(
+            list(PublishedEvent.objects.values_list("topic", flat=True)),
+            ["car.drivers", "car.drivers", "driver.location"],
+        )
+        self.assertEqual(
+            [call.kwargs["id"] for call in publish.call_args_list],
+            list(PublishedEvent.objects.values_list("pk", flat=True)),
+        )
+
+    def test_a_transaction_stores_its_events_together(self):
+        drivers = [self.driver] + [
+            get_user_model().objects.create_user(
+                username=f"driver_{number}", password="test_password", license_number=f"BBB0000{number}"
+            )
+            for number in range(2)
+        ]
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            record_pings([
+                {"driver": driver.pk, "latitude": 50.45, "longitude": 30.52} for driver in drivers
+            ])
+
+        self.assertEqual(len(callbacks), 1)
+
+        with self.assertNumQueries(1):
+            callbacks[0]()
+
+        self.assertEqual(PublishedEvent.objects.count(), 3)
+
+    def test_rolled_back_savepoints_drop_their_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_on_commit("car.drivers", {"car": 1}, cars=[1])
+
+            try:
+                with transaction.atomic():
+                    publish_on_commit("car.drivers", {"car": 2}, cars=[2])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+            publish_on_commit("car.drivers", {"car": 3}, cars=[3])
+
+        self.assertEqual(
+            [event["car"] for event in PublishedEvent.objects.order_by("pk").values_list("data", flat=True)],
+            [1, 3],
+        )
+
+    @override_settings(EVENT_RELAY=False)
+    def test_nothing_is_stored_without_a_relay(self):
+        with mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.car.drivers.add(self.driver)
+
+        publish.assert_called_once()
+        self.assertFalse(PublishedEvent.objects.exists())
+
+
+class RelayTest(TestCase):
+    def setUp(self) -> None:
+        relay.since = None
+        relay.seen = {}
+
+    def test_relays_other_processes_events_once(self):
+        relay.poll()
+        event = PublishedEvent.objects.create(
+            topic="car.drivers", data={"car": 1}, cars=[1], origin="worker:1"
+        )
+        PublishedEvent.objects.create(topic="car.drivers", data={"car": 2}, cars=[2], origin=origin())
+
+        with mock.patch.object(broker, "publish") as publish:
+            self.assertEqual(relay.poll(), 1)
+            self.assertEqual(relay.poll(), 0)
+
+        publish.assert_called_once_with("car.drivers", {"car": 1}, [1], [], id=event.pk)
+
+    def test_job_workers_prune_old_events(self):
+        PublishedEvent.objects.create(
+            topic="car.drivers", data={}, origin="worker:1", created_at=timezone.now() - timedelta(hours=1)
+        )
+        recent = PublishedEvent.objects.create(topic="car.drivers", data={}, origin="worker:1")
+        call_command("run_jobs", burst=True, stdout=StringIO())
+
+        self.assertEqual(list(PublishedEvent.objects.values_list("pk", flat=True)), [recent.pk])
+
+
+class EventStreamPageTest(TestCase):
+    def setUp(self) -> None:
+        manufacturer = Manufacturer.objects.create(name="Audi", country="Germany")
+        self.car = Car.objects.create(model="A4", manufacturer=manufacturer)
+        self.client.force_login(
+            get_user_model().objects.create_user(
+                username="test_user", password="test_password", license_number="AAA00001"
+            )
+        )
+
+    def test_feed_only_opened_where_served(self):
+        url = reverse("taxi:car-detail", kwargs={"pk": self.car.pk})
+
+        self.assertNotContains(self.client.get(url), "EventSource(")
+
+        with override_settings(EVENT_STREAM=True):
+            self.assertContains(self.client.get(url), "EventSource(")
+
+
+@override_settings(EVENT_STREAM=True)
+class EventStreamTest(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        self.client.force_login(self.user)
+        self.cookie = f"{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    async def request(self, query_string=b"", cookie=None, until=None):
+        sent = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": EVENTS_PATH,
+            "query_string": query_string,
+            "headers": [(b"cookie", (cookie or self.cookie).encode())],
+        }
+        task = asyncio.ensure_future(application(scope, receive, send))
+
+        if until is not None:
+            while not len(broker):
+                await asyncio.sleep(0.01)
+
+            until()
+
+            while not any(b"event:" in message.get("body", b"") for message in sent):
+                await asyncio.sleep(0.01)
+
+        disconnected.set()
+        await asyncio.wait_for(task, 5)
+
+        return sent
+
+    async def test_streams_matching_events(self):
+        sent = await self.request(
+            b"cars=1",
+            until=lambda: (
+                broker.publish("car.drivers", {"car": 2}, cars=[2]),
+                broker.publish("car.drivers", {"car": 1}, cars=[1]),
+            ),
+        )
+
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), sent[0]["headers"])
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+
+        self.assertTrue(body.startswith(b"retry: 3000\n\n"))
+        self.assertIn(b'event: car.drivers\ndata: {"car":1}\n\n', body)
+        self.assertNotIn(b'"car":2', body)
+        self.assertEqual(len(broker), 0)
+
+    async def test_requires_login_and_valid_filters(self):
+        self.assertEqual((await self.request(cookie="sessionid=x"))[0]["status"], 401)
+        self.assertEqual((await self.request(b"topics=cars"))[0]["status"], 400)
+        self.assertEqual((await self.request(b"drivers=me"))[0]["status"], 400)
+
+    async def test_not_served_when_off(self):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": EVENTS_PATH,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"cookie", self.cookie.encode())],
+        }
+
+        with override_settings(EVENT_STREAM=False):
+            await application(scope, receive, send)
+
+        self.assertEqual(sent[0]["status"], 404)
@@ -0,0 +1,139 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from taxi.heatmap import BASE_LEVEL, HEATMAP_TILE_BITS, Heatmap, HeatLayer, heatmap, mercator_cell, quadkey
+from taxi.locations import driver_index
+from taxi.models import Ride
+
+API_RIDE_REQUEST_URL = reverse("taxi:api-ride-request")
+HEATMAP_URL = reverse("taxi:heatmap")
+
+
+def tile_url(layer, zoom, x, y):
+    return reverse("taxi:api-heatmap-tile", args=[layer, zoom, x, y])
+
+
+class TileMathTest(SimpleTestCase):
+    def test_mercator_cells_and_quadkeys(self):
+        self.assertEqual(mercator_cell(0, 0, 1), (1, 1))
+        self.assertEqual(mercator_cell(90, -180, 1), (0, 0))
+        # Kyiv, at zoom 10, is tile 598 / 345 on every slippy map.
+        self.assertEqual(mercator_cell(50.45, 30.52, 10), (598, 345))
+        self.assertEqual(quadkey(3, 3, 5), "213")
+        self.assertEqual(quadkey(0, 0, 0), "")
+
+
+class HeatLayerTest(SimpleTestCase):
+    def test_only_changed_tiles_get_new_versions(self):
+        layer = HeatLayer("demand")
+        layer.move(1, 50.45, 30.52)
+        layer.move(2, 40.0, -3.7)
+        kyiv = tuple(value >> (BASE_LEVEL - 10) for value in mercator_cell(50.45, 30.52))
+        madrid = tuple(value >> (BASE_LEVEL - 10) for value in mercator_cell(40.0, -3.7))
+        kyiv_tile = tuple(value >> HEATMAP_TILE_BITS for value in kyiv)
+        madrid_tile = tuple(value >> HEATMAP_TILE_BITS for value in madrid)
+
+        self.assertEqual(sum(layer.tile(0, 0, 0)[1].values()), 2)
+        self.assertEqual(sum(layer.tile(10 - HEATMAP_TILE_BITS, *kyiv_tile)[1].values()), 1)
+
+        madrid_version = layer.version(10 - HEATMAP_TILE_BITS, *madrid_tile)
+        layer.move(1, 50.46, 30.53)
+        layer.move(1, 50.46, 30.53)
+        self.assertEqual(layer.version(10 - HEATMAP_TILE_BITS, *madrid_tile), madrid_version)
+
+        version = layer.version(0, 0, 0)
+        layer.sync({1: (50.46, 30.53)})
+        self.assertGreater(layer.version(0, 0, 0), version)
+        self.assertEqual(sum(layer.tile(0, 0, 0)[1].values()), 1)
+        self.assertEqual(layer.tile(10 - HEATMAP_TILE_BITS, *madrid_tile)[1], {})
+        self.assertGreater(layer.version(10 - HEATMAP_TILE_BITS, *madrid_tile), madrid_version)
+
+        layer.remove(1)
+        layer.remove(1)
+        self.assertEqual(layer.tile(0, 0, 0)[1], {})
+        self.assertEqual(layer.tile(3, 1, 1), (0, {}))
+
+
+class HeatmapEtagTest(SimpleTestCase):
+    def test_workers_with_the_same_counts_agree(self):
+        first, second = Heatmap(), Heatmap()
+        first.layers["demand"].move(1, 40.42, -3.70)
+        first.layers["demand"].move(1, 50.45, 30.52)
+        second.layers["demand"].move(1, 50.45, 30.52)
+
+        self.assertNotEqual(first.layers["demand"].version(0, 0, 0), second.layers["demand"].version(0, 0, 0))
+        self.assertEqual(first.etag("demand", 0, 0, 0), second.etag("demand", 0, 0, 0))
+        self.assertEqual(first.render("demand", 0, 0, 0), second.render("demand", 0, 0, 0))
+
+        second.layers["demand"].move(2, 50.45, 30.52)
+        self.assertNotEqual(first.etag("demand", 0, 0, 0), second.etag("demand", 0, 0, 0))
+
+
+class HeatmapApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+    def setUp(self) -> None:
+        driver_index.clear()
+        heatmap.clear()
+        self.client.force_login(self.user)
+
+    def tearDown(self) -> None:
+        heatmap.clear()
+
+    def cells(self, layer, *tile):
+        return sum(count for _, _, count in self.client.get(tile_url(layer, *tile)).json()["cells"])
+
+    def test_tiles_follow_events_and_revalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                API_RIDE_REQUEST_URL,
+                json.dumps({"pickup_latitude": 50.45, "pickup_longitude": 30.52}),
+                content_type="application/json",
+            )
+        ride = response.json()["data"]["id"]
+
+        self.assertEqual(self.cells("demand", 0, 0, 0), 1)
+
+        response = self.client.get(tile_url("demand", 0, 0, 0))
+        etag = response["ETag"]
+        self.assertEqual(response.json()["size"], 1 << HEATMAP_TILE_BITS)
+        self.assertEqual(
+            self.client.get(tile_url("demand", 0, 0, 0), HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(tile_url("demand", 0, 0, 0), HTTP_IF_NONE_MATCH=f"W/{etag}").status_code, 304
+        )
+
+        heatmap.handle("ride.status", {"ride": ride, "status": Ride.ASSIGNED, "driver": self.user.pk})
+        response = self.client.get(tile_url("demand", 0, 0, 0), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["cells"], [])
+
+        heatmap.handle(
+            "driver.location",
+            {"driver": self.user.pk, "latitude": 50.45, "longitude": 30.52, "available": True},
+        )
+        self.assertEqual(self.cells("supply", 0, 0, 0), 1)
+
+    def test_resync_and_bad_tiles(self):
+        Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52)
+        heatmap.sync(force=True)
+
+        self.assertEqual(self.cells("demand", 0, 0, 0), 1)
+        self.assertEqual(self.client.get(tile_url("traffic", 0, 0, 0)).status_code, 404)
+        self.assertEqual(self.client.get(tile_url("demand", 1, 2, 0)).status_code, 404)
+        self.assertEqual(self.client.get(tile_url("demand", 16, 0, 0)).status_code, 404)
+        self.assertEqual(self.client.get(HEATMAP_URL).status_code, 200)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(tile_url("demand", 0, 0, 0)).status_code, 401)
+        self.assertNotEqual(self.client.get(HEATMAP_URL).status_code, 200)
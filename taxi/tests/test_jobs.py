@@ -0,0 +1,139 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from taxi import jobs
+from taxi.cache import invalidate_fleet_cache
+from taxi.jobs import claim, enqueue, run, run_pending
+from taxi.models import Car, Job, Manufacturer
+
+
+class JobQueueTest(TestCase):
+    def setUp(self) -> None:
+        self.audi = Manufacturer.objects.create(name="Audi", country="Germany")
+        self.driver = get_user_model().objects.create_user(
+            username="test_driver",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+        for number in range(5):
+            Car.objects.create(model=f"A{number}", manufacturer=self.audi).drivers.add(self.driver)
+
+    def test_delete_manufacturer_in_batches(self):
+        job = enqueue("delete_manufacturer", {"manufacturer_id": self.audi.pk})
+
+        with mock.patch.object(jobs, "JOB_BATCH_SIZE", 2):
+            run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual((job.progress, job.total), (5, 5))
+        self.assertEqual(job.result, {"deleted_cars": 5})
+        self.assertFalse(Manufacturer.objects.exists())
+        self.assertFalse(Car.drivers.through.objects.exists())
+
+    def test_failed_job_is_retried_then_failed(self):
+        job = enqueue("delete_manufacturer", {"manufacturer_id": self.audi.pk}, max_attempts=2)
+
+        with mock.patch.object(Car.drivers.through.objects, "using", side_effect=RuntimeError("boom")):
+            run(claim())
+
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertIn("boom", job.error)
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertIsNone(claim())
+
+            Job.objects.update(run_after=timezone.now())
+            run(claim())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_expired_lease_is_claimed_again(self):
+        job = enqueue("delete_manufacturer", {"manufacturer_id": self.audi.pk})
+        claim()
+
+        self.assertIsNone(claim())
+
+        Job.objects.update(locked_at=timezone.now() - jobs.JOB_LEASE - timedelta(seconds=1))
+
+        self.assertEqual(claim(), job)
+
+    def test_sync_drivers_job(self):
+        job = enqueue(
+            "sync_drivers",
+            {"records": [{"license_number": "AAA00002", "username": "driver2"}]},
+        )
+
+        run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {"summary": {"created": 1}})
+
+    def test_export_cars_job(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOB_EXPORT_DIR=directory):
+            job = enqueue("export_cars", {"filters": {"model": "A1"}})
+            run_pending()
+
+            job.refresh_from_db()
+            self.assertEqual(job.result, {"rows": 1, "filename": f"cars-{job.pk}.csv"})
+
+            car = Car.objects.get(model="A1")
+
+            with open(jobs.export_path(job)) as export:
+                self.assertEqual(export.read().splitlines()[1], f"{car.pk},A1,Audi,Germany,1")
+
+
+class JobViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        cls.audi = Manufacturer.objects.create(name="Audi", country="Germany")
+        Car.objects.bulk_create(
+            Car(model=f"A{number}", manufacturer=cls.audi) for number in range(3)
+        )
+
+    def setUp(self) -> None:
+        invalidate_fleet_cache()
+        self.client.force_login(self.user)
+
+    @mock.patch("taxi.views.INLINE_DELETE_LIMIT", 2)
+    def test_large_manufacturer_delete_is_queued(self):
+        url = reverse("taxi:manufacturer-delete", kwargs={"pk": self.audi.pk})
+
+        response = self.client.post(url)
+        job = Job.objects.get()
+
+        self.assertRedirects(response, job.get_absolute_url())
+        self.assertEqual(job.created_by, self.user)
+        self.assertTrue(Manufacturer.objects.exists())
+
+        self.client.post(url)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_jobs_are_private_to_their_creator(self):
+        other = get_user_model().objects.create_user(
+            username="other",
+            password="test_password",
+            license_number="AAA00002",
+        )
+        own = enqueue("delete_manufacturer", {"manufacturer_id": self.audi.pk}, user=self.user)
+        foreign = enqueue("delete_manufacturer", {"manufacturer_id": self.audi.pk}, user=other)
+
+        response = self.client.get(reverse("taxi:job-list"))
+
+        self.assertEqual(list(response.context["job_list"]), [own])
+        self.assertEqual(self.client.get(foreign.get_absolute_url()).status_code, 404)
+        self.assertContains(self.client.get(own.get_absolute_url()), 'http-equiv="refresh"')
@@ -0,0 +1,174 @@
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from taxi.locations import SpatialIndex, distance_km, driver_index, record_pings
+from taxi.models import DriverLocation
+from taxi.tokens import create_token
+
+API_LOCATIONS_URL = reverse("taxi:api-driver-locations")
+API_NEAREST_URL = reverse("taxi:api-driver-nearest")
+
+
+class SpatialIndexTest(SimpleTestCase):
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(1)
+        index = SpatialIndex(cell_degrees=0.01)
+        points = {
+            key: (50.45 + rng.uniform(-0.1, 0.1), 30.52 + rng.uniform(-0.1, 0.1))
+            for key in range(2000)
+        }
+
+        for key, (latitude, longitude) in points.items():
+            index.update(key, latitude, longitude, 0)
+
+        for _ in range(50):
+            latitude, longitude = 50.45 + rng.uniform(-0.15, 0.15), 30.52 + rng.uniform(-0.15, 0.15)
+            expected = sorted(
+                (distance_km(latitude, longitude, *point), key) for key, point in points.items()
+            )[:5]
+
+            self.assertEqual(
+                [key for _, key in index.nearest(latitude, longitude, k=5)],
+                [key for _, key in expected],
+            )
+
+    def test_moves_removals_and_limits(self):
+        index = SpatialIndex()
+        index.update("near", 50.45, 30.52, 100)
+        index.update("far", 50.60, 30.52, 100)
+        index.update("old", 50.451, 30.52, 10)
+
+        self.assertEqual([key for _, key in index.nearest(50.45, 30.52, k=2, since=50)], ["near", "far"])
+        self.assertEqual([key for _, key in index.nearest(50.45, 30.52, max_distance_km=5)], ["near", "old"])
+
+        index.update("far", 50.4501, 30.52, 100)
+        index.remove("near")
+
+        self.assertEqual(
+            [key for _, key in index.nearest(50.45, 30.52, k=1, since=50)], ["far"]
+        )
+        self.assertEqual(len(index), 2)
+
+
+class RecordPingsTest(TestCase):
+    def setUp(self) -> None:
+        driver_index.clear()
+        self.driver = get_user_model().objects.create_user(
+            username="test_driver",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+    def test_newest_ping_wins(self):
+        now = timezone.now()
+        summary, errors = record_pings([
+            {"driver": self.driver.pk, "latitude": 50.4, "longitude": 30.5, "timestamp": now.isoformat()},
+            {
+                "driver": self.driver.pk,
+                "latitude": 50.3,
+                "longitude": 30.5,
+                "timestamp": (now - timedelta(seconds=5)).timestamp(),
+            },
+            {"driver": 0, "latitude": 50.4, "longitude": 30.5},
+            {"driver": self.driver.pk, "latitude": 91, "longitude": 30.5},
+        ])
+
+        self.assertEqual(summary, {"accepted": 1, "stale": 1, "invalid": 2})
+        self.assertEqual([error.get("index") for error in errors], [3, None])
+        self.assertEqual(DriverLocation.objects.get().latitude, 50.4)
+
+        summary, _ = record_pings([
+            {
+                "driver": self.driver.pk,
+                "latitude": 50.3,
+                "longitude": 30.5,
+                "timestamp": (now - timedelta(seconds=1)).isoformat(),
+            },
+        ])
+
+        self.assertEqual(summary["stale"], 1)
+        self.assertEqual(DriverLocation.objects.get().latitude, 50.4)
+
+    def test_index_follows_pings_and_database(self):
+        record_pings([{"driver": self.driver.pk, "latitude": 50.45, "longitude": 30.52}])
+
+        self.assertEqual(driver_index.nearest(50.45, 30.52)[0][1], self.driver.pk)
+
+        record_pings([
+            {"driver": self.driver.pk, "latitude": 50.45, "longitude": 30.52, "available": False}
+        ])
+
+        self.assertEqual(driver_index.nearest(50.45, 30.52), [])
+
+        # Stored by another process.
+        DriverLocation.objects.filter(driver=self.driver).update(
+            is_available=True, recorded_at=timezone.now(), updated_at=timezone.now()
+        )
+        driver_index.refresh(force=True)
+
+        self.assertEqual(driver_index.nearest(50.45, 30.52)[0][1], self.driver.pk)
+
+
+class LocationApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        cls.other = get_user_model().objects.create_user(
+            username="other",
+            password="test_password",
+            license_number="AAA00002",
+        )
+
+    def setUp(self) -> None:
+        driver_index.clear()
+        self.client.force_login(self.user)
+
+    def post_pings(self, pings):
+        return self.client.post(API_LOCATIONS_URL, json.dumps({"pings": pings}), content_type="application/json")
+
+    def test_driver_reports_own_location(self):
+        response = self.post_pings([{"latitude": 50.45, "longitude": 30.52}])
+
+        self.assertEqual(response.json()["summary"]["accepted"], 1)
+        self.assertEqual(DriverLocation.objects.get().driver, self.user)
+        self.assertEqual(
+            self.post_pings([{"driver": self.other.pk, "latitude": 50.45, "longitude": 30.52}]).status_code,
+            403,
+        )
+
+    def test_device_reports_with_token(self):
+        response = Client(enforce_csrf_checks=True).post(
+            API_LOCATIONS_URL,
+            json.dumps([{"latitude": 50.45, "longitude": 30.52}]),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {create_token(self.user, 'phone')}",
+        )
+
+        self.assertEqual(response.json()["summary"]["accepted"], 1)
+        self.assertEqual(DriverLocation.objects.get().driver, self.user)
+
+    def test_nearest_drivers(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.post_pings([
+            {"driver": self.user.pk, "latitude": 50.46, "longitude": 30.52},
+            {"driver": self.other.pk, "latitude": 50.451, "longitude": 30.52},
+        ])
+
+        response = self.client.get(API_NEAREST_URL, {"latitude": 50.45, "longitude": 30.52, "k": 1})
+
+        self.assertEqual(
+            response.json(),
+            {"data": [{"id": self.other.pk, "username": "other", "distance_km": 0.111}]},
+        )
+        self.assertEqual(self.client.get(API_NEAREST_URL, {"latitude": "x"}).status_code, 400)
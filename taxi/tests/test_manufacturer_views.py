@@ -2,7 +2,8 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 
-from taxi.models import Manufacturer
+from taxi.cache import invalidate_fleet_cache
+from taxi.models import Car, Manufacturer
 
 MANUFACTURER_LIST_VIEW_URL = reverse("taxi:manufacturer-list")
 MANUFACTURER_CREATE_VIEW_URL = reverse("taxi:manufacturer-create")
@@ -22,12 +23,12 @@ class PublicManufacturerTest(TestCase):
 
 
 class PrivateManufacturerTest(TestCase):
-    def setUp(self) -> None:
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             username="test_user",
             password="test_password"
         )
-        self.client.force_login(self.user)
 
         number_of_manufacturers = 3
         for num in range(number_of_manufacturers):
@@ -36,6 +37,11 @@ class PrivateManufacturerTest(TestCase):
                 country=f"Country {num}"
             )
 
+    def setUp(self) -> None:
+        # Pages cached by earlier tests may show their rolled back changes.
+        invalidate_fleet_cache()
+        self.client.force_login(self.user)
+
     # ManufacturerListView section tests
 
     def test_pagination_is_two(self):
@@ -135,3 +141,68 @@ class PrivateManufacturerTest(TestCase):
         manufacturers_count_after_delete = Manufacturer.objects.count()
 
         self.assertEqual(manufacturers_count_before_delete-1, manufacturers_count_after_delete)
+
+
+class ManufacturerStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        driver = get_user_model().objects.create_user(
+            username="test_driver",
+            password="test_password",
+            license_number="AAA00002",
+        )
+
+        cls.audi = Manufacturer.objects.create(name="Audi", country="Germany")
+        cls.bmw = Manufacturer.objects.create(name="BMW", country="Germany")
+
+        for model in ("A4", "A6"):
+            Car.objects.create(model=model, manufacturer=cls.audi).drivers.add(cls.user, driver)
+        Car.objects.create(model="X5", manufacturer=cls.bmw)
+
+    def setUp(self) -> None:
+        invalidate_fleet_cache()
+        self.client.force_login(self.user)
+
+    def test_list_has_fleet_stats(self):
+        response = self.client.get(MANUFACTURER_LIST_VIEW_URL)
+        stats = {
+            manufacturer.name: (manufacturer.num_cars, manufacturer.num_drivers)
+            for manufacturer in response.context["manufacturer_list"]
+        }
+
+        self.assertEqual(stats, {"Audi": (2, 2), "BMW": (1, 0)})
+
+    def test_list_ordering_by_stats(self):
+        response = self.client.get(MANUFACTURER_LIST_VIEW_URL + "?ordering=-num_cars")
+        names = [manufacturer.name for manufacturer in response.context["manufacturer_list"]]
+
+        self.assertEqual(names, ["Audi", "BMW"])
+
+        response = self.client.get(MANUFACTURER_LIST_VIEW_URL + "?ordering=num_drivers")
+        names = [manufacturer.name for manufacturer in response.context["manufacturer_list"]]
+
+        self.assertEqual(names, ["BMW", "Audi"])
+
+    def test_list_ignores_unknown_ordering(self):
+        response = self.client.get(MANUFACTURER_LIST_VIEW_URL + "?ordering=password")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_manufacturer_detail(self):
+        response = self.client.get(
+            reverse("taxi:manufacturer-detail", kwargs={"pk": self.audi.pk})
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "taxi/manufacturer_detail.html")
+        self.assertEqual(response.context["manufacturer"].num_cars, 2)
+        self.assertEqual(response.context["manufacturer"].num_drivers, 2)
+        self.assertEqual(
+            [car.num_drivers for car in response.context["car_list"]],
+            [2, 2]
+        )
@@ -0,0 +1,111 @@
+import itertools
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from taxi.ratelimit import BucketStore, buckets, take_token
+
+CAR_LIST_VIEW_URL = reverse("taxi:car-list")
+DRIVER_LIST_VIEW_URL = reverse("taxi:driver-list")
+
+
+class TokenBucketTest(TestCase):
+    def setUp(self) -> None:
+        buckets.clear()
+
+    def test_burst_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(take_token("bucket", 1, 3, now=100.0), 0)
+
+        self.assertAlmostEqual(take_token("bucket", 1, 3, now=100.0), 1.0)
+        self.assertEqual(take_token("bucket", 1, 3, now=101.0), 0)
+
+    def test_concurrent_requests_share_the_burst(self):
+        # Each thread gets its own store and connection, like separate processes.
+        with tempfile.TemporaryDirectory() as directory:
+            allowed = []
+
+            def take():
+                store = BucketStore()
+
+                for _ in range(20):
+                    if not store.take("bucket", 0.001, 30, now=100.0):
+                        allowed.append(1)
+
+            with override_settings(RATE_LIMIT_DB=os.path.join(directory, "buckets.sqlite3")):
+                threads = [threading.Thread(target=take) for _ in range(8)]
+
+                for thread in threads:
+                    thread.start()
+
+                for thread in threads:
+                    thread.join()
+
+        self.assertEqual(len(allowed), 30)
+
+    def test_full_buckets_are_pruned(self):
+        store = BucketStore()
+        store.take("old", 1, 3, now=100.0)
+        store.pruned_at = None
+        store.take("new", 1, 3, now=200.0)
+
+        self.assertEqual(
+            [key for key, in store.connection.execute("SELECT key FROM bucket")], ["new"]
+        )
+
+
+@override_settings(
+    RATE_LIMIT_PER_USER=(1, 2),
+    RATE_LIMIT_PER_ROUTE={"taxi:driver-list": (1, 3)},
+    LOAD_SHED_LATENCY=None,
+)
+class OverloadProtectionMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        buckets.clear()
+
+        self.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        self.client.force_login(self.user)
+
+    def test_per_user_limit(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(CAR_LIST_VIEW_URL).status_code, 200)
+
+        response = self.client.get(CAR_LIST_VIEW_URL)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_per_route_limit_is_shared(self):
+        other = get_user_model().objects.create_user(
+            username="other_user",
+            password="test_password",
+            license_number="AAA00002",
+        )
+
+        self.client.get(DRIVER_LIST_VIEW_URL)
+        self.client.get(DRIVER_LIST_VIEW_URL)
+        self.client.force_login(other)
+        self.client.get(DRIVER_LIST_VIEW_URL)
+
+        self.assertEqual(self.client.get(DRIVER_LIST_VIEW_URL).status_code, 429)
+
+    @override_settings(LOAD_SHED_LATENCY=0.5, RATE_LIMIT_PER_USER=None)
+    def test_slow_route_is_shed(self):
+        # Anything else timing itself during the request sees the later time.
+        with mock.patch("taxi.middleware.time.monotonic", side_effect=itertools.chain([0], itertools.repeat(10))):
+            self.client.get(CAR_LIST_VIEW_URL)
+
+        with mock.patch("taxi.middleware.random.random", return_value=0):
+            response = self.client.get(CAR_LIST_VIEW_URL)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
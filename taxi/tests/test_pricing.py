@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from taxi.locations import driver_index, record_pings
+from taxi.models import Ride
+from taxi.pricing import compute_surge, surge_pricer
+
+API_SURGE_URL = reverse("taxi:api-surge")
+API_RIDE_REQUEST_URL = reverse("taxi:api-ride-request")
+
+
+class ComputeSurgeTest(SimpleTestCase):
+    def test_multipliers_follow_demand_and_supply(self):
+        busy = (50.455, 30.525)
+        quiet = (50.505, 30.525)
+        snapshot = compute_surge(
+            [busy] * 12 + [quiet] * 2,
+            [busy] * 2 + [quiet] * 5,
+        )
+
+        self.assertGreater(snapshot.multiplier(*busy), 1.5)
+        self.assertLessEqual(snapshot.multiplier(*busy), 3.0)
+        self.assertEqual(snapshot.multiplier(*quiet), 1.0)
+        self.assertEqual(snapshot.multiplier(10.0, 10.0), 1.0)
+        self.assertEqual([zone[:2] for zone in snapshot.surging()], [(5045, 3052)])
+        self.assertFalse(snapshot.multipliers.flags.writeable)
+
+    def test_neighbouring_drivers_and_previous_ratios_damp_surge(self):
+        requests = [(50.455, 30.525)] * 8
+        alone = compute_surge(requests, [])
+        helped = compute_surge(requests, [(50.465, 30.525)] * 40)
+
+        self.assertLess(helped.ratios.max(), alone.ratios.max())
+
+        smoothed = compute_surge(requests, [], previous=helped)
+
+        self.assertAlmostEqual(
+            smoothed.ratios.max(), (alone.ratios.max() + helped.ratios.max()) / 2
+        )
+        self.assertEqual(compute_surge([], [(50.45, 30.52)]).multiplier(50.45, 30.52), 1.0)
+
+    def test_refuses_country_wide_grids(self):
+        with self.assertRaises(ValueError):
+            compute_surge(np.array([(50.45, 30.52), (40.0, 10.0)]), [])
+
+
+class SurgeApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+
+    def setUp(self) -> None:
+        driver_index.clear()
+        surge_pricer.clear()
+        self.client.force_login(self.user)
+
+    def tearDown(self) -> None:
+        surge_pricer.clear()
+
+    def test_requests_are_priced_with_the_current_snapshot(self):
+        record_pings([{"driver": self.user.pk, "latitude": 50.455, "longitude": 30.525}])
+        Ride.objects.bulk_create(
+            Ride(pickup_latitude=50.455, pickup_longitude=30.525) for _ in range(10)
+        )
+        surge_pricer.refresh()
+
+        response = self.client.post(
+            API_RIDE_REQUEST_URL,
+            json.dumps({"pickup_latitude": 50.455, "pickup_longitude": 30.525}),
+            content_type="application/json",
+        )
+        multiplier = response.json()["data"]["surge_multiplier"]
+
+        self.assertGreater(multiplier, 1.0)
+        self.assertEqual(
+            self.client.get(API_SURGE_URL, {"latitude": 50.455, "longitude": 30.525}).json()["data"]["multiplier"],
+            multiplier,
+        )
+        self.assertEqual(
+            self.client.get(API_SURGE_URL).json()["data"],
+            [{"south": 50.45, "west": 30.52, "multiplier": multiplier}],
+        )
+        self.assertEqual(self.client.get(API_SURGE_URL, {"latitude": "x"}).status_code, 400)
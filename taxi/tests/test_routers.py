@@ -0,0 +1,70 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from taxi.middleware import PRIMARY_PIN_COOKIE, ReplicaRoutingMiddleware
+from taxi.models import Car
+from taxi.routers import ReplicaRouter, read_replica
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.routed = []
+
+        def view(request):
+            self.routed.append(self.router.db_for_read(Car))
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(view)
+
+    def test_reads_use_primary_outside_requests(self):
+        self.assertEqual(self.router.db_for_read(Car), "default")
+        self.assertEqual(self.router.db_for_write(Car), "default")
+
+    def test_reads_use_replica_when_allowed(self):
+        token = read_replica.set("replica1")
+
+        try:
+            self.assertEqual(self.router.db_for_read(Car), "replica1")
+            self.assertEqual(self.router.db_for_write(Car), "default")
+        finally:
+            read_replica.reset(token)
+
+    def test_only_default_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "taxi"))
+        self.assertFalse(self.router.allow_migrate("replica1", "taxi"))
+
+    def test_safe_request_reads_from_replica(self):
+        response = self.middleware(self.factory.get("/cars/"))
+
+        self.assertEqual(self.routed, ["replica1"])
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+        self.assertIsNone(read_replica.get())
+
+    @override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+    def test_request_reads_from_one_replica(self):
+        def view(request):
+            self.routed.extend(self.router.db_for_read(Car) for _ in range(20))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+
+        for _ in range(10):
+            self.routed.clear()
+            middleware(self.factory.get("/cars/"))
+
+            self.assertEqual(len(set(self.routed)), 1)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.middleware(self.factory.post("/cars/create/"))
+
+        self.assertEqual(self.routed, ["default"])
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        request = self.factory.get("/cars/")
+        request.COOKIES[PRIMARY_PIN_COOKIE] = "1"
+        self.middleware(request)
+
+        self.assertEqual(self.routed, ["default", "default"])
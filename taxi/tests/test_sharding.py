@@ -0,0 +1,170 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from taxi.management.commands.rebalance_shards import move_manufacturer, plan_moves
+from taxi.models import Car, Manufacturer
+from taxi.sharding import ScatterGather, shard_map
+
+
+class FakeCar:
+    def __init__(self, model, pk):
+        self.model = model
+        self.pk = pk
+
+
+class FakeQuerySet(list):
+    model = FakeCar
+
+    def using(self, alias):
+        return FakeQuerySet(car for car in self if car.model.startswith(alias))
+
+    def order_by(self, *fields):
+        return FakeQuerySet(sorted(self, key=lambda car: (car.model, car.pk)))
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, index):
+        result = super().__getitem__(index)
+
+        return FakeQuerySet(result) if isinstance(index, slice) else result
+
+
+@override_settings(DATABASE_SHARDS=["a", "b"])
+class ScatterGatherTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.cars = ScatterGather(
+            FakeQuerySet([
+                FakeCar("b2", 1), FakeCar("a1", 2), FakeCar("a3", 3), FakeCar("b1", 4)
+            ]),
+            ("model", "pk"),
+        )
+
+    def test_count_sums_shards(self):
+        self.assertEqual(self.cars.count(), 4)
+
+    def test_slices_are_merged_in_order(self):
+        self.assertEqual([car.model for car in self.cars[0:2]], ["a1", "a3"])
+        self.assertEqual([car.model for car in self.cars[2:4]], ["b1", "b2"])
+        self.assertEqual(self.cars[1].model, "a3")
+
+
+class PlanMovesTest(SimpleTestCase):
+    def test_moves_narrow_the_gap(self):
+        loads = {"shard1": {1: 500, 2: 250, 3: 50}, "shard2": {4: 100}}
+
+        moves = plan_moves(loads, tolerance=100)
+
+        self.assertEqual(
+            moves,
+            [(2, "shard1", "shard2", 250), (3, "shard1", "shard2", 50)]
+        )
+
+    def test_balanced_shards_are_left_alone(self):
+        self.assertEqual(plan_moves({"shard1": {1: 100}, "shard2": {2: 80}}, tolerance=50), [])
+
+
+@skipUnless(
+    len(settings.DATABASE_SHARDS) >= 2,
+    "Set DATABASE_SHARD_URLS to at least two databases to run sharding tests.",
+)
+class ShardedFleetTest(TestCase):
+    databases = "__all__"
+
+    def setUp(self) -> None:
+        shard_map.clear()
+
+        self.user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        self.client.force_login(self.user)
+        self.first_shard, self.second_shard = settings.DATABASE_SHARDS[:2]
+
+        self.audi = Manufacturer.objects.create(name="Audi", country="Germany")
+        self.bmw = Manufacturer.objects.create(name="BMW", country="Germany")
+
+        for manufacturer, shard in ((self.audi, self.first_shard), (self.bmw, self.second_shard)):
+            current = shard_map.shard_for(manufacturer.pk)
+
+            if current != shard:
+                move_manufacturer(manufacturer.pk, current, shard)
+
+        for model in ("A4", "Q7"):
+            Car.objects.create(model=model, manufacturer=self.audi).drivers.add(self.user)
+        Car.objects.create(model="X5", manufacturer=self.bmw)
+
+    def test_cars_are_placed_on_manufacturer_shard(self):
+        self.assertEqual(Car.objects.using(self.first_shard).count(), 2)
+        self.assertEqual(Car.objects.using(self.second_shard).count(), 1)
+        self.assertEqual(
+            Car.drivers.through.objects.using(self.first_shard).count(), 2
+        )
+
+    def test_car_list_merges_shards(self):
+        response = self.client.get(reverse("taxi:car-list") + "?page=2")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["paginator"].count, 3)
+        self.assertEqual([car.model for car in response.context["car_list"]], ["X5"])
+
+    def test_car_detail_finds_car_on_any_shard(self):
+        car = Car.objects.using(self.second_shard).get()
+
+        response = self.client.get(reverse("taxi:car-detail", kwargs={"pk": car.pk}))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_car_api_reads_every_shard(self):
+        response = self.client.get(reverse("taxi:api-car-list") + "?limit=2&include=drivers")
+        payload = response.json()
+
+        self.assertEqual([car["model"] for car in payload["data"]], ["A4", "Q7"])
+        self.assertEqual([car["drivers"] for car in payload["data"]], [[self.user.pk]] * 2)
+        self.assertEqual([driver["id"] for driver in payload["included"]["drivers"]], [self.user.pk])
+
+        payload = self.client.get(payload["next"]).json()
+
+        self.assertEqual([car["model"] for car in payload["data"]], ["X5"])
+        self.assertIsNone(payload["next"])
+
+    def test_car_api_detail_finds_car_on_any_shard(self):
+        car = Car.objects.using(self.second_shard).get()
+
+        response = self.client.get(reverse("taxi:api-car-detail", kwargs={"pk": car.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["model"], "X5")
+
+    def test_manufacturer_api_includes_sharded_cars(self):
+        response = self.client.get(
+            reverse("taxi:api-manufacturer-detail", kwargs={"pk": self.audi.pk}) + "?include=cars"
+        )
+
+        self.assertEqual(
+            sorted(car["model"] for car in response.json()["included"]["cars"]), ["A4", "Q7"]
+        )
+
+    def test_manufacturer_stats_gathered_from_shards(self):
+        response = self.client.get(reverse("taxi:manufacturer-list"))
+        stats = {
+            manufacturer.name: (manufacturer.num_cars, manufacturer.num_drivers)
+            for manufacturer in response.context["manufacturer_list"]
+        }
+
+        self.assertEqual(stats, {"Audi": (2, 1), "BMW": (1, 0)})
+
+    def test_move_manufacturer(self):
+        move_manufacturer(self.audi.pk, self.first_shard, self.second_shard)
+
+        self.assertEqual(Car.objects.using(self.first_shard).count(), 0)
+        self.assertEqual(Car.objects.using(self.second_shard).count(), 3)
+        self.assertEqual(shard_map.shard_for(self.audi.pk), self.second_shard)
+        self.assertEqual(
+            Car.drivers.through.objects.using(self.second_shard).count(), 2
+        )
@@ -0,0 +1,210 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from taxi.locations import driver_index, record_pings
+from taxi.dispatch import dispatch_batch, driver_cars
+from taxi.models import Car, Manufacturer, Ride, Shift
+from taxi.shifts import ROSTER_MIN_REST, ShiftIndex, book_shifts, shift_schedule, weekly_roster
+from taxi.tokens import create_token
+
+API_SHIFT_BOOKING_URL = reverse("taxi:api-shift-booking")
+API_CAR_FREE_URL = reverse("taxi:api-car-free")
+
+
+class ShiftIndexTest(SimpleTestCase):
+    def test_half_open_intervals(self):
+        index = ShiftIndex()
+        index.add(1, 10, 100, 0, 8)
+        index.add(2, 11, 100, 16, 24)
+        index.add(3, 10, 101, 8, 16)
+
+        self.assertEqual(index.cars[100].at(0), (1, 10))
+        self.assertIsNone(index.cars[100].at(8))
+        self.assertEqual(index.cars[100].at(23.5), (2, 11))
+        self.assertIsNone(index.clash(12, 100, 8, 16))
+        self.assertEqual(index.clash(12, 100, 7, 9), "car")
+        self.assertEqual(index.clash(10, 102, 15, 17), "driver")
+        self.assertIsNone(index.clash(10, 102, 16, 20))
+
+
+class ShiftScheduleTest(TestCase):
+    def setUp(self) -> None:
+        shift_schedule.clear()
+        self.drivers = [
+            get_user_model().objects.create_user(
+                username=f"driver{number}", password="test_password", license_number=f"AAA0000{number}"
+            )
+            for number in range(4)
+        ]
+        manufacturer = Manufacturer.objects.create(name="Skoda", country="Czechia")
+        self.cars = [Car.objects.create(model=f"Octavia {number}", manufacturer=manufacturer) for number in range(2)]
+        self.start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+
+    def tearDown(self) -> None:
+        shift_schedule.clear()
+
+    def shift(self, driver, car, hours, length=8):
+        return Shift(
+            driver=self.drivers[driver],
+            car=self.cars[car],
+            starts_at=self.start + timedelta(hours=hours),
+            ends_at=self.start + timedelta(hours=hours + length),
+        )
+
+    def test_overlapping_shifts_are_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book_shifts([self.shift(0, 0, 0), self.shift(1, 0, 8)])
+
+        for shifts in (
+            [self.shift(2, 0, 4)],  # the car is taken
+            [self.shift(0, 1, 7)],  # the driver is busy
+            [self.shift(2, 1, 0), self.shift(3, 1, 4)],  # within the batch
+            [self.shift(2, 1, 0, length=13)],
+        ):
+            with self.assertRaises(ValidationError):
+                book_shifts(shifts)
+
+        # Large bookings are checked against the rebuilt index instead.
+        with self.assertRaises(ValidationError):
+            book_shifts([self.shift(2, 1, 100 + hours * 8) for hours in range(25)] + [self.shift(3, 0, 12)])
+
+        self.assertEqual(Shift.objects.count(), 2)
+
+        with self.assertRaises(ValidationError):
+            self.shift(2, 0, 12).full_clean()
+
+        self.shift(2, 0, 16).full_clean()
+
+    def test_lookups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first, second = book_shifts([self.shift(0, 0, 0), self.shift(1, 0, 8)])
+
+        self.assertEqual(shift_schedule.driver_at(self.cars[0].pk, self.start + timedelta(hours=9)), (second.pk, self.drivers[1].pk))
+        self.assertIsNone(shift_schedule.driver_at(self.cars[1].pk, self.start))
+        self.assertEqual(
+            shift_schedule.free_cars([car.pk for car in self.cars], self.start, self.start + timedelta(hours=1)),
+            [self.cars[1].pk],
+        )
+        self.assertEqual(shift_schedule.cars_at(self.start), {self.drivers[0].pk: self.cars[0].pk})
+
+        # Before the index's horizon, answers come from the database.
+        past = self.start - timedelta(days=30)
+        Shift.objects.create(driver=self.drivers[2], car=self.cars[1], starts_at=past, ends_at=past + timedelta(hours=8))
+        shift_schedule.clear()
+
+        self.assertEqual(shift_schedule.driver_at(self.cars[1].pk, past)[1], self.drivers[2].pk)
+        self.assertEqual(
+            shift_schedule.free_cars([car.pk for car in self.cars], past, past + timedelta(hours=1)), [self.cars[0].pk]
+        )
+
+    def test_weekly_roster(self):
+        drivers = self.drivers + [
+            get_user_model().objects.create_user(
+                username=f"extra{number}", password="test_password", license_number=f"BBB0000{number}"
+            )
+            for number in range(4)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            book_shifts([self.shift(0, 0, 0)])
+
+        shifts = weekly_roster(self.start, [driver.pk for driver in drivers], [car.pk for car in self.cars])
+        # The existing shift keeps its slot.
+        self.assertEqual(len(shifts), 2 * 21 - 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book_shifts(shifts)
+
+        for driver in drivers:
+            worked = list(Shift.objects.filter(driver=driver).order_by("starts_at"))
+
+            for previous, shift in zip(worked, worked[1:]):
+                self.assertGreaterEqual(shift.starts_at - previous.ends_at, ROSTER_MIN_REST)
+
+
+class ShiftApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="test_user", password="test_password", license_number="AAA00001", is_staff=True
+        )
+        cls.other = get_user_model().objects.create_user(
+            username="other_user", password="test_password", license_number="AAA00002"
+        )
+        manufacturer = Manufacturer.objects.create(name="Skoda", country="Czechia")
+        cls.car = Car.objects.create(model="Octavia", manufacturer=manufacturer)
+
+    def setUp(self) -> None:
+        shift_schedule.clear()
+        driver_index.clear()
+        driver_cars.version = None
+        self.client.force_login(self.user)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def tearDown(self) -> None:
+        shift_schedule.clear()
+
+    def book(self, driver, starts_at, ends_at):
+        return self.client.post(
+            API_SHIFT_BOOKING_URL,
+            json.dumps({"shifts": [{
+                "driver": driver.pk,
+                "car": self.car.pk,
+                "starts_at": starts_at.isoformat(),
+                "ends_at": ends_at.isoformat(),
+            }]}),
+            content_type="application/json",
+        )
+
+    def test_booking_and_lookups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.book(self.other, self.now - timedelta(hours=1), self.now + timedelta(hours=7))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.book(self.user, self.now, self.now + timedelta(hours=1)).status_code, 409)
+        self.assertEqual(self.book(self.user, self.now, self.now - timedelta(hours=1)).status_code, 400)
+
+        driver_url = reverse("taxi:api-car-driver", args=[self.car.pk])
+        self.assertEqual(
+            self.client.get(driver_url).json()["data"], {"shift": response.json()["data"][0], "driver": self.other.pk}
+        )
+        self.assertIsNone(
+            self.client.get(driver_url, {"at": (self.now + timedelta(hours=8)).isoformat()}).json()["data"]["driver"]
+        )
+
+        window = {"starts_at": self.now.timestamp(), "ends_at": (self.now + timedelta(hours=1)).timestamp()}
+        self.assertEqual(self.client.get(API_CAR_FREE_URL, window).json()["data"], [])
+        window = {"starts_at": (self.now + timedelta(hours=7)).isoformat(), "ends_at": (self.now + timedelta(hours=8)).isoformat()}
+        self.assertEqual(self.client.get(API_CAR_FREE_URL, window).json()["data"], [self.car.pk])
+        self.assertEqual(self.client.get(API_CAR_FREE_URL).status_code, 400)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.book(self.other, self.now + timedelta(days=1), self.now + timedelta(days=1, hours=1)).status_code, 403)
+
+    def test_scheduler_books_with_token(self):
+        self.client = Client(enforce_csrf_checks=True, HTTP_AUTHORIZATION=f"Bearer {create_token(self.user, 'rota')}")
+
+        self.assertEqual(self.book(self.other, self.now, self.now + timedelta(hours=1)).status_code, 201)
+
+    def test_dispatch_gives_the_car_to_the_driver_on_shift(self):
+        # Both are attached to the car, only one has the shift.
+        self.car.drivers.add(self.user, self.other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(self.other, self.now - timedelta(hours=1), self.now + timedelta(hours=7))
+
+        record_pings([{"driver": self.user.pk, "latitude": 50.45, "longitude": 30.52}])
+        ride = Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52)
+
+        self.assertEqual(dispatch_batch(), 0)
+
+        record_pings([{"driver": self.other.pk, "latitude": 50.46, "longitude": 30.52}])
+
+        self.assertEqual(dispatch_batch(), 1)
+        ride.refresh_from_db()
+        self.assertEqual((ride.driver_id, ride.car_id), (self.other.pk, self.car.pk))
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from taxi.singleflight import SingleFlight
+
+
+class SingleFlightTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.single_flight = SingleFlight()
+        self.single_flight.cache.clear()
+
+    def test_value_is_cached_per_version(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(self.single_flight.get("key", compute, 60, version=1), 1)
+        self.assertEqual(self.single_flight.get("key", compute, 60, version=1), 1)
+        self.assertEqual(self.single_flight.get("key", compute, 60, version=2), 2)
+        self.assertEqual(self.single_flight.metrics["computed"], 2)
+        self.assertEqual(self.single_flight.metrics["hits"], 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        def worker():
+            results.append(self.single_flight.get("key", compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(self.single_flight.metrics["coalesced"], 4)
+
+    def test_stale_value_served_while_recomputing(self):
+        self.single_flight.get("key", lambda: "old", 60, version=1)
+        started = threading.Event()
+        results = []
+
+        def compute():
+            started.set()
+            time.sleep(0.2)
+            return "new"
+
+        leader = threading.Thread(
+            target=lambda: results.append(self.single_flight.get("key", compute, 60, version=2))
+        )
+        leader.start()
+        started.wait()
+
+        self.assertEqual(self.single_flight.get("key", compute, 60, version=2), "old")
+
+        leader.join()
+
+        self.assertEqual(results, ["new"])
+        self.assertEqual(self.single_flight.metrics["stale"], 1)
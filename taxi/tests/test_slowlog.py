@@ -0,0 +1,58 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from taxi.jsonlog import read_json_lines
+from taxi.slowlog import explained, normalize_sql, redact
+
+CAR_LIST_VIEW_URL = reverse("taxi:car-list")
+
+
+class NormalizeTest(SimpleTestCase):
+    def test_fingerprints_ignore_values(self):
+        self.assertEqual(
+            normalize_sql('SELECT "id" FROM "taxi_car"\n WHERE "id" IN (%s, %s, %s) AND "model" = \'x\' LIMIT 21'),
+            'SELECT "id" FROM "taxi_car" WHERE "id" IN (...) AND "model" = ? LIMIT ?',
+        )
+        self.assertEqual(normalize_sql("SELECT 1 WHERE a IN (%s)"), "SELECT ? WHERE a IN (...)")
+        self.assertEqual([redact(value) for value in (3, None, "secret", b"ab")], [3, None, "<str of 6>", "<bytes of 2>"])
+
+
+class SlowQueryLogTest(TestCase):
+    def test_queries_are_logged_with_route_and_plan(self):
+        explained.clear()
+        user = get_user_model().objects.create_user(
+            username="test_user", password="test_password", license_number="AAA00001"
+        )
+        self.client.force_login(user)
+        middleware = ["taxi.middleware.SlowQueryLogMiddleware"] + list(settings.MIDDLEWARE)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG_DIR=directory, MIDDLEWARE=middleware):
+                self.client.get(CAR_LIST_VIEW_URL)
+                self.client.get(CAR_LIST_VIEW_URL, {"page": 1})
+
+            entries = read_json_lines([os.path.join(directory, "slow-queries-*.jsonl")])
+            output = StringIO()
+            call_command("slow_queries", os.path.join(directory, "*.jsonl"), plans=True, stdout=output)
+
+        routes = {entry["route"] for entry in entries}
+        self.assertEqual(routes, {"taxi:car-list"})
+
+        session_queries = [entry for entry in entries if "django_session" in entry["sql"]]
+        self.assertTrue(all("<str of" in entry["params"][0] for entry in session_queries))
+
+        fingerprints = {entry["fingerprint"] for entry in entries}
+        plans = [entry for entry in entries if "plan" in entry]
+        self.assertEqual(len(plans), len(fingerprints))
+        self.assertTrue(any(entry["plan"] for entry in plans))
+
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines[1].split()[0] in fingerprints)
+        self.assertIn("taxi:car-list", lines[1])
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase
+
+from taxi.management.commands.startup_profile import by_package, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     numpy.core._multiarray_umath
+import time:       300 |        420 |   numpy.core
+import time:        80 |        500 | numpy
+some other output
+import time:        50 |         50 | taxi.urls
+"""
+
+
+class ImportTimeTest(SimpleTestCase):
+    def test_parse_importtime(self):
+        self.assertEqual(
+            parse_importtime(IMPORTTIME),
+            [
+                ("numpy.core._multiarray_umath", 120, 120, 2),
+                ("numpy.core", 300, 420, 1),
+                ("numpy", 80, 500, 0),
+                ("taxi.urls", 50, 50, 0),
+            ],
+        )
+
+    def test_by_package(self):
+        self.assertEqual(by_package(parse_importtime(IMPORTTIME)), {"numpy": 500, "taxi": 50})
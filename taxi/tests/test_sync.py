@@ -0,0 +1,205 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from taxi.models import Driver
+from taxi.sync import sync_drivers
+from taxi.tokens import create_token
+
+API_DRIVER_SYNC_URL = reverse("taxi:api-driver-sync")
+
+
+class SyncDriversTest(TestCase):
+    def setUp(self) -> None:
+        Driver.objects.create(
+            username="existing",
+            first_name="Old",
+            license_number="AAA00001",
+        )
+
+    def test_create_update_and_skip_unchanged(self):
+        records = [
+            {"license_number": "AAA00001", "username": "existing", "first_name": "New"},
+            {"license_number": "AAA00002", "username": "driver2"},
+            {"license_number": "AAA00003", "username": "driver3"},
+        ]
+
+        results = sync_drivers(records, batch_size=2)
+
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["updated", "created", "created"]
+        )
+        self.assertEqual(Driver.objects.get(license_number="AAA00001").first_name, "New")
+        self.assertFalse(Driver.objects.get(license_number="AAA00002").has_usable_password())
+
+        results = sync_drivers(records)
+
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["unchanged", "unchanged", "unchanged"]
+        )
+
+    def test_invalid_records_are_reported(self):
+        records = [
+            {"license_number": "bad", "username": "driver2"},
+            {"license_number": "AAA00002", "username": ""},
+            {"license_number": "AAA00003", "username": "existing"},
+            {"license_number": "AAA00004", "username": "driver4", "email": "nope"},
+            {"license_number": "AAA00005", "username": "driver5"},
+            {"license_number": "AAA00005", "username": "driver6"},
+        ]
+
+        results = sync_drivers(records)
+
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["invalid", "invalid", "invalid", "invalid", "created", "invalid"]
+        )
+        self.assertIn("license_number", results[0]["errors"])
+        self.assertIn("username", results[1]["errors"])
+        self.assertIn("username", results[2]["errors"])
+        self.assertIn("email", results[3]["errors"])
+        self.assertEqual(Driver.objects.count(), 2)
+
+    def test_usernames_moved_within_a_batch_are_rejected(self):
+        Driver.objects.create(username="other", license_number="AAA00002")
+        records = [
+            {"license_number": "AAA00001", "username": "existing2"},
+            {"license_number": "BBB00001", "username": "existing"},
+            {"license_number": "AAA00002", "username": "existing2"},
+        ]
+
+        results = sync_drivers(records)
+
+        self.assertEqual([result["status"] for result in results], ["updated", "invalid", "invalid"])
+        self.assertEqual(Driver.objects.get(license_number="AAA00001").username, "existing2")
+
+        # Once released, the username can be taken.
+        self.assertEqual(sync_drivers(records[1:2])[0]["status"], "created")
+
+    def test_swapped_usernames_are_rejected(self):
+        Driver.objects.create(username="other", license_number="AAA00002")
+
+        results = sync_drivers([
+            {"license_number": "AAA00001", "username": "other"},
+            {"license_number": "AAA00002", "username": "existing"},
+        ])
+
+        self.assertEqual([result["status"] for result in results], ["invalid", "invalid"])
+
+    def test_concurrent_conflicts_are_reported(self):
+        records = [
+            {"license_number": "AAA00001", "username": "existing", "first_name": "Old"},
+            {"license_number": "AAA00002", "username": "driver2"},
+        ]
+
+        with mock.patch.object(Driver.objects, "bulk_create", side_effect=IntegrityError("UNIQUE")):
+            results = sync_drivers(records)
+
+        self.assertEqual([result["status"] for result in results], ["unchanged", "invalid"])
+        self.assertIn("__all__", results[1]["errors"])
+        self.assertFalse(Driver.objects.filter(license_number="AAA00002").exists())
+
+    def test_command_rejects_malformed_feeds(self):
+        for feed in ({"drivers": []}, ["AAA00001"]):
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+                json.dump(feed, file)
+
+            try:
+                with self.assertRaises(CommandError):
+                    call_command("sync_drivers", file.name)
+            finally:
+                os.remove(file.name)
+
+    def test_batch_uses_constant_number_of_queries(self):
+        records = [
+            {"license_number": f"BBB{num:05}", "username": f"driver{num}"}
+            for num in range(50)
+        ]
+
+        # existing lookup, username lookup, one bulk insert, savepoints
+        with self.assertNumQueries(5):
+            sync_drivers(records)
+
+
+class SyncDriversApiTest(TestCase):
+    def test_staff_required(self):
+        user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+        )
+        self.client.force_login(user)
+
+        response = self.client.post(API_DRIVER_SYNC_URL, data="[]", content_type="application/json")
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_sync_drivers(self):
+        user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+            is_staff=True,
+        )
+        self.client.force_login(user)
+
+        response = self.client.post(
+            API_DRIVER_SYNC_URL,
+            data=json.dumps({"drivers": [{"license_number": "AAA00002", "username": "new"}]}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"], {"created": 1})
+        self.assertTrue(Driver.objects.filter(license_number="AAA00002").exists())
+
+    def test_invalid_payload(self):
+        user = get_user_model().objects.create_user(
+            username="test_user",
+            password="test_password",
+            license_number="AAA00001",
+            is_staff=True,
+        )
+        self.client.force_login(user)
+
+        response = self.client.post(API_DRIVER_SYNC_URL, data="{", content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_token_authentication(self):
+        user = get_user_model().objects.create_user(
+            username="hr_feed",
+            password="test_password",
+            license_number="AAA00001",
+            is_staff=True,
+        )
+        client = Client(enforce_csrf_checks=True)
+        payload = json.dumps([{"license_number": "AAA00002", "username": "new"}])
+
+        response = client.post(
+            API_DRIVER_SYNC_URL,
+            data=payload,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {create_token(user, 'hr-feed')}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"], {"created": 1})
+
+        response = client.post(
+            API_DRIVER_SYNC_URL, data=payload, content_type="application/json", HTTP_AUTHORIZATION="Bearer nope"
+        )
+        self.assertEqual(response.status_code, 401)
+
+        # A browser session still needs its CSRF token.
+        client.force_login(user)
+        response = client.post(API_DRIVER_SYNC_URL, data=payload, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
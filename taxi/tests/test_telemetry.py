@@ -0,0 +1,133 @@
+import json
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from taxi.models import Ride, TrackSegment
+from taxi.tokens import create_token
+from taxi.telemetry import (
+    Track,
+    append_points,
+    decode_points,
+    decode_varints,
+    downsample,
+    encode_points,
+    encode_varints,
+    unzigzag,
+    zigzag,
+)
+
+
+class EncodingTest(SimpleTestCase):
+    def test_round_trips(self):
+        values = np.array([0, 1, 127, 128, 300, 2 ** 35, 2 ** 63 - 1], dtype=np.uint64)
+        signed = np.array([0, -1, 1, -64, 64, -(2 ** 40), 2 ** 40])
+
+        self.assertEqual(decode_varints(encode_varints(values)).tolist(), values.tolist())
+        self.assertEqual(len(encode_varints([0, 127, 128])), 4)
+        self.assertEqual(unzigzag(zigzag(signed)).tolist(), signed.tolist())
+
+        points = np.array([[1000, 50450000, 30520000], [2000, 50450012, 30519990]])
+        data = encode_points(points)
+
+        self.assertEqual(decode_points(data).tolist(), points.tolist())
+        self.assertEqual(
+            decode_points(data + encode_points([[3000, 50450000, 30520000]], points[-1])).tolist(),
+            points.tolist() + [[3000, 50450000, 30520000]],
+        )
+
+    def test_downsample_keeps_corners_and_ends(self):
+        points = np.array(
+            [[t, 50.45 + 0.0001 * min(t, 10), 30.52 + 0.0001 * max(t - 10, 0)] for t in range(21)]
+        )
+
+        self.assertEqual(downsample(points, tolerance_m=1)[:, 0].tolist(), [0, 10, 20])
+        self.assertEqual(downsample(points, max_points=3)[:, 0].tolist(), [0, 10, 20])
+        self.assertEqual(len(downsample(points)), 21)
+
+
+class TrackTest(TestCase):
+    def setUp(self) -> None:
+        self.ride = Ride.objects.create(pickup_latitude=50.45, pickup_longitude=30.52)
+
+    def test_append_across_segments(self):
+        with mock.patch("taxi.telemetry.SEGMENT_POINTS", 4):
+            self.assertEqual(append_points(self.ride.pk, [[t, 50.45, 30.52] for t in range(3)]), 3)
+            # Points at or before the stored end are dropped.
+            self.assertEqual(
+                append_points(self.ride.pk, [[1, 50.0, 30.0]] + [[t, 50.46, 30.53] for t in range(3, 9)]),
+                6,
+            )
+
+        self.assertEqual(
+            list(self.ride.track_segments.values_list("start_time", "point_count")),
+            [(0, 4), (4, 4), (8, 1)],
+        )
+
+        track = Track(self.ride.pk)
+
+        self.assertEqual(track.count(), 9)
+        self.assertEqual(track.points()[:, 0].tolist(), list(range(9)))
+        self.assertEqual(track.points()[-1].tolist(), [8, 50.46, 30.53])
+        self.assertEqual(Track(self.ride.pk, since=3, until=5).points()[:, 0].tolist(), [3, 4, 5])
+        self.assertEqual(len(Track(self.ride.pk, since=100).points()), 0)
+
+
+class TelemetryApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver, cls.rider, cls.other = (
+            get_user_model().objects.create_user(
+                username=username, password="test_password", license_number=license_number
+            )
+            for username, license_number in (
+                ("driver", "AAA00001"), ("rider", "AAA00002"), ("other", "AAA00003")
+            )
+        )
+        cls.ride = Ride.objects.create(
+            pickup_latitude=50.45,
+            pickup_longitude=30.52,
+            requested_by=cls.rider,
+            driver=cls.driver,
+            status=Ride.ASSIGNED,
+        )
+        cls.url = reverse("taxi:api-ride-telemetry", kwargs={"pk": cls.ride.pk})
+
+    def post(self, points):
+        return self.client.post(self.url, json.dumps({"points": points}), content_type="application/json")
+
+    def test_driver_uploads_and_rider_reads(self):
+        self.client.force_login(self.driver)
+
+        self.assertEqual(
+            self.post([[1000, 50.45, 30.52], [2000, 50.4501, 30.5201]]).json(),
+            {"stored": 2, "ignored": 0},
+        )
+        self.assertEqual(self.post([[1000, 50.45, 30.52]]).json()["ignored"], 1)
+        self.assertEqual(self.post([[1000, 95, 30.52]]).status_code, 400)
+
+        self.client.force_login(self.rider)
+
+        self.assertEqual(self.post([[3000, 50.45, 30.52]]).status_code, 404)
+        self.assertEqual(
+            self.client.get(self.url, {"since": 1500}).json(),
+            {"data": {"total": 1, "points": [[2000, 50.4501, 30.5201]]}},
+        )
+
+        self.client.force_login(self.other)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(TrackSegment.objects.count(), 1)
+
+    def test_device_uploads_with_token(self):
+        response = Client(enforce_csrf_checks=True).post(
+            self.url,
+            json.dumps({"points": [[1000, 50.45, 30.52]]}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {create_token(self.driver, 'phone')}",
+        )
+
+        self.assertEqual(response.json(), {"stored": 1, "ignored": 0})
@@ -0,0 +1,84 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from taxi.models import Manufacturer
+from taxi.testing import TimedTestRunner
+
+# The sample tests below only run inside `RunnerTest`'s subprocess.
+SAMPLES = os.environ.get("TIMED_RUNNER_SAMPLES") == "1"
+
+
+@skipUnless(SAMPLES, "Run by RunnerTest.test_seed_fixture_reaches_parallel_workers.")
+class SeededSampleTest(TestCase):
+    def test_fixture_is_loaded(self):
+        self.assertEqual(list(Manufacturer.objects.values_list("name", flat=True)), ["Seeded"])
+
+
+class SeededCloneSampleTest(SeededSampleTest):
+    def test_failure_is_reported(self):
+        self.fail("Reported from a parallel worker.")
+
+
+class TimedResultTest(SimpleTestCase):
+    def test_lists_the_slowest_tests(self):
+        class Sample(unittest.TestCase):
+            def test_fast(self):
+                pass
+
+            def test_slow(self):
+                time.sleep(0.05)
+
+        runner = TimedTestRunner(slowest=1)
+        output = io.StringIO()
+
+        with redirect_stdout(output), redirect_stderr(io.StringIO()):
+            result = runner.run_suite(unittest.TestLoader().loadTestsFromTestCase(Sample))
+
+        self.assertEqual(len(result.durations), 2)
+        self.assertGreaterEqual(max(result.durations.values()), 0.05)
+        self.assertIn("Slowest 1 of 2 tests:", output.getvalue())
+        self.assertIn("test_slow", output.getvalue())
+        self.assertNotIn("test_fast", output.getvalue())
+
+
+class RunnerTest(SimpleTestCase):
+    def test_seed_fixture_reaches_parallel_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = os.path.join(directory, "seed.json")
+
+            with open(fixture, "w") as file:
+                json.dump(
+                    [{"model": "taxi.manufacturer", "pk": 1, "fields": {"name": "Seeded", "country": "Country"}}],
+                    file,
+                )
+
+            result = subprocess.run(
+                [
+                    sys.executable, "manage.py", "test", "taxi.tests.test_testing.SeededSampleTest",
+                    "taxi.tests.test_testing.SeededCloneSampleTest", "--seed-fixture", fixture,
+                    "--parallel", "2", "--slowest", "5",
+                ],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, "TIMED_RUNNER_SAMPLES": "1"},
+                capture_output=True,
+                text=True,
+            )
+
+        output = result.stdout + result.stderr
+
+        self.assertEqual(result.returncode, 1, output)
+        self.assertIn("FAILED (failures=1)", output)
+        self.assertIn("Reported from a parallel worker.", output)
+        self.assertIn("Slowest 3 of 3 tests:", output)
+        self.assertIn("SeededCloneSampleTest.test_fixture_is_loaded", output)
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from taxi.traffic import compare, ks_distance, read_capture, replay
+
+CAR_LIST_VIEW_URL = reverse("taxi:car-list")
+API_CAR_LIST_URL = reverse("taxi:api-car-list")
+AUTH_MIDDLEWARE = "django.contrib.auth.middleware.AuthenticationMiddleware"
+
+
+def capture_middleware():
+    middleware = list(settings.MIDDLEWARE)
+    middleware.insert(middleware.index(AUTH_MIDDLEWARE) + 1, "taxi.middleware.TrafficCaptureMiddleware")
+
+    return middleware
+
+
+class TrafficCaptureTest(TestCase):
+    def test_taxi_requests_are_recorded_without_secrets(self):
+        user = get_user_model().objects.create_user(
+            username="test_user", password="test_password", license_number="AAA00001"
+        )
+        self.client.force_login(user)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(TRAFFIC_CAPTURE_DIR=directory, MIDDLEWARE=capture_middleware()):
+                self.client.get(CAR_LIST_VIEW_URL, {"model": "Octavia", "api_token": "abc"})
+                self.client.get(reverse("login"))
+
+            records = read_capture([os.path.join(directory, "traffic-*.jsonl")])
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["route"], "taxi:car-list")
+        self.assertEqual(records[0]["params"], {"model": ["Octavia"], "api_token": ["[redacted]"]})
+        self.assertEqual((records[0]["user"], records[0]["status"]), (user.pk, 200))
+        self.assertGreater(records[0]["ms"], 0)
+
+
+class CompareTest(SimpleTestCase):
+    def test_latency_distributions(self):
+        rng = np.random.default_rng(0)
+        self.assertEqual(ks_distance(np.array([1.0, 2.0]), np.array([1.0, 2.0])), 0)
+        self.assertEqual(ks_distance(np.array([1.0, 2.0]), np.array([3.0, 4.0])), 1)
+
+        def records(route, values):
+            return [{"route": route, "status": 200, "ms": value} for value in values]
+
+        same = rng.normal(20, 2, 500)
+        rows = compare(
+            records("taxi:car-list", same) + records("taxi:api-eta", rng.normal(20, 2, 500)),
+            records("taxi:car-list", same + 0.01) + records("taxi:api-eta", rng.normal(30, 2, 500)),
+        )
+
+        self.assertEqual([(row["route"], row["changed"]) for row in rows], [("taxi:api-eta", True), ("taxi:car-list", False)])
+
+
+class ReplayTest(LiveServerTestCase):
+    def test_replay_keeps_timing_and_sessions(self):
+        user = get_user_model().objects.create_user(
+            username="test_user", password="test_password", license_number="AAA00001"
+        )
+        self.client.force_login(user)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        records = [
+            {"t": 1000.0, "route": "taxi:api-car-list", "method": "GET", "path": API_CAR_LIST_URL,
+             "params": {"limit": ["5"]}, "user": user.pk, "status": 200, "ms": 5.0},
+            {"t": 1000.4, "route": "taxi:api-car-list", "method": "GET", "path": API_CAR_LIST_URL,
+             "params": {}, "user": None, "status": 401, "ms": 1.0},
+            {"t": 1000.5, "route": "taxi:api-ride-request", "method": "POST", "path": "/api/v1/rides/request/",
+             "params": {}, "user": user.pk, "status": 201, "ms": 1.0},
+        ]
+
+        started = time.monotonic()
+        results = replay(records, self.live_server_url, speed=2, sessions={str(user.pk): session})
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual([result["status"] for result in results], [200, 401])
+
+        with tempfile.TemporaryDirectory() as directory:
+            capture = os.path.join(directory, "traffic-1.jsonl")
+
+            with open(capture, "w") as capture_file:
+                capture_file.writelines(json.dumps(record) + "\n" for record in records)
+
+            output = StringIO()
+            call_command(
+                "replay_traffic", capture, target=self.live_server_url, speed=10,
+                output=os.path.join(directory, "run.jsonl"), baseline=capture, stdout=output,
+            )
+
+            self.assertIn("taxi:api-car-list", output.getvalue())
+            self.assertEqual(len(read_capture([os.path.join(directory, "run.jsonl")])), 2)
@@ -0,0 +1,41 @@
+"""Bearer tokens for devices and feeds calling the API.
+
+GPS devices and the HR feed can't follow the session cookie and CSRF
+token dance of a browser. They send `Authorization: Bearer <token>`
+instead, which `ApiTokenMiddleware` turns into `request.user`; only the
+token's SHA-256 is stored. Create tokens with
+`manage.py create_api_token`.
+"""
+import hashlib
+import secrets
+
+from .models import ApiToken
+
+TOKEN_BYTES = 32
+
+
+def hash_token(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def create_token(user, name):
+    """Store a new token for `user` and return it; it can't be read back."""
+    key = secrets.token_urlsafe(TOKEN_BYTES)
+    ApiToken.objects.create(user=user, name=name, key_hash=hash_token(key))
+
+    return key
+
+
+def authenticate_token(key):
+    """The active user `key` belongs to, or None."""
+    token = (
+        ApiToken.objects.using("default")
+        .select_related("user")
+        .filter(key_hash=hash_token(key))
+        .first()
+    )
+
+    if token is None or not token.user.is_active:
+        return None
+
+    return token.user
@@ -0,0 +1,164 @@
+"""Production traffic capture and replay.
+
+With `TRAFFIC_CAPTURE_DIR` set, `TrafficCaptureMiddleware` writes one
+JSON line per request to a `taxi:` route: when it started, the route,
+method, path and query parameters (with secrets redacted), the user id,
+the status and how long it took. Each process writes its own file,
+rotated by size, as `RotatingFileHandler` can't share one between
+processes. Request bodies and cookies are never captured.
+
+`replay()` re-issues captured GET and HEAD requests against another
+instance at their original offsets from the first one, optionally sped
+up, from a thread pool large enough to keep the original overlap, and
+`compare()` sets the per-route latencies of two runs (or of a capture
+and a run) side by side.
+"""
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+from django.conf import settings
+
+from .jsonlog import read_json_lines
+
+TRAFFIC_CAPTURE_NAMESPACES = ("taxi",)
+TRAFFIC_REDACTED_PARAMS = ("password", "token", "secret", "key", "session", "csrfmiddlewaretoken")
+TRAFFIC_MAX_PARAM_LENGTH = 200
+REPLAY_METHODS = ("GET", "HEAD")
+REPLAY_TIMEOUT = 30.0
+# Two-sample Kolmogorov-Smirnov distance above which a route's latency
+# distribution is reported as changed.
+COMPARE_THRESHOLD = 0.2
+
+
+def sanitize_params(query):
+    """`{name: [values]}` of a `QueryDict`, secrets redacted, values truncated."""
+    params = {}
+
+    for name, values in query.lists():
+        if any(secret in name.lower() for secret in TRAFFIC_REDACTED_PARAMS):
+            params[name] = ["[redacted]"] * len(values)
+        else:
+            params[name] = [value[:TRAFFIC_MAX_PARAM_LENGTH] for value in values]
+
+    return params
+
+
+def read_capture(patterns):
+    """Records from capture files (paths or globs), oldest first."""
+    return sorted(read_json_lines(patterns), key=lambda record: record["t"])
+
+
+def replay(records, base_url, speed=1.0, sessions=None, workers=64, timeout=REPLAY_TIMEOUT):
+    """Re-issue `records` against `base_url`; returns records of the replayed requests.
+
+    Each request is sent at its original offset from the first, divided
+    by `speed`, whatever happened to earlier ones: the original
+    inter-arrival times and overlap are kept as long as `workers`
+    threads are enough. `sessions` maps user ids (as strings, `"*"` for
+    any other user) to session ids; anonymous requests go without one.
+    """
+    records = [record for record in records if record["method"] in REPLAY_METHODS]
+    sessions = sessions or {}
+    results = []
+    lock = threading.Lock()
+
+    def send(record):
+        url = base_url.rstrip("/") + record["path"]
+
+        if record.get("params"):
+            url += "?" + urlencode(record["params"], doseq=True)
+
+        request = urllib.request.Request(url, method=record["method"])
+        session = None if record.get("user") is None else sessions.get(str(record["user"]), sessions.get("*"))
+
+        if session:
+            request.add_header("Cookie", f"{settings.SESSION_COOKIE_NAME}={session}")
+
+        started = time.perf_counter()
+
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+        except OSError:
+            status = None
+
+        result = {
+            "t": record["t"],
+            "route": record["route"],
+            "method": record["method"],
+            "path": record["path"],
+            "status": status,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+            "captured_ms": record.get("ms"),
+        }
+
+        with lock:
+            results.append(result)
+
+    if not records:
+        return results
+
+    first = records[0]["t"]
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in records:
+            delay = (record["t"] - first) / speed - (time.monotonic() - started)
+
+            if delay > 0:
+                time.sleep(delay)
+
+            pool.submit(send, record)
+
+    results.sort(key=lambda result: result["t"])
+
+    return results
+
+
+def latencies(records):
+    """`{route: sorted milliseconds}` of the requests that got a response."""
+    routes = defaultdict(list)
+
+    for record in records:
+        if record.get("status") is not None:
+            routes[record["route"]].append(record["ms"])
+
+    return {route: np.sort(np.array(values)) for route, values in routes.items()}
+
+
+def ks_distance(a, b):
+    """Largest gap between the empirical distributions of sorted `a` and `b`."""
+    values = np.concatenate([a, b])
+
+    return float(np.abs(
+        np.searchsorted(a, values, side="right") / len(a) - np.searchsorted(b, values, side="right") / len(b)
+    ).max())
+
+
+def compare(baseline, current, threshold=COMPARE_THRESHOLD):
+    """Per-route rows of `(route, count, p50 and p99 before and after, KS distance, changed)`."""
+    before, after = latencies(baseline), latencies(current)
+    rows = []
+
+    for route in sorted(set(before) & set(after)):
+        a, b = before[route], after[route]
+        distance = ks_distance(a, b)
+        rows.append({
+            "route": route,
+            "count": (len(a), len(b)),
+            "p50": (float(np.percentile(a, 50)), float(np.percentile(b, 50))),
+            "p99": (float(np.percentile(a, 99)), float(np.percentile(b, 99))),
+            "ks": distance,
+            "changed": distance > threshold,
+        })
+
+    return rows
@@ -1,10 +1,18 @@
 from django.urls import path
 
+from .api import (
+    ApiDetailView, ApiListView, CarDriverApiView, DriverSyncApiView, EtaApiView, FreeCarsApiView, HeatmapTileApiView,
+    LocationPingApiView, MetricsApiView, NearestDriversApiView, RideRequestApiView, RideStatusApiView,
+    RideTelemetryApiView, ShiftBookingApiView, SurgeApiView,
+)
+from .models import Car, Driver, Manufacturer
 from .views import (
     index,
-    CarListView, CarDetailView, CarCreateView, CarUpdateView, CarDeleteView,
+    CarListView, CarExportView, CarDetailView, CarCreateView, CarUpdateView, CarDeleteView,
     DriverListView, DriverDetailView, DriverCreateView, DriverDeleteView, DriverLicenseUpdateView,
-    ManufacturerListView, ManufacturerCreateView, ManufacturerUpdateView, ManufacturerDeleteView,
+    ManufacturerListView, ManufacturerDetailView, ManufacturerCreateView, ManufacturerUpdateView, ManufacturerDeleteView,
+    JobListView, JobDetailView, JobDownloadView,
+    HeatmapView, HistoryView,
 )
 
 urlpatterns = [
@@ -15,6 +23,11 @@ urlpatterns = [
         ManufacturerListView.as_view(),
         name="manufacturer-list"
     ),
+    path(
+        "manufacturers/<int:pk>/",
+        ManufacturerDetailView.as_view(),
+        name="manufacturer-detail"
+    ),
     path(
         "manufacturers/create/",
         ManufacturerCreateView.as_view(),
@@ -30,12 +43,22 @@ urlpatterns = [
         ManufacturerDeleteView.as_view(),
         name="manufacturer-delete"
     ),
+    path(
+        "manufacturers/<int:pk>/history/",
+        HistoryView.as_view(audited_model=Manufacturer),
+        name="manufacturer-history"
+    ),
 
     path(
         "cars/",
         CarListView.as_view(),
         name="car-list"
     ),
+    path(
+        "cars/export/",
+        CarExportView.as_view(),
+        name="car-export"
+    ),
     path(
         "cars/<int:pk>/",
         CarDetailView.as_view(),
@@ -56,6 +79,11 @@ urlpatterns = [
         CarDeleteView.as_view(),
         name="car-delete"
     ),
+    path(
+        "cars/<int:pk>/history/",
+        HistoryView.as_view(audited_model=Car),
+        name="car-history"
+    ),
 
     path(
         "drivers/",
@@ -77,11 +105,144 @@ urlpatterns = [
         DriverDeleteView.as_view(),
         name="driver-delete"
     ),
+    path(
+        "drivers/<int:pk>/history/",
+        HistoryView.as_view(audited_model=Driver),
+        name="driver-history"
+    ),
     path(
         "drivers/<int:pk>/license/update/",
         DriverLicenseUpdateView.as_view(),
         name="driver-license-update"
     ),
+
+    path(
+        "jobs/",
+        JobListView.as_view(),
+        name="job-list"
+    ),
+    path(
+        "jobs/<int:pk>/",
+        JobDetailView.as_view(),
+        name="job-detail"
+    ),
+    path(
+        "jobs/<int:pk>/download/",
+        JobDownloadView.as_view(),
+        name="job-download"
+    ),
+
+    path(
+        "heatmap/",
+        HeatmapView.as_view(),
+        name="heatmap"
+    ),
+
+    path(
+        "api/v1/cars/",
+        ApiListView.as_view(resource_name="cars"),
+        name="api-car-list"
+    ),
+    path(
+        "api/v1/cars/free/",
+        FreeCarsApiView.as_view(),
+        name="api-car-free"
+    ),
+    path(
+        "api/v1/cars/<int:pk>/",
+        ApiDetailView.as_view(resource_name="cars"),
+        name="api-car-detail"
+    ),
+    path(
+        "api/v1/cars/<int:pk>/driver/",
+        CarDriverApiView.as_view(),
+        name="api-car-driver"
+    ),
+    path(
+        "api/v1/drivers/",
+        ApiListView.as_view(resource_name="drivers"),
+        name="api-driver-list"
+    ),
+    path(
+        "api/v1/drivers/locations/",
+        LocationPingApiView.as_view(),
+        name="api-driver-locations"
+    ),
+    path(
+        "api/v1/drivers/nearest/",
+        NearestDriversApiView.as_view(),
+        name="api-driver-nearest"
+    ),
+    path(
+        "api/v1/drivers/sync/",
+        DriverSyncApiView.as_view(),
+        name="api-driver-sync"
+    ),
+    path(
+        "api/v1/drivers/<int:pk>/",
+        ApiDetailView.as_view(resource_name="drivers"),
+        name="api-driver-detail"
+    ),
+    path(
+        "api/v1/manufacturers/",
+        ApiListView.as_view(resource_name="manufacturers"),
+        name="api-manufacturer-list"
+    ),
+    path(
+        "api/v1/manufacturers/<int:pk>/",
+        ApiDetailView.as_view(resource_name="manufacturers"),
+        name="api-manufacturer-detail"
+    ),
+    path(
+        "api/v1/rides/",
+        ApiListView.as_view(resource_name="rides"),
+        name="api-ride-list"
+    ),
+    path(
+        "api/v1/rides/request/",
+        RideRequestApiView.as_view(),
+        name="api-ride-request"
+    ),
+    path(
+        "api/v1/rides/<int:pk>/",
+        ApiDetailView.as_view(resource_name="rides"),
+        name="api-ride-detail"
+    ),
+    path(
+        "api/v1/rides/<int:pk>/status/",
+        RideStatusApiView.as_view(),
+        name="api-ride-status"
+    ),
+    path(
+        "api/v1/rides/<int:pk>/telemetry/",
+        RideTelemetryApiView.as_view(),
+        name="api-ride-telemetry"
+    ),
+    path(
+        "api/v1/shifts/",
+        ShiftBookingApiView.as_view(),
+        name="api-shift-booking"
+    ),
+    path(
+        "api/v1/eta/",
+        EtaApiView.as_view(),
+        name="api-eta"
+    ),
+    path(
+        "api/v1/surge/",
+        SurgeApiView.as_view(),
+        name="api-surge"
+    ),
+    path(
+        "api/v1/heatmap/<str:layer>/<int:z>/<int:x>/<int:y>/",
+        HeatmapTileApiView.as_view(),
+        name="api-heatmap-tile"
+    ),
+    path(
+        "api/v1/metrics/",
+        MetricsApiView.as_view(),
+        name="api-metrics"
+    ),
 ]
 
 app_name = "taxi"
@@ -1,11 +1,25 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
-from django.urls import reverse_lazy
+from django.shortcuts import redirect, render
+from django.urls import reverse, reverse_lazy
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Count
+from django.http import FileResponse, Http404
 
+from .audit import model_label
+from .cache import get_fleet_version
+from .facets import filter_cars, get_facet_counts, with_drivers_count
 from .forms import DriverUserCreationForm, DriverLicenseUpdateForm, CarSearchForm
-from .models import Driver, Car, Manufacturer
+from .heatmap import HEATMAP_MAX_ZOOM
+from .jobs import INLINE_DELETE_LIMIT, enqueue, export_path
+from .models import AuditEntry, Driver, Car, Job, Manufacturer
+from .sharding import gather, manufacturer_stats, scatter, sharding_enabled
+from .singleflight import single_flight
+
+MANUFACTURER_LIST_CACHE_TIMEOUT = 60 * 5
 
 
 @login_required
@@ -13,7 +27,7 @@ def index(request):
     """View function for the home page of the site."""
 
     num_drivers = Driver.objects.count()
-    num_cars = Car.objects.count()
+    num_cars = sum(queryset.count() for queryset in scatter(Car.objects.all()))
     num_manufacturers = Manufacturer.objects.count()
 
     num_visits = request.session.get("num_visits", 0)
@@ -34,6 +48,83 @@ class ManufacturerListView(LoginRequiredMixin, generic.ListView):
     context_object_name = "manufacturer_list"
     template_name = "taxi/manufacturer_list.html"
     paginate_by = 2
+    queryset = Manufacturer.objects.annotate(
+        num_cars=Count("car", distinct=True),
+        num_drivers=Count("car__drivers", distinct=True),
+    )
+    ordering_fields = ("name", "country", "num_cars", "num_drivers")
+
+    def get_ordering(self):
+        ordering = self.request.GET.get("ordering", "")
+
+        if ordering.lstrip("-") in self.ordering_fields:
+            return [ordering, "name"]
+
+        return None
+
+    def get_queryset(self):
+        queryset = super(ManufacturerListView, self).get_queryset()
+        ordering = ",".join(self.get_ordering() or ())
+
+        # Every manufacturer fits comfortably in one cached list; caching it
+        # through single-flight stops concurrent misses from all re-running
+        # the aggregate query.
+        return single_flight.get(
+            f"taxi:manufacturer-list:{ordering}",
+            lambda: self.evaluate(queryset),
+            MANUFACTURER_LIST_CACHE_TIMEOUT,
+            version=get_fleet_version(),
+        )
+
+    def evaluate(self, queryset):
+        manufacturers = list(queryset)
+
+        if sharding_enabled():
+            # Cars live on the shards, so the annotations above count nothing.
+            stats = manufacturer_stats()
+
+            for manufacturer in manufacturers:
+                manufacturer.num_cars, manufacturer.num_drivers = stats.get(manufacturer.pk, (0, 0))
+
+            for field in reversed(self.get_ordering() or ()):
+                manufacturers.sort(
+                    key=lambda manufacturer: getattr(manufacturer, field.lstrip("-")),
+                    reverse=field.startswith("-"),
+                )
+
+        return manufacturers
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super(ManufacturerListView, self).get_context_data(**kwargs)
+
+        ordering = self.request.GET.get("ordering", "")
+        context["ordering"] = ordering
+        context["next_ordering"] = {
+            field: f"-{field}" if ordering == field else field
+            for field in self.ordering_fields
+        }
+
+        return context
+
+
+class ManufacturerDetailView(LoginRequiredMixin, generic.DetailView):
+    model = Manufacturer
+    queryset = ManufacturerListView.queryset
+
+    def get_context_data(self, **kwargs):
+        context = super(ManufacturerDetailView, self).get_context_data(**kwargs)
+
+        cars = with_drivers_count(self.object.car_set.all())
+
+        if sharding_enabled():
+            cars = gather(cars, ("model", "pk"))
+            self.object.num_cars, self.object.num_drivers = manufacturer_stats(
+                [self.object.pk]
+            ).get(self.object.pk, (0, 0))
+
+        context["car_list"] = cars
+
+        return context
 
 
 class ManufacturerCreateView(LoginRequiredMixin, generic.CreateView):
@@ -55,6 +146,24 @@ class ManufacturerDeleteView(LoginRequiredMixin, generic.DeleteView):
     template_name = "taxi/generic_confirm_delete_form.html"
     success_url = reverse_lazy("taxi:manufacturer-list")
 
+    def form_valid(self, form):
+        cars = Car.objects.filter(manufacturer=self.object)
+
+        if sum(queryset.count() for queryset in scatter(cars)) <= INLINE_DELETE_LIMIT:
+            return super(ManufacturerDeleteView, self).form_valid(form)
+
+        # Too many cars to cascade within the request: delete in batches
+        # in the background, unless that is already under way.
+        job = Job.objects.filter(
+            name="delete_manufacturer",
+            params__manufacturer_id=self.object.pk,
+            status__in=Job.ACTIVE_STATUSES,
+        ).first() or enqueue(
+            "delete_manufacturer", {"manufacturer_id": self.object.pk}, user=self.request.user
+        )
+
+        return redirect(job)
+
 
 class CarListView(LoginRequiredMixin, generic.ListView):
     model = Car
@@ -65,26 +174,54 @@ class CarListView(LoginRequiredMixin, generic.ListView):
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super(CarListView, self).get_context_data(**kwargs)
 
-        model = self.request.GET.get("model", "")
-
-        context["search_form"] = CarSearchForm(initial={
-            "model": model
-        })
+        context["search_form"] = CarSearchForm(initial=self.filters)
+        context["facets"] = get_facet_counts(self.filters)
 
         return context
 
     def get_queryset(self):
         form = CarSearchForm(self.request.GET)
+        self.filters = form.cleaned_data if form.is_valid() else {}
 
-        if form.is_valid():
-            return self.queryset.filter(
-                model__icontains=form.cleaned_data["model"]
-            )
+        return gather(
+            filter_cars(with_drivers_count(self.queryset), self.filters),
+            ("model", "pk"),
+        )
+
+
+class ShardedCarMixin:
+    """Look the car up on every shard when the fleet is sharded."""
+
+    def get_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
 
+        for shard_queryset in scatter(queryset):
+            try:
+                return super(ShardedCarMixin, self).get_object(shard_queryset)
+            except Http404:
+                continue
 
-class CarDetailView(LoginRequiredMixin, generic.DetailView):
+        raise Http404("No car found matching the query")
+
+
+class CarExportView(LoginRequiredMixin, generic.View):
+    def post(self, request, *args, **kwargs):
+        form = CarSearchForm(request.POST)
+        filters = form.cleaned_data if form.is_valid() else {}
+
+        return redirect(enqueue("export_cars", {"filters": filters}, user=request.user))
+
+
+class CarDetailView(LoginRequiredMixin, ShardedCarMixin, generic.DetailView):
     model = Car
 
+    def get_context_data(self, **kwargs):
+        context = super(CarDetailView, self).get_context_data(**kwargs)
+        context["event_stream"] = settings.EVENT_STREAM
+
+        return context
+
 
 class CarCreateView(LoginRequiredMixin, generic.CreateView):
     model = Car
@@ -93,14 +230,14 @@ class CarCreateView(LoginRequiredMixin, generic.CreateView):
     success_url = reverse_lazy("taxi:car-list")
 
 
-class CarUpdateView(LoginRequiredMixin, generic.UpdateView):
+class CarUpdateView(LoginRequiredMixin, ShardedCarMixin, generic.UpdateView):
     model = Car
     fields = "__all__"
     template_name = "taxi/car_form.html"
     success_url = reverse_lazy("taxi:car-list")
 
 
-class CarDeleteView(LoginRequiredMixin, generic.DeleteView):
+class CarDeleteView(LoginRequiredMixin, ShardedCarMixin, generic.DeleteView):
     model = Car
     template_name = "taxi/generic_confirm_delete_form.html"
     success_url = reverse_lazy("taxi:car-list")
@@ -115,6 +252,20 @@ class DriverDetailView(LoginRequiredMixin, generic.DetailView):
     model = Driver
     queryset = Driver.objects.all().prefetch_related("cars__manufacturer")
 
+    def get_context_data(self, **kwargs):
+        context = super(DriverDetailView, self).get_context_data(**kwargs)
+        context["event_stream"] = settings.EVENT_STREAM
+
+        if sharding_enabled():
+            context["car_list"] = gather(
+                Car.objects.filter(drivers=self.object).select_related("manufacturer"),
+                ("model", "pk"),
+            )
+        else:
+            context["car_list"] = self.object.cars.all()
+
+        return context
+
 
 class DriverCreateView(LoginRequiredMixin, generic.CreateView):
     model = Driver
@@ -132,3 +283,67 @@ class DriverDeleteView(LoginRequiredMixin, generic.DeleteView):
     model = Driver
     template_name = "taxi/generic_confirm_delete_form.html"
     success_url = reverse_lazy("taxi:driver-list")
+
+
+class OwnJobsMixin:
+    """Staff see every job, everybody else only the jobs they started."""
+
+    def get_queryset(self):
+        queryset = Job.objects.select_related("created_by")
+
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+
+        return queryset
+
+
+class JobListView(LoginRequiredMixin, OwnJobsMixin, generic.ListView):
+    model = Job
+    paginate_by = 10
+
+
+class JobDetailView(LoginRequiredMixin, OwnJobsMixin, generic.DetailView):
+    model = Job
+
+
+class JobDownloadView(JobDetailView):
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+
+        if job.name != "export_cars" or job.status != Job.SUCCEEDED:
+            raise Http404("No export for this job")
+
+        path = export_path(job)
+
+        if not os.path.exists(path):
+            raise Http404("The export file is gone")
+
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=os.path.basename(path))
+
+
+class HeatmapView(LoginRequiredMixin, generic.TemplateView):
+    template_name = "taxi/heatmap.html"
+    extra_context = {"max_zoom": HEATMAP_MAX_ZOOM}
+
+
+class HistoryView(LoginRequiredMixin, generic.ListView):
+    """The audit trail of one car, driver or manufacturer, newest first."""
+
+    audited_model = None
+    template_name = "taxi/history.html"
+    paginate_by = 25
+
+    def get_queryset(self):
+        # Served by the (model, object_id, recorded_at) index.
+        return AuditEntry.objects.filter(
+            model=model_label(self.audited_model), object_id=self.kwargs["pk"]
+        ).select_related("actor")
+
+    def get_context_data(self, **kwargs):
+        name = self.audited_model._meta.model_name
+
+        return super().get_context_data(
+            object_name=f"{self.audited_model._meta.verbose_name} #{self.kwargs['pk']}",
+            object_url=reverse(f"taxi:{name}-detail", kwargs={"pk": self.kwargs["pk"]}),
+            **kwargs,
+        )
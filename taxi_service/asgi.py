@@ -2,6 +2,8 @@
 ASGI config for taxi_service project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+With ``EVENT_STREAM`` on, requests to ``taxi.events.EVENTS_PATH`` get the
+live event stream; all others go to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -9,8 +11,18 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "taxi_service.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from taxi.events import EVENTS_PATH, event_stream  # noqa: E402 (needs the app registry)
+
+
+async def application(scope, receive, send):
+    if settings.EVENT_STREAM and scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+        return await event_stream(scope, receive, send)
+
+    return await django_application(scope, receive, send)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / "subdir".
@@ -26,7 +27,9 @@ SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", "django-insecure-8ovil3xu6=eaoq
 
 # SECURITY WARNING: don't run with debug turned on in production!
 # DEBUG = True
-DEBUG = bool(os.environ.get("DJANGO_DEBUG", True))
+# On when DJANGO_DEBUG is unset or "1"; any other value, such as "0" or
+# "False", turns it off.
+DEBUG = os.environ.get("DJANGO_DEBUG", "1") == "1"
 
 ALLOWED_HOSTS = ["127.0.0.1", "py-taxi-service.herokuapp.com"]
 
@@ -34,6 +37,12 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# django-debug-toolbar, its middleware and `__debug__/` URLs are only
+# loaded when this is on: by default with DEBUG, never otherwise.
+# `manage.py startup_profile` shows what each app adds to a cold start.
+
+DEBUG_TOOLBAR = DEBUG and os.environ.get("DJANGO_DEBUG_TOOLBAR", "1") == "1"
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -43,23 +52,27 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "debug_toolbar",
     "crispy_forms",
     "taxi",
 ]
 
 MIDDLEWARE = [
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "taxi.middleware.ApiTokenMiddleware",
+    "taxi.middleware.AuditContextMiddleware",
+    "taxi.middleware.OverloadProtectionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index("crispy_forms"), "debug_toolbar")
+
 ROOT_URLCONF = "taxi_service.urls"
 
 TEMPLATES = [
@@ -93,6 +106,200 @@ DATABASES = {
 db_from_env = dj_database_url.config(conn_max_age=500)  # DATABASE_URL
 DATABASES["default"].update(db_from_env)
 
+# Read replicas (taxi.routers.ReplicaRouter), e.g.
+# DATABASE_REPLICA_URLS=sqlite:////srv/replica1.sqlite3,sqlite:////srv/replica2.sqlite3
+
+DATABASE_ROUTERS = []
+
+DATABASE_REPLICAS = []
+
+for number, url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), 1):
+    DATABASES[f"replica{number}"] = dj_database_url.parse(url, conn_max_age=500)
+    DATABASES[f"replica{number}"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS.append("taxi.routers.ReplicaRouter")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware"),
+        "taxi.middleware.ReplicaRoutingMiddleware",
+    )
+
+# Queries slower than this many milliseconds are logged, with their
+# query plan, to rotating files in `SLOW_QUERY_LOG_DIR` (taxi.slowlog);
+# rank them with `manage.py slow_queries`. Unset disables the log.
+
+SLOW_QUERY_MS = float(os.environ["DJANGO_SLOW_QUERY_MS"]) if os.environ.get("DJANGO_SLOW_QUERY_MS") else None
+
+SLOW_QUERY_LOG_DIR = os.environ.get("DJANGO_SLOW_QUERY_LOG_DIR", BASE_DIR / "logs")
+
+if SLOW_QUERY_MS is not None:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware"),
+        "taxi.middleware.SlowQueryLogMiddleware",
+    )
+
+# Brotli (with the optional `brotli` package) or gzip compression of
+# HTML, JSON, CSV and text responses of at least
+# RESPONSE_COMPRESSION_MIN_BYTES (taxi.compression); static files are
+# served by WhiteNoise. Compare levels with `manage.py bench_compression`.
+
+RESPONSE_COMPRESSION = os.environ.get("DJANGO_RESPONSE_COMPRESSION", "1") == "1"
+
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get("DJANGO_RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+
+RESPONSE_GZIP_LEVEL = int(os.environ.get("DJANGO_RESPONSE_GZIP_LEVEL", 6))
+
+RESPONSE_BROTLI_QUALITY = int(os.environ.get("DJANGO_RESPONSE_BROTLI_QUALITY", 4))
+
+if RESPONSE_COMPRESSION:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("whitenoise.middleware.WhiteNoiseMiddleware") + 1,
+        "taxi.middleware.CompressionMiddleware",
+    )
+
+# The toolbar only injects itself into uncompressed HTML, so it runs
+# inside CompressionMiddleware.
+
+if DEBUG_TOOLBAR:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("taxi.middleware.CompressionMiddleware") + 1 if RESPONSE_COMPRESSION else 0,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
+# The live event feed (taxi.events) needs an ASGI server, e.g.
+# `uvicorn taxi_service.asgi:application`: turn this on where one serves
+# it, so pages open the feed. With EVENT_RELAY on (in every process),
+# events are stored for the other processes, and those serving the feed
+# or heatmap tiles poll them every EVENT_POLL_INTERVAL seconds (0 stops
+# polling); `manage.py run_jobs` deletes them after a few minutes.
+
+EVENT_STREAM = os.environ.get("DJANGO_EVENT_STREAM", "0") == "1"
+
+EVENT_RELAY = os.environ.get("DJANGO_EVENT_RELAY", "0") == "1"
+
+EVENT_POLL_INTERVAL = float(os.environ.get("DJANGO_EVENT_POLL_INTERVAL", 0.5))
+
+# Seconds between bulk inserts of the buffered audit trail (taxi.audit);
+# 0 writes it from the committing thread once AUDIT_FLUSH_SIZE entries
+# are buffered, or when flushed explicitly.
+
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("DJANGO_AUDIT_FLUSH_INTERVAL", 1.0))
+
+# Seconds between surge pricing recomputes (taxi.pricing), done by one
+# background thread per process; 0 stops the thread, and snapshots are
+# then only refreshed explicitly.
+
+SURGE_INTERVAL = float(os.environ.get("DJANGO_SURGE_INTERVAL", 5.0))
+
+# Seconds a client keeps reading from the primary after a write.
+REPLICA_PIN_SECONDS = 10
+
+# Opt-in capture of `taxi:` requests (taxi.traffic) to rotating files in
+# this directory, for `manage.py replay_traffic`.
+
+TRAFFIC_CAPTURE_DIR = os.environ.get("DJANGO_TRAFFIC_CAPTURE_DIR")
+
+TRAFFIC_CAPTURE_SAMPLE = float(os.environ.get("DJANGO_TRAFFIC_CAPTURE_SAMPLE", 1.0))
+
+if TRAFFIC_CAPTURE_DIR:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.auth.middleware.AuthenticationMiddleware") + 1,
+        "taxi.middleware.TrafficCaptureMiddleware",
+    )
+
+# Fleet shards (taxi.sharding), e.g.
+# DATABASE_SHARD_URLS=sqlite:////srv/shard1.sqlite3,sqlite:////srv/shard2.sqlite3
+
+DATABASE_SHARDS = []
+
+for number, url in enumerate(filter(None, os.environ.get("DATABASE_SHARD_URLS", "").split(",")), 1):
+    DATABASES[f"shard{number}"] = dj_database_url.parse(url, conn_max_age=500)
+    DATABASE_SHARDS.append(f"shard{number}")
+
+if DATABASE_SHARDS:
+    DATABASE_ROUTERS.insert(0, "taxi.sharding.ShardRouter")
+
+# SQLite production profile, applied on every new SQLite connection
+# (taxi.db.configure_sqlite). Ignored for other database engines.
+
+SQLITE_TUNING = os.environ.get("DJANGO_SQLITE_TUNING", "1") == "1"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # KiB
+    "temp_store": "MEMORY",
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shared by all gunicorn workers on the host, for single-flight
+    # values and cache versions.
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "DJANGO_SHARED_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "taxi_service_cache"),
+        ),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("DJANGO_SHARED_CACHE_MAX_ENTRIES", 100_000)),
+        },
+    },
+}
+
+SHARED_CACHE = "shared"
+
+# Single-flight locks (taxi.singleflight), one file per lock stripe.
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get(
+    "DJANGO_SINGLE_FLIGHT_LOCK_DIR",
+    os.path.join(tempfile.gettempdir(), "taxi_service_locks"),
+)
+
+# Overload protection (taxi.middleware.OverloadProtectionMiddleware)
+# Rates are (requests per second, burst size) token buckets.
+
+# SQLite file shared by the workers on the host; ":memory:" keeps
+# per-process buckets.
+RATE_LIMIT_DB = os.environ.get(
+    "DJANGO_RATE_LIMIT_DB",
+    os.path.join(tempfile.gettempdir(), "taxi_service_ratelimit.sqlite3"),
+)
+
+RATE_LIMIT_PER_USER = (10, 50)
+
+RATE_LIMIT_PER_ROUTE = {
+    "taxi:car-list": (50, 100),
+    "taxi:driver-detail": (50, 100),
+}
+
+# Sync gunicorn workers serve one request at a time, so requests queue
+# in front of the workers where Django can't count them; a route's
+# average latency in seconds is what shows the queue growing.
+LOAD_SHED_LATENCY = float(os.environ.get("DJANGO_LOAD_SHED_LATENCY", 2.0))
+
+# Background jobs (taxi.jobs), run by `manage.py run_jobs`.
+
+JOB_EXPORT_DIR = os.environ.get("DJANGO_JOB_EXPORT_DIR", BASE_DIR / "exports")
+
+# Monthly ride archives (taxi.archive), written by `manage.py archive_rides`.
+
+RIDE_ARCHIVE_DIR = os.environ.get("DJANGO_RIDE_ARCHIVE_DIR", BASE_DIR / "archive")
+
+RIDE_ARCHIVE_KEEP_MONTHS = int(os.environ.get("DJANGO_RIDE_ARCHIVE_KEEP_MONTHS", 3))
+
+# Road graph (.npz) for travel-time estimates (taxi.eta); unset falls
+# back to straight-line distances.
+
+ROAD_GRAPH_PATH = os.environ.get("DJANGO_ROAD_GRAPH_PATH")
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,37 @@
+"""Settings for `manage.py test`: the same app, minus what only costs time.
+
+* MD5 password hashing: `create_user()` no longer spends most of a
+  test in PBKDF2.
+* SQLite test databases are in memory (Django's default), and
+  `--parallel` workers fork their own copies.
+* Process-local caches, rate limit buckets and a lock directory per
+  run, so parallel workers (or a dev server) don't see each other's
+  fleet versions, buckets and locks; no rate limits unless a test sets
+  them.
+* No event relay or surge pricing threads; tests call
+  `taxi.events.relay.poll()` and `taxi.pricing.surge_pricer.refresh()`.
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+}
+
+SINGLE_FLIGHT_LOCK_DIR = tempfile.mkdtemp(prefix="taxi_test_locks_")
+
+RATE_LIMIT_DB = ":memory:"
+
+RATE_LIMIT_PER_USER = None
+
+RATE_LIMIT_PER_ROUTE = {}
+
+EVENT_POLL_INTERVAL = 0
+
+SURGE_INTERVAL = 0
+
+TEST_RUNNER = "taxi.testing.TimedTestRunner"